@@ -20,6 +20,22 @@ from database import init_db
 # Import blueprints
 from routes.auth_routes import auth_bp
 from routes.exam_routes import exam_bp
+from services.grading_queue import grading_queue
+from services.group_commit import group_commit
+from cli import register_commands
+
+def background_workers_enabled():
+    """
+    Whether this process should run the background graders and group commit.
+
+    BACKGROUND_WORKERS=true/false decides; otherwise they run everywhere except
+    `flask <command>` invocations (management commands that must not pick up
+    jobs another process is grading). Set BACKGROUND_WORKERS=true for `flask run`.
+    """
+    setting = os.environ.get('BACKGROUND_WORKERS', '').lower()
+    if setting in ('true', 'false'):
+        return setting == 'true'
+    return os.environ.get('FLASK_RUN_FROM_CLI') != 'true'
 
 def create_app():
     """Create and configure the Flask application"""
@@ -44,6 +60,17 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(exam_bp, url_prefix='/api/exam')
     
+    if background_workers_enabled():
+        # Start background grading workers for ?async=true submissions
+        grading_queue.start(app, workers=int(os.environ.get('GRADING_WORKERS', '2')))
+        
+        # Optionally coalesce synchronous submissions into group commits
+        if os.environ.get('GROUP_COMMIT', 'false').lower() == 'true':
+            group_commit.start(app)
+    
+    # Management commands (flask --app app <command>)
+    register_commands(app)
+    
     # Serve static files (avoid naming conflict with waitress.serve)
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -0,0 +1,104 @@
+"""
+Benchmark: grading offline answer sheets one at a time vs as a matrix
+
+Scores the same random answer sheets with ``GradingService.build_result``
+(the per-submission path behind ``grade_exam``) and with the vectorized
+``BatchGradingService``, on an in-memory SQLite database, without writing
+results. Explanations are drawn from a small vocabulary so missed-concept
+counts tie often. Exits non-zero if any sheet's score, category scores or
+recommendations differ between the two paths, so it can double as a
+parity check.
+
+    python benchmarks/bench_batch_grading.py [questions] [sheets]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from database import db
+from models.sql_models import Question, Option, Exam, ExamQuestion, User
+from services.batch_grading_service import BatchGradingService, _ExamMatrix
+from services.grading_service import GradingService
+
+VOCABULARY = ['algebra', 'geometry', 'syllogism', 'grammar', 'pointers', 'recursion', 'vectors']
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(num_questions, rng):
+    user = User(email='bench@example.com', display_name='Bench', password_hash='x')
+    exam = Exam(title='Bench', description='Benchmark exam', duration_minutes=60)
+    db.session.add_all([user, exam])
+    db.session.flush()
+    categories = ['reasoning', 'english', 'computer_concepts', 'maths']
+    for i in range(num_questions):
+        question = Question(
+            text=f'Question {i}',
+            category=categories[i % len(categories)],
+            explanation=' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 4)))
+        )
+        db.session.add(question)
+        db.session.flush()
+        db.session.add_all([
+            Option(question.id, '1', 'A', is_correct=True),
+            Option(question.id, '2', 'B')
+        ])
+        db.session.add(ExamQuestion(exam.id, question.id, i))
+    db.session.commit()
+    return user, exam
+
+
+def main():
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    num_sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(4)
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        user, exam = seed(num_questions, rng)
+        grading_service = GradingService()
+        answer_key = grading_service.get_answer_key(exam.uuid)
+        uuids = [e.question_uuid for e in answer_key.entries]
+        sheets = [
+            (index, user.id, user.uid, {u: rng.choice(['1', '2']) for u in uuids if rng.random() < 0.9})
+            for index in range(num_sheets)
+        ]
+
+        start = time.perf_counter()
+        single = [grading_service.build_result(user.id, answer_key, answers) for _, _, _, answers in sheets]
+        single_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = BatchGradingService()._grade_chunk(_ExamMatrix(answer_key), sheets)
+        batch_elapsed = time.perf_counter() - start
+
+    mismatches = [
+        index for index, (a, b) in enumerate(zip(single, batch))
+        if (a.score, a.category_scores, a.recommendations) != (b.score, b.category_scores, b.recommendations)
+    ]
+
+    print(f"Grading {num_sheets} sheets of {num_questions} questions")
+    print(f"{'path':<10} {'latency (ms)':>14}")
+    print(f"{'single':<10} {single_elapsed * 1000:>14.2f}")
+    print(f"{'batch':<10} {batch_elapsed * 1000:>14.2f}")
+
+    if mismatches:
+        print(f"{len(mismatches)} sheets graded differently, first at index {mismatches[0]}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: statements to serialize the exam catalog
+
+Compares ``Exam.to_dict`` over plain ``Exam.query.all()`` (one lazy load per
+exam's categories, per exam's question list and per exam question) with the
+eager-loaded ``ExamService.get_all_exams`` path on an in-memory SQLite
+database. Exits non-zero if the eager path issues more than
+``MAX_STATEMENTS`` statements, so it can double as a regression check.
+
+    python benchmarks/bench_exam_listing.py [exams] [questions_per_exam]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db
+from models.sql_models import Question, Option, Exam, ExamCategory, ExamQuestion
+from services.exam_service import ExamService
+
+# Exams, categories and exam questions with their question uuids
+MAX_STATEMENTS = 3
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(num_exams, questions_per_exam):
+    categories = ['reasoning', 'english', 'computer_concepts', 'maths']
+    questions = []
+    for i in range(questions_per_exam * 2):
+        question = Question(text=f'Question {i}', category=categories[i % len(categories)], explanation='Explanation')
+        db.session.add(question)
+        questions.append(question)
+    db.session.flush()
+    for question in questions:
+        db.session.add_all([Option(question.id, '1', 'A', is_correct=True), Option(question.id, '2', 'B')])
+
+    for e in range(num_exams):
+        exam = Exam(title=f'Exam {e}', description='Benchmark exam', duration_minutes=60)
+        db.session.add(exam)
+        db.session.flush()
+        db.session.add_all([ExamCategory(exam.id, c) for c in categories[:2]])
+        for order in range(questions_per_exam):
+            question = questions[(e + order) % len(questions)]
+            db.session.add(ExamQuestion(exam.id, question.id, order))
+    db.session.commit()
+
+
+def measure(label, load):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        start = time.perf_counter()
+        exams = [e.to_dict() for e in load()]
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    print(f"{label:<10} {len(exams):>6} {len(statements):>12} {elapsed * 1000:>14.2f}")
+    return len(statements)
+
+
+def main():
+    num_exams = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    questions_per_exam = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed(num_exams, questions_per_exam)
+
+        print(f"Serializing {num_exams} exams of {questions_per_exam} questions")
+        print(f"{'path':<10} {'exams':>6} {'statements':>12} {'latency (ms)':>14}")
+        measure('lazy', lambda: Exam.query.all())
+        eager = measure('eager', lambda: ExamService().get_all_exams(active_only=False))
+
+    if eager > MAX_STATEMENTS:
+        print(f"eager path issued {eager} statements, expected at most {MAX_STATEMENTS}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: statements and latency to persist one graded submission
+
+Compares the old one-ORM-object-per-row path with the batched
+``services.result_writer.write_results`` path on an in-memory SQLite
+database. The batched path costs six statements per submission: four
+INSERTs plus the progress-stats lookup and UPDATE. The first submission
+also syncs the recommendation templates and creates the user's progress
+rows, so the average comes out a little above six.
+
+    python benchmarks/bench_result_writes.py [questions] [submissions]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db
+from models.sql_models import (
+    Question, Option, Exam, ExamQuestion, ExamResult, ResultAnswer,
+    CategoryScore, Recommendation, RecommendationTemplate, User
+)
+from services.grading_service import GradingService
+from services.recommendation_catalog import TEMPLATES
+from services.result_writer import GradedResult, write_results
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(num_questions):
+    user = User(email='bench@example.com', display_name='Bench', password_hash='x')
+    exam = Exam(title='Bench', description='Benchmark exam', duration_minutes=60)
+    db.session.add_all([user, exam])
+    db.session.flush()
+    categories = ['reasoning', 'english', 'computer_concepts', 'maths']
+    for i in range(num_questions):
+        question = Question(
+            text=f'Question {i}',
+            category=categories[i % len(categories)],
+            explanation=f'Explanation covering concept{i % 7} and topic{i % 5}'
+        )
+        db.session.add(question)
+        db.session.flush()
+        db.session.add_all([
+            Option(question.id, '1', 'A', is_correct=True),
+            Option(question.id, '2', 'B')
+        ])
+        db.session.add(ExamQuestion(exam.id, question.id, i))
+    db.session.commit()
+    return user, exam
+
+
+def build_submission(user, exam, grading_service):
+    """Score a half-right answer sheet and return the GradedResult to persist."""
+    rows = (
+        db.session.query(Question.id, Question.uuid, Question.category, Question.explanation)
+        .join(ExamQuestion, ExamQuestion.question_id == Question.id)
+        .filter(ExamQuestion.exam_id == exam.id)
+        .all()
+    )
+    answers = []
+    question_results = {}
+    category_counts = {}
+    for i, row in enumerate(rows):
+        is_correct = i % 2 == 0
+        answers.append((row.id, '1' if is_correct else '2', is_correct))
+        question_results[row.uuid] = {'correct': is_correct, 'explanation': row.explanation}
+        counts = category_counts.setdefault(row.category, [0, 0])
+        counts[0] += 1
+        counts[1] += int(is_correct)
+    category_scores = {c: correct / total * 100 for c, (total, correct) in category_counts.items()}
+    return GradedResult(
+        user_id=user.id,
+        exam_id=exam.id,
+        score=50.0,
+        max_score=100.0,
+        answers=answers,
+        category_scores=category_scores,
+        recommendations=grading_service._generate_recommendations(category_scores, question_results)
+    )
+
+
+def persist_legacy(graded):
+    """The pre-batching path: one ORM object and one question lookup per row."""
+    result = ExamResult(graded.user_id, graded.exam_id, graded.score, graded.max_score)
+    db.session.add(result)
+    db.session.flush()
+    for question_id, selected_option, is_correct in graded.answers:
+        question = Question.query.filter_by(id=question_id).first()
+        if question:
+            db.session.add(ResultAnswer(result.id, question.id, selected_option, is_correct))
+    for category, score in graded.category_scores.items():
+        db.session.add(CategoryScore(result.id, category, score))
+    # Full recommendation text on every row, as before templates
+    for key, params in graded.recommendations['overall']:
+        db.session.add(Recommendation(result.id, RecommendationTemplate.fill(TEMPLATES[key], None, params)))
+    for category, refs in graded.recommendations['by_category'].items():
+        for key, params in refs:
+            text = RecommendationTemplate.fill(TEMPLATES[key], category, params)
+            db.session.add(Recommendation(result.id, text, category=category))
+    db.session.commit()
+
+
+def persist_batched(graded):
+    write_results([graded])
+    db.session.commit()
+
+
+def measure(label, persist, make_graded, submissions):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    elapsed = 0.0
+    try:
+        for _ in range(submissions):
+            graded = make_graded()
+            start = time.perf_counter()
+            persist(graded)
+            elapsed += time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    print(f"{label:<10} {len(statements) / submissions:>12.1f} {elapsed / submissions * 1000:>14.2f}")
+
+
+def main():
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        user, exam = seed(num_questions)
+        grading_service = GradingService()
+        template = build_submission(user, exam, grading_service)
+
+        def make_graded():
+            return GradedResult(
+                user_id=template.user_id,
+                exam_id=template.exam_id,
+                score=template.score,
+                max_score=template.max_score,
+                answers=template.answers,
+                category_scores=template.category_scores,
+                recommendations=template.recommendations
+            )
+
+        print(f"Persisting one {num_questions}-question result, averaged over {submissions} submissions")
+        print(f"{'path':<10} {'statements':>12} {'latency (ms)':>14}")
+        measure('legacy', persist_legacy, make_graded, submissions)
+        measure('batched', persist_batched, make_graded, submissions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Flask CLI commands for the CET Exam App
+
+Run with ``flask --app app <command>``.
+"""
+
+import json
+
+import click
+from sqlalchemy import update
+
+from database import db
+from models.sql_models import Exam, Question
+from services.batch_grading_service import BatchGradingService
+from services.regrade_service import regrade_service
+from services.concept_index import index_explanation
+from services import bulk_export, progress_stats, question_dedupe, question_search
+from services.exam_service import ExamService
+from services.exam_bundles import exam_bundles
+
+def register_commands(app):
+    """Attach the management commands to the Flask app."""
+
+    @app.cli.command('grade-batch')
+    @click.argument('exam_id')
+    @click.argument('sheets', type=click.File('r'))
+    def grade_batch(exam_id, sheets):
+        """Grade offline answer sheets for EXAM_ID from a JSON or JSONL file.
+
+        SHEETS is either a JSON list (or ``{"submissions": [...]}``) or one
+        ``{"user_id": ..., "answers": {...}}`` object per line.
+        """
+        content = sheets.read()
+        try:
+            submissions = json.loads(content)
+        except ValueError:
+            submissions = [json.loads(line) for line in content.splitlines() if line.strip()]
+        if isinstance(submissions, dict):
+            submissions = submissions.get('submissions', [])
+
+        try:
+            report = BatchGradingService().grade_batch(exam_id, submissions)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        click.echo(f"Graded {report['graded']} of {len(submissions)} answer sheets")
+        for error in report['errors']:
+            click.echo(f"  sheet {error['index']}: {error['message']}", err=True)
+
+    @app.cli.command('regrade-question')
+    @click.argument('question_id')
+    def regrade_question(question_id):
+        """Apply QUESTION_ID's current correct option to every stored answer."""
+        question_pk = db.session.query(Question.id).filter_by(uuid=question_id).scalar()
+        if question_pk is None:
+            raise click.ClickException("Question not found")
+
+        stats = regrade_service.regrade_question(question_pk)
+        click.echo(f"Flipped {stats['answers']} answers across {stats['results']} results")
+
+    @app.cli.command('index-concepts')
+    @click.option('--batch-size', default=500, show_default=True)
+    def index_concepts(batch_size):
+        """Extract concept keywords for questions that have not been indexed yet."""
+        indexed = 0
+        while True:
+            questions = (
+                db.session.query(Question.id, Question.explanation)
+                .filter(Question.concept_ids.is_(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not questions:
+                break
+            for question in questions:
+                # Core update so the backfill does not bump updated_at
+                db.session.execute(
+                    update(Question)
+                    .where(Question.id == question.id)
+                    .values(concept_ids=index_explanation(question.explanation), updated_at=Question.updated_at)
+                )
+            db.session.commit()
+            indexed += len(questions)
+        click.echo(f"Indexed {indexed} questions")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """Re-index every question for full-text search."""
+        indexed = question_search.rebuild()
+        click.echo(f"Indexed {indexed} questions for search")
+
+    @app.cli.command('rebuild-duplicate-index')
+    def rebuild_duplicate_index():
+        """Re-fingerprint every question for near-duplicate detection."""
+        indexed = question_dedupe.rebuild()
+        click.echo(f"Fingerprinted {indexed} questions")
+
+    @app.cli.command('rebuild-progress-stats')
+    @click.option('--batch-size', default=200, show_default=True)
+    def rebuild_progress_stats(batch_size):
+        """Recompute every user's progress aggregates from the stored results."""
+        rebuilt = progress_stats.rebuild(batch_size=batch_size)
+        click.echo(f"Rebuilt progress stats for {rebuilt} users")
+
+    @app.cli.command('publish-exam-bundles')
+    @click.argument('exam_id', required=False)
+    def publish_exam_bundles(exam_id):
+        """Write the precompressed delivery bundles of EXAM_ID, or of every active exam."""
+        if exam_id:
+            exam_ids = [exam_id]
+        else:
+            exam_ids = [uuid for (uuid,) in db.session.query(Exam.uuid).filter_by(is_active=True)]
+
+        service = ExamService()
+        published = 0
+        for uuid in exam_ids:
+            paths = service.publish_exam_bundles(uuid)
+            if paths:
+                published += 1
+            elif exam_id:
+                raise click.ClickException("Exam not found or not active")
+        click.echo(f"Published bundles for {published} exams to {exam_bundles.directory}")
+
+    @app.cli.command('export-questions')
+    @click.option('--format', 'fmt', type=click.Choice(bulk_export.FORMATS), default='csv', show_default=True)
+    @click.option('--category', 'categories', multiple=True, help='Only this category (repeatable)')
+    @click.option('--output', '-o', default='-', help='File to write, or - for stdout')
+    def export_questions(fmt, categories, output):
+        """Write the question bank with options as CSV or JSONL."""
+        with click.open_file(output, 'w', encoding='utf-8') as f:
+            for chunk in bulk_export.export_questions(fmt, list(categories) or None):
+                f.write(chunk)
+
+    @app.cli.command('export-results')
+    @click.argument('exam_id')
+    @click.option('--format', 'fmt', type=click.Choice(bulk_export.FORMATS), default='csv', show_default=True)
+    @click.option('--output', '-o', default='-', help='File to write, or - for stdout')
+    def export_results(exam_id, fmt, output):
+        """Write every result of EXAM_ID with its answers as CSV or JSONL."""
+        try:
+            chunks = bulk_export.export_results(exam_id, fmt)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        with click.open_file(output, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
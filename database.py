@@ -23,6 +23,11 @@ def init_db(app):
     # Create all tables if they don't exist
     with app.app_context():
         db.create_all()
+        upgrade_schema(db)
+        from services import question_dedupe, question_sampler, question_search
+        question_search.ensure_index()
+        question_dedupe.ensure_index()
+        question_sampler.ensure_keys()
         # seed subject categories from enum if not already present
         from models.sql_models import SubjectCategoryModel, SubjectCategory
         for cat in SubjectCategory:
@@ -30,6 +35,27 @@ def init_db(app):
                 db.session.add(SubjectCategoryModel(name=cat.value))
         db.session.commit()
 
+def upgrade_schema(db):
+    """
+    Add columns and indexes that create_all skips on tables that already exist.
+
+    Only covers additive changes; new columns must be nullable.
+    """
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 def get_database_uri():
     """Get database URI from environment variables or use default"""
     db_user = os.getenv('DB_USERNAME', 'postgres123')
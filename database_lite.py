@@ -39,6 +39,16 @@ def init_db(app):
         # Create tables
         db.create_all()
 
+        # Add columns/indexes introduced after the tables were created
+        from database import upgrade_schema
+        upgrade_schema(db)
+
+        # Full-text search table (FTS5), backfilled if out of step
+        from services import question_dedupe, question_sampler, question_search
+        question_search.ensure_index()
+        question_dedupe.ensure_index()
+        question_sampler.ensure_keys()
+
         # Seed default data (safe)
         from models.sql_models import SubjectCategoryModel, SubjectCategory
 
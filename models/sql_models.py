@@ -4,9 +4,10 @@ SQLAlchemy models for the CET Exam App
 
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, Float, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database import db
+import random
 import uuid
 
 class SubjectCategory(str, Enum):
@@ -45,6 +46,7 @@ class User(db.Model):
     
     # Relationships
     results = relationship("ExamResult", back_populates="user", cascade="all, delete-orphan")
+    progress_stats = relationship("UserCategoryStat", back_populates="user", cascade="all, delete-orphan")
     
     def __init__(self, email, display_name, password_hash, role='student'):
         self.uid = str(uuid.uuid4())
@@ -75,6 +77,9 @@ class Question(db.Model):
     category = Column(String(50), nullable=False)
     explanation = Column(Text, nullable=False)
     difficulty_level = Column(Integer, nullable=False, default=1)
+    concept_ids = Column(Text, nullable=True)  # "concept_id:count,..." from the explanation, in first-seen order
+    sample_key = Column(Float, nullable=True)  # uniform in [0, 1); position for random sampling (services/question_sampler.py)
+    content_hash = Column(String(40), nullable=True)  # normalised text + options; duplicate detection (services/question_dedupe.py)
     created_at = Column(DateTime, nullable=False, default=datetime.now)
     updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     
@@ -83,12 +88,18 @@ class Question(db.Model):
     exam_questions = relationship("ExamQuestion", back_populates="question", cascade="all, delete-orphan")
     result_answers = relationship("ResultAnswer", back_populates="question", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        Index('idx_questions_sample', 'category', 'difficulty_level', 'sample_key'),
+        Index('idx_questions_content_hash', 'content_hash'),
+    )
+    
     def __init__(self, text, category, explanation, difficulty_level=1):
         self.uuid = str(uuid.uuid4())
         self.text = text
         self.category = category if isinstance(category, str) else category.value
         self.explanation = explanation
         self.difficulty_level = difficulty_level
+        self.sample_key = random.random()
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
     
@@ -105,6 +116,27 @@ class Question(db.Model):
             'updated_at': self.updated_at
         }
 
+class Concept(db.Model):
+    """Concept model for keywords extracted from question explanations."""
+    __tablename__ = 'concepts'
+    
+    id = Column(Integer, primary_key=True)
+    keyword = Column(Text, unique=True, nullable=False)
+    
+    def __init__(self, keyword):
+        self.keyword = keyword
+
+class QuestionBucket(db.Model):
+    """QuestionBucket model for the MinHash/LSH buckets of a question (services/question_dedupe.py)."""
+    __tablename__ = 'question_buckets'
+    
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    
+    __table_args__ = (
+        Index('idx_question_buckets_question_id', 'question_id'),
+    )
+
 class Option(db.Model):
     """Option model for question options."""
     __tablename__ = 'options'
@@ -152,9 +184,17 @@ class Exam(db.Model):
     
     # Relationships
     categories = relationship("ExamCategory", back_populates="exam", cascade="all, delete-orphan")
-    exam_questions = relationship("ExamQuestion", back_populates="exam", cascade="all, delete-orphan")
+    exam_questions = relationship(
+        "ExamQuestion", back_populates="exam", cascade="all, delete-orphan",
+        order_by="(ExamQuestion.question_order, ExamQuestion.id)"
+    )
     results = relationship("ExamResult", back_populates="exam", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pages of the exam listing, newest first (ExamService.get_exam_summaries)
+        Index('idx_exams_active_created', 'is_active', 'created_at', 'id'),
+    )
+    
     def __init__(self, title, description, duration_minutes):
         self.uuid = str(uuid.uuid4())
         self.title = title
@@ -165,7 +205,11 @@ class Exam(db.Model):
         self.updated_at = datetime.now()
     
     def to_dict(self):
-        """Convert exam to dictionary."""
+        """Convert exam to dictionary.
+        
+        Load with ``EXAM_DICT_LOADS`` (services/exam_service.py) when
+        serializing many exams, or every exam question costs a lazy load.
+        """
         return {
             'id': self.uuid,
             'title': self.title,
@@ -232,6 +276,8 @@ class ExamResult(db.Model):
     score = Column(Float, nullable=False)
     max_score = Column(Float, nullable=False)
     completed_at = Column(DateTime, nullable=False, default=datetime.now)
+    idempotency_key = Column(String(64), nullable=True)
+    regraded_at = Column(DateTime, nullable=True)  # last time a regrade shifted the scores
     
     # Relationships
     user = relationship("User", back_populates="results")
@@ -240,6 +286,13 @@ class ExamResult(db.Model):
     category_scores = relationship("CategoryScore", back_populates="result", cascade="all, delete-orphan")
     recommendations = relationship("Recommendation", back_populates="result", cascade="all, delete-orphan")
     
+    # Constraints
+    __table_args__ = (
+        Index('uq_exam_results_idempotency_key', 'idempotency_key', unique=True),
+        # Keyset pages of a user's history, newest first
+        Index('idx_exam_results_user_completed', 'user_id', 'completed_at', 'id'),
+    )
+    
     def __init__(self, user_id, exam_id, score, max_score):
         self.uuid = str(uuid.uuid4())
         self.user_id = user_id
@@ -260,9 +313,9 @@ class ExamResult(db.Model):
             'answers': {answer.question.uuid: answer.selected_option_id for answer in self.answers},
             'category_scores': {cs.category: cs.score for cs in self.category_scores},
             'recommendations': {
-                'overall': [r.recommendation_text for r in self.recommendations if r.category is None],
+                'overall': [r.text for r in self.recommendations if r.category is None],
                 'by_category': {
-                    category: [r.recommendation_text for r in self.recommendations if r.category == category]
+                    category: [r.text for r in self.recommendations if r.category == category]
                     for category in set(r.category for r in self.recommendations if r.category is not None)
                 }
             }
@@ -285,6 +338,8 @@ class ResultAnswer(db.Model):
     # Constraints
     __table_args__ = (
         UniqueConstraint('result_id', 'question_id', name='uq_result_question'),
+        # Regrades walk one question's answers in id order
+        Index('idx_result_answers_question_id', 'question_id', 'id'),
     )
     
     def __init__(self, result_id, question_id, selected_option_id, is_correct):
@@ -301,6 +356,7 @@ class CategoryScore(db.Model):
     result_id = Column(Integer, ForeignKey('exam_results.id', ondelete='CASCADE'), nullable=False)
     category = Column(String(50), nullable=False)
     score = Column(Float, nullable=False)
+    answered = Column(Integer, nullable=True)  # answered questions the score is out of; regrades shift by 100 / answered
     
     # Relationships
     result = relationship("ExamResult", back_populates="category_scores")
@@ -315,6 +371,24 @@ class CategoryScore(db.Model):
         self.category = category
         self.score = score
 
+class RecommendationTemplate(db.Model):
+    """RecommendationTemplate model for the shared recommendation texts."""
+    __tablename__ = 'recommendation_templates'
+    
+    id = Column(Integer, primary_key=True)
+    key = Column(String(100), unique=True, nullable=False)
+    text = Column(Text, nullable=False)
+    
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+    
+    @staticmethod
+    def fill(text, category=None, params=None):
+        """Fill the ``{category}`` and ``{params}`` placeholders of a template text."""
+        readable_category = category.replace('_', ' ').title() if category else ''
+        return text.format(category=readable_category, params=params or '')
+
 class Recommendation(db.Model):
     """Recommendation model for AI-based recommendations in exam results."""
     __tablename__ = 'recommendations'
@@ -322,12 +396,105 @@ class Recommendation(db.Model):
     id = Column(Integer, primary_key=True)
     result_id = Column(Integer, ForeignKey('exam_results.id', ondelete='CASCADE'), nullable=False)
     category = Column(String(50), nullable=True)
-    recommendation_text = Column(Text, nullable=False)
+    # Empty for template-based rows; holds the full text for rows written before templates
+    recommendation_text = Column(Text, nullable=False, default='')
+    template_id = Column(Integer, ForeignKey('recommendation_templates.id'), nullable=True)
+    params = Column(Text, nullable=True)
     
     # Relationships
     result = relationship("ExamResult", back_populates="recommendations")
+    template = relationship("RecommendationTemplate")
     
     def __init__(self, result_id, recommendation_text, category=None):
         self.result_id = result_id
         self.recommendation_text = recommendation_text
         self.category = category
+    
+    @property
+    def text(self):
+        """Rendered recommendation text."""
+        if self.template_id is None:
+            return self.recommendation_text
+        return RecommendationTemplate.fill(self.template.text, self.category, self.params)
+
+class GradingJob(db.Model):
+    """GradingJob model for submissions waiting to be graded in the background."""
+    __tablename__ = 'grading_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    result_uuid = Column(String(255), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    exam_id = Column(Integer, ForeignKey('exams.id', ondelete='CASCADE'), nullable=False)
+    answers = Column(Text, nullable=False)  # JSON encoded question ID -> option ID
+    status = Column(String(20), nullable=False, default='pending', index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    idempotency_key = Column(String(64), nullable=True)
+    claimed_by = Column(String(255), nullable=True)  # worker holding the lease while processing
+    claimed_at = Column(DateTime, nullable=True)  # lease start; expired leases are re-claimed
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    
+    # Relationships
+    exam = relationship("Exam")
+    
+    # Constraints
+    __table_args__ = (
+        Index('uq_grading_jobs_idempotency_key', 'idempotency_key', unique=True),
+    )
+    
+    def __init__(self, user_id, exam_id, answers):
+        self.result_uuid = str(uuid.uuid4())
+        self.user_id = user_id
+        self.exam_id = exam_id
+        self.answers = answers
+        self.status = 'pending'
+        self.attempts = 0
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+    
+    def to_dict(self):
+        """Convert grading job to a status dictionary."""
+        return {
+            'resultId': self.result_uuid,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+class UserCategoryStat(db.Model):
+    """UserCategoryStat model for running per-user, per-category progress aggregates."""
+    __tablename__ = 'user_category_stats'
+    
+    # Category value of the row that aggregates whole-exam scores
+    OVERALL = '*'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    category = Column(String(50), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    best_score = Column(Float, nullable=True)
+    latest_score = Column(Float, nullable=True)
+    latest_at = Column(DateTime, nullable=True)
+    rolling_average = Column(Float, nullable=True)  # exponentially weighted, recent attempts count most
+    
+    # Relationships
+    user = relationship("User", back_populates="progress_stats")
+    
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', 'category', name='uq_user_category_stat'),
+    )
+    
+    def to_dict(self):
+        """Convert aggregate to dictionary."""
+        return {
+            'attempts': self.attempts,
+            'average_score': self.score_sum / self.attempts if self.attempts else 0.0,
+            'best_score': self.best_score,
+            'latest_score': self.latest_score,
+            'latest_at': self.latest_at,
+            'rolling_average': self.rolling_average
+        }
@@ -2,12 +2,21 @@
 Flask routes for exam management
 """
 
-from flask import Blueprint, request, jsonify, g
+import os
+
+from flask import Blueprint, request, jsonify, g, make_response, current_app, send_file, stream_with_context
 from functools import wraps
 
 from services.exam_service import ExamService
 from services.grading_service import GradingService
+from services.grading_queue import grading_queue
+from services.submission_dedupe import submission_dedupe
+from services.group_commit import group_commit
+from services.exam_bundles import exam_bundles
+from services import bulk_export, question_dedupe, question_import
+from services.batch_grading_service import BatchGradingService
 from routes.auth_routes import token_required, role_required
+from routes.http_cache import make_etag, is_fresh, not_modified, with_validators
 from services.user_service import UserRole
 from models.sql_models import Exam, Question, User, ExamResult
 
@@ -15,12 +24,24 @@ from models.sql_models import Exam, Question, User, ExamResult
 exam_bp = Blueprint('exam', __name__)
 exam_service = ExamService()
 grading_service = GradingService()
+batch_grading_service = BatchGradingService()
+
+# Exams can be edited, so caches must revalidate; a 304 costs one small query.
+# The routes need a login, so shared caches must not keep a copy.
+EXAM_CACHE_CONTROL = 'private, no-cache'
+# Results only change on a regrade, so browsers may reuse them for a while
+RESULT_CACHE_CONTROL = f"private, max-age={int(os.getenv('RESULT_CACHE_MAX_AGE', '300'))}"
 
 # Routes for questions
 @exam_bp.route('/questions', methods=['POST'])
 @role_required(UserRole.ADMIN)
 def create_question():
-    """Create a new question (admin only)."""
+    """Create a new question (admin only).
+
+    Similar questions already in the bank are returned in ``duplicates`` as
+    a warning; with ``reject_duplicates`` true a near-duplicate is refused
+    with 409 instead.
+    """
     data = request.get_json()
     
     # Validate required fields
@@ -29,16 +50,66 @@ def create_question():
         if field not in data:
             return jsonify({'message': f'Missing required field: {field}'}), 400
     
+    reject_duplicates = bool(data.get('reject_duplicates', False))
+    duplicates = []
+    if not reject_duplicates:
+        duplicates = exam_service.find_duplicate_questions(data['text'], data['options'])
+    
     # Create question
-    question_id = exam_service.create_question(
-        text=data['text'],
-        category=data['category'],
-        options=data['options'],
-        explanation=data['explanation'],
-        difficulty_level=data.get('difficulty_level', 1)
-    )
+    try:
+        question_id = exam_service.create_question(
+            text=data['text'],
+            category=data['category'],
+            options=data['options'],
+            explanation=data['explanation'],
+            difficulty_level=data.get('difficulty_level', 1),
+            reject_duplicates=reject_duplicates
+        )
+    except question_dedupe.DuplicateQuestionError as e:
+        return jsonify({'message': str(e), 'duplicates': e.matches}), 409
+    
+    response = {'message': 'Question created successfully', 'questionId': question_id}
+    if duplicates:
+        response['duplicates'] = duplicates
+    return jsonify(response), 201
+
+@exam_bp.route('/questions/import', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def import_questions():
+    """Bulk-import questions from an uploaded XLSX or CSV sheet (admin only).
+
+    Multipart form with ``file`` and the ``category`` every row goes into.
+    Rows are validated and inserted in batches; invalid rows are skipped
+    and listed by row number in ``errors``. Near-duplicates of existing
+    questions or earlier rows are skipped and listed in ``duplicate_rows``;
+    with ``duplicates=allow`` they are imported and still listed.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'message': 'Missing file'}), 400
+    category = request.form.get('category')
+    if not category:
+        return jsonify({'message': 'Missing required field: category'}), 400
+    
+    try:
+        rows = question_import.read_rows(upload.stream, upload.filename)
+        skip_duplicates = request.form.get('duplicates', 'skip').lower() != 'allow'
+        report = question_import.import_questions(rows, category, skip_duplicates=skip_duplicates)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    return jsonify({'message': 'Question created successfully', 'questionId': question_id}), 201
+    return jsonify(report), 200
+
+@exam_bp.route('/questions/duplicates', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def find_duplicate_questions():
+    """List questions in the bank similar to ``text`` and ``options`` (admin only), before saving one."""
+    data = request.get_json() or {}
+    if not data.get('text'):
+        return jsonify({'message': 'Missing required field: text'}), 400
+    
+    duplicates = exam_service.find_duplicate_questions(data['text'], data.get('options', []))
+    return jsonify({'duplicates': duplicates}), 200
 
 @exam_bp.route('/questions/<question_id>', methods=['GET'])
 @token_required
@@ -103,6 +174,52 @@ def delete_category(category_id):
     return jsonify({'message': 'Category deleted successfully'}), 200
 
 
+@exam_bp.route('/questions/pool', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def get_question_pool():
+    """Count questions per category and difficulty level (admin only).
+
+    Takes an optional comma-separated ``categories`` filter. Used to build
+    assembly blueprints without downloading the questions.
+    """
+    categories_param = request.args.get('categories')
+    cats = [c.strip() for c in categories_param.split(',') if c.strip()] if categories_param else None
+    return jsonify({'pool': exam_service.get_question_pool_sizes(cats)}), 200
+
+@exam_bp.route('/questions/search', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def search_questions():
+    """Full-text search over the question bank (admin only).
+
+    ``q`` is matched against question text, explanations and option text,
+    best match first. Optional ``category``/``categories`` and
+    ``difficulty_level`` filters narrow the matches; ``limit`` (default 20,
+    capped at 100) and ``offset`` page through them, with ``next`` giving
+    the following page's offset.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'Missing search query: q'}), 400
+
+    categories_param = request.args.get('categories')
+    cat = request.args.get('category')
+    if categories_param:
+        cats = [c.strip() for c in categories_param.split(',') if c.strip()]
+    elif cat:
+        cats = [cat]
+    else:
+        cats = None
+
+    try:
+        difficulty_level = request.args.get('difficulty_level')
+        difficulty_level = int(difficulty_level) if difficulty_level else None
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'message': 'difficulty_level, limit and offset must be integers'}), 400
+
+    return jsonify(exam_service.search_questions(query, cats, difficulty_level, offset, limit)), 200
+
 @exam_bp.route('/questions', methods=['GET'])
 @token_required
 def get_questions():
@@ -111,25 +228,59 @@ def get_questions():
     The frontend may send either a single `category` parameter or a
     comma-separated `categories` list. If neither is provided we return
     every question from all known categories.
+
+    Questions come from one query in ID order and are streamed as they are
+    read. ``limit`` (capped at 1000) returns one page with a ``next`` ID to
+    pass back as ``?after=``; without it the whole bank is streamed.
     """
     categories_param = request.args.get('categories')
     cat = request.args.get('category')
-    questions = []
 
     if categories_param:
         # split and filter out empty values
         cats = [c.strip() for c in categories_param.split(',') if c.strip()]
-        for c in cats:
-            questions.extend(exam_service.get_questions_by_category(c))
     elif cat:
-        questions = exam_service.get_questions_by_category(cat)
+        cats = [cat]
     else:
-        # return all categories by default based on database entries
-        cats = exam_service.list_categories()
-        for c in cats:
-            questions.extend(exam_service.get_questions_by_category(c.name))
+        # every category known to the database
+        cats = None
+
+    limit = request.args.get('limit')
+    try:
+        limit = min(max(int(limit), 1), 1000) if limit is not None else None
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+
+    try:
+        # One row past the page tells whether there is a next one
+        questions = exam_service.iter_questions(
+            cats, request.args.get('after'), limit + 1 if limit is not None else None
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    return jsonify({'questions': [q.to_dict() for q in questions]}), 200
+    dumps = current_app.json.dumps
+
+    def generate():
+        # Written a few hundred questions at a time, never the whole list
+        buffer = ['{"questions":[']
+        last = None
+        count = 0
+        more = False
+        for question in questions:
+            if limit is not None and count == limit:
+                more = True
+                break
+            buffer.append(('' if last is None else ',') + dumps(question.to_dict(), separators=(',', ':')))
+            last = question.uuid
+            count += 1
+            if len(buffer) >= 500:
+                yield ''.join(buffer)
+                buffer = []
+        buffer.append('],"next":' + dumps(last if more else None) + '}')
+        yield ''.join(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), status=200, mimetype='application/json')
 # Routes for exams
 @exam_bp.route('/exams', methods=['POST'])
 @role_required(UserRole.ADMIN)
@@ -154,22 +305,106 @@ def create_exam():
     
     return jsonify({'message': 'Exam created successfully', 'examId': exam_id}), 201
 
+@exam_bp.route('/exams/assemble', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def assemble_exam():
+    """Create an exam from a blueprint, drawing its questions server-side (admin only).
+
+    ``blueprint`` is a list of ``{category, difficulty_level, count}``
+    entries. An optional ``seed`` makes the draw repeatable; ``seeds``
+    (e.g. student IDs) creates one variant of the exam per seed.
+    """
+    data = request.get_json()
+    
+    required_fields = ['title', 'description', 'duration_minutes', 'blueprint']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+    
+    def assemble(seed):
+        return exam_service.assemble_exam(
+            title=data['title'],
+            description=data['description'],
+            duration_minutes=data['duration_minutes'],
+            blueprint=data['blueprint'],
+            categories=data.get('categories'),
+            seed=seed
+        )
+    
+    try:
+        seeds = data.get('seeds')
+        if seeds:
+            exam_ids = {str(seed): assemble(str(seed)) for seed in seeds}
+            return jsonify({'message': 'Exams created successfully', 'examIds': exam_ids}), 201
+        seed = data.get('seed')
+        exam_id = assemble(str(seed) if seed is not None else None)
+        return jsonify({'message': 'Exam created successfully', 'examId': exam_id}), 201
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@exam_bp.route('/exams/assemble/preview', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def preview_exam_assembly():
+    """Return the question IDs a blueprint would draw, without creating an exam (admin only)."""
+    data = request.get_json()
+    if 'blueprint' not in data:
+        return jsonify({'message': 'Missing required field: blueprint'}), 400
+    
+    seed = data.get('seed')
+    try:
+        questions = exam_service.sample_questions(data['blueprint'], str(seed) if seed is not None else None)
+        return jsonify({'questions': questions}), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
 @exam_bp.route('/exams/<exam_id>', methods=['GET'])
 @token_required
 def get_exam(exam_id):
-    """Get an exam by ID."""
+    """Get an exam by ID.
+
+    Supports If-None-Match / If-Modified-Since; a matching request gets 304
+    before the exam is loaded. With questions, the body comes from the
+    in-memory exam snapshot, rebuilt only after the exam or its questions change,
+    or from its precompressed bundle on disk when the client accepts br or gzip.
+    """
     include_questions = request.args.get('include_questions', 'false').lower() == 'true'
     
     if include_questions:
-        exam_data = exam_service.get_exam_with_questions(exam_id)
-        if not exam_data:
-            return jsonify({'message': 'Exam not found'}), 404
-        return jsonify({'exam': exam_data}), 200
-    else:
-        exam = exam_service.get_exam(exam_id)
-        if not exam:
+        # Exam start: every student gets the same pre-encoded bytes
+        snapshot = exam_service.get_exam_snapshot(exam_id)
+        if not snapshot:
             return jsonify({'message': 'Exam not found'}), 404
-        return jsonify({'exam': exam.to_dict()}), 200
+        etag = make_etag('exam', exam_id, True, snapshot.modified, snapshot.questions)
+        bundle = exam_bundles.find(snapshot, request.accept_encodings)
+        if bundle:
+            # Each encoding is its own representation with its own validator
+            encoding, path = bundle
+            etag = f"{etag}-{encoding}"
+        if is_fresh(etag, snapshot.modified):
+            response = not_modified(etag, snapshot.modified, EXAM_CACHE_CONTROL)
+        elif bundle:
+            response = send_file(path, mimetype='application/json', conditional=False, etag=False)
+            response.headers['Content-Encoding'] = encoding
+            response = with_validators(response, etag, snapshot.modified, EXAM_CACHE_CONTROL)
+        else:
+            response = current_app.response_class(snapshot.body, status=200, mimetype='application/json')
+            response = with_validators(response, etag, snapshot.modified, EXAM_CACHE_CONTROL)
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    version = exam_service.get_exam_version(exam_id, include_questions)
+    if not version:
+        return jsonify({'message': 'Exam not found'}), 404
+    etag = make_etag('exam', exam_id, include_questions, version['modified'], version['questions'])
+    if is_fresh(etag, version['modified']):
+        return not_modified(etag, version['modified'], EXAM_CACHE_CONTROL)
+    
+    exam = exam_service.get_exam(exam_id)
+    if not exam:
+        return jsonify({'message': 'Exam not found'}), 404
+    
+    response = make_response(jsonify({'exam': exam.to_dict()}), 200)
+    return with_validators(response, etag, version['modified'], EXAM_CACHE_CONTROL)
 
 @exam_bp.route('/exams/<exam_id>', methods=['PUT'])
 @role_required(UserRole.ADMIN)
@@ -218,6 +453,40 @@ def get_exams():
 
     return jsonify({'exams': [e.to_dict() for e in exams]}), 200
 
+@exam_bp.route('/exams/summary', methods=['GET'])
+@token_required
+def get_exam_summaries():
+    """Get exams newest first, one page at a time.
+
+    Takes the same ``active_only``, ``category`` and ``categories`` filters
+    as ``/exams``, but returns a question count instead of each exam's
+    question list. Pass ``next`` from a page as ``?after=`` to get the next
+    one; ``limit`` defaults to 20 and is capped at 100.
+    """
+    active_only = request.args.get('active_only', 'true').lower() == 'true'
+    cats_param = request.args.get('categories')
+    single_cat = request.args.get('category')
+    if cats_param:
+        cats = [c.strip() for c in cats_param.split(',') if c.strip()]
+    elif single_cat:
+        cats = [single_cat]
+    else:
+        cats = None
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    
+    try:
+        page = exam_service.get_exam_summaries(active_only, cats, request.args.get('after'), limit)
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error getting exam summaries: {e}")
+        return jsonify({'message': 'Failed to fetch exams'}), 500
+
 # Routes for exam results
 @exam_bp.route('/stats', methods=['GET'])
 @role_required(UserRole.ADMIN)
@@ -245,24 +514,80 @@ def get_stats():
         return jsonify({'message': 'Failed to fetch stats'}), 500
 
 
+@exam_bp.route('/stats/group-commit', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def get_group_commit_stats():
+    """Return batch-size and latency metrics of the group-commit writer (admin only)."""
+    return jsonify(group_commit.stats()), 200
+
 @exam_bp.route('/exams/<exam_id>/submit', methods=['POST'])
 @token_required
 def submit_exam(exam_id):
-    """Submit an exam for grading."""
+    """Submit an exam for grading.
+
+    By default the exam is graded inside the request and 201 is returned
+    with the result ID. With ``?async=true`` the answers are validated and
+    queued instead, and 202 is returned straight away; poll
+    ``/results/<result_id>/status`` until the status is ``done``.
+
+    Clients should send an ``Idempotency-Key`` header (or an ``attempt`` ID
+    in the body) that stays the same across retries of one attempt. A retry
+    with a key that was already used returns 200 with the original result
+    ID and is not graded again.
+    """
     data = request.get_json()
     
     # Validate required fields
     if 'answers' not in data:
         return jsonify({'message': 'Missing required field: answers'}), 400
     
+    user_id = g.user.get('uid')
+    queued = request.args.get('async', 'false').lower() == 'true'
+    client_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or data.get('attempt')
+    idempotency_key = submission_dedupe.make_key(user_id, exam_id, str(client_key) if client_key else None)
+    if not idempotency_key:
+        return _grade_submission(user_id, exam_id, data['answers'], queued, None)
+
+    with submission_dedupe.claim(idempotency_key) as existing:
+        if existing:
+            return jsonify({
+                'message': 'Exam already submitted',
+                'resultId': existing,
+                'duplicate': True
+            }), 200
+        return _grade_submission(user_id, exam_id, data['answers'], queued, idempotency_key)
+
+def _grade_submission(user_id, exam_id, answers, queued, idempotency_key):
+    if queued:
+        try:
+            result_id = grading_queue.enqueue(
+                user_id=user_id,
+                exam_id=exam_id,
+                answers=answers,
+                idempotency_key=idempotency_key
+            )
+            if idempotency_key:
+                submission_dedupe.remember(idempotency_key, result_id)
+            return jsonify({
+                'message': 'Exam queued for grading',
+                'resultId': result_id,
+                'status': 'pending'
+            }), 202
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'message': f'Error queueing exam: {str(e)}'}), 500
+    
     # Grade exam
     try:
-        user_id = g.user.get('uid')
         result_id = grading_service.grade_exam(
             user_id=user_id,
             exam_id=exam_id,
-            answers=data['answers']
+            answers=answers,
+            idempotency_key=idempotency_key
         )
+        if idempotency_key:
+            submission_dedupe.remember(idempotency_key, result_id)
         
         return jsonify({
             'message': 'Exam graded successfully', 
@@ -273,19 +598,140 @@ def submit_exam(exam_id):
     except Exception as e:
         return jsonify({'message': f'Error grading exam: {str(e)}'}), 500
 
+@exam_bp.route('/exams/<exam_id>/grade-batch', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def grade_batch(exam_id):
+    """Grade a batch of offline answer sheets for one exam (admin only).
+
+    Expects ``{"submissions": [{"user_id": ..., "answers": {...}}, ...]}``.
+    Sheets that cannot be graded are reported in ``errors`` by their index.
+    """
+    data = request.get_json()
+    
+    # Validate required fields
+    if not isinstance(data.get('submissions'), list):
+        return jsonify({'message': 'Missing required field: submissions'}), 400
+    
+    try:
+        report = batch_grading_service.grade_batch(exam_id, data['submissions'])
+        return jsonify(report), 201
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Error grading batch: {str(e)}'}), 500
+
+@exam_bp.route('/exams/<exam_id>/results/export', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def export_exam_results(exam_id):
+    """Download every result of an exam with its answers as CSV or JSONL (admin only).
+
+    ``?format=csv`` (default) or ``?format=jsonl``. Streamed as the rows are read.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        chunks = bulk_export.export_results(exam_id, fmt)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return _export_response(chunks, fmt, f'exam-{exam_id}-results')
+
+@exam_bp.route('/questions/export', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def export_questions():
+    """Download the question bank with options as CSV or JSONL (admin only).
+
+    ``?format=csv`` (default) or ``?format=jsonl``, optionally narrowed by
+    ``category`` or a comma-separated ``categories`` list.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    categories_param = request.args.get('categories') or request.args.get('category')
+    cats = [c.strip() for c in categories_param.split(',') if c.strip()] if categories_param else None
+    try:
+        chunks = bulk_export.export_questions(fmt, cats)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return _export_response(chunks, fmt, 'questions')
+
+def _export_response(chunks, fmt, name):
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = current_app.response_class(stream_with_context(chunks), status=200, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+@exam_bp.route('/results/<result_id>/status', methods=['GET'])
+@token_required
+def get_result_status(result_id):
+    """Get the grading status (pending, processing, done or failed) of a result."""
+    status = grading_queue.get_status(result_id)
+    if not status:
+        return jsonify({'message': 'Result not found'}), 404
+        
+    # Check if user is asking about their own result or is an admin
+    if g.user.get('uid') != status.get('user_id') and g.user.get('role') != UserRole.ADMIN:
+        return jsonify({'message': 'Permission denied'}), 403
+        
+    return jsonify(status), 200
+
 @exam_bp.route('/results/<result_id>', methods=['GET'])
 @token_required
 def get_result(result_id):
-    """Get an exam result by ID."""
+    """Get an exam result by ID.
+
+    The ETag is derived from the result ID and its last regrade, and a
+    matching conditional request gets 304 before the result is loaded.
+    """
+    version = grading_service.get_result_version(result_id)
+    if not version:
+        return jsonify({'message': 'Result not found'}), 404
+        
+    # Check if user is requesting their own result or is an admin
+    if g.user.get('uid') != version['user_id'] and g.user.get('role') != UserRole.ADMIN:
+        return jsonify({'message': 'Permission denied'}), 403
+    
+    etag = make_etag('result', result_id, version['modified'])
+    if is_fresh(etag, version['modified']):
+        return not_modified(etag, version['modified'], RESULT_CACHE_CONTROL)
+    
     result = grading_service.get_exam_result(result_id)
     if not result:
         return jsonify({'message': 'Result not found'}), 404
         
+    response = make_response(jsonify({'result': result}), 200)
+    return with_validators(response, etag, version['modified'], RESULT_CACHE_CONTROL)
+
+@exam_bp.route('/results/<result_id>/review', methods=['GET'])
+@token_required
+def get_result_review(result_id):
+    """Get everything the result review page needs in one payload.
+
+    Returns the result plus ``exam`` (id and title) and ``questions``, each
+    with its options, ``selected_option``, ``correct_option``, whether it was
+    graded ``correct`` and its explanation. Supports conditional requests
+    like ``/results/<result_id>``; question edits change the ETag too.
+    """
+    version = grading_service.get_result_version(result_id)
+    if not version:
+        return jsonify({'message': 'Result not found'}), 404
+    
     # Check if user is requesting their own result or is an admin
-    if g.user.get('uid') != result.get('user_id') and g.user.get('role') != UserRole.ADMIN:
+    if g.user.get('uid') != version['user_id'] and g.user.get('role') != UserRole.ADMIN:
         return jsonify({'message': 'Permission denied'}), 403
-        
-    return jsonify({'result': result}), 200
+    
+    exam_version = exam_service.get_exam_version(version['exam_id'], include_questions=True)
+    if not exam_version:
+        return jsonify({'message': 'Result not found'}), 404
+    modified = max(version['modified'], exam_version['modified'])
+    etag = make_etag('review', result_id, version['modified'], exam_version['modified'], exam_version['questions'])
+    if is_fresh(etag, modified):
+        return not_modified(etag, modified, RESULT_CACHE_CONTROL)
+    
+    review = grading_service.get_result_review(
+        result_id, (version['modified'], exam_version['modified'], exam_version['questions'])
+    )
+    if not review:
+        return jsonify({'message': 'Result not found'}), 404
+    
+    response = make_response(jsonify({'review': review}), 200)
+    return with_validators(response, etag, modified, RESULT_CACHE_CONTROL)
 
 @exam_bp.route('/users/<user_id>/results', methods=['GET'])
 @token_required
@@ -297,3 +743,41 @@ def get_user_results(user_id):
         
     results = grading_service.get_user_results(user_id)
     return jsonify({'results': results}), 200
+
+@exam_bp.route('/users/<user_id>/stats', methods=['GET'])
+@token_required
+def get_user_stats(user_id):
+    """Get a user's progress: attempts, average, best, latest and rolling average, overall and per category."""
+    if g.user.get('uid') != user_id and g.user.get('role') != UserRole.ADMIN:
+        return jsonify({'message': 'Permission denied'}), 403
+    
+    stats = grading_service.get_progress_stats(user_id)
+    if stats is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify(stats), 200
+
+@exam_bp.route('/users/<user_id>/results/summary', methods=['GET'])
+@token_required
+def get_user_result_summaries(user_id):
+    """Get a user's results newest first, one page at a time.
+
+    Only id, exam id, title and categories, score and completion time are
+    returned. Pass ``next`` from a page as ``?after=`` to get the next one;
+    ``limit`` defaults to 20 and is capped at 100.
+    """
+    if g.user.get('uid') != user_id and g.user.get('role') != UserRole.ADMIN:
+        return jsonify({'message': 'Permission denied'}), 403
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    
+    try:
+        page = grading_service.get_user_result_summaries(user_id, request.args.get('after'), limit)
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error getting result summaries: {e}")
+        return jsonify({'message': 'Failed to fetch results'}), 500
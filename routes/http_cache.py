@@ -0,0 +1,44 @@
+"""
+HTTP validator helpers for the CET Exam App routes
+
+Routes look up a cheap version of the resource first (a timestamp or two),
+answer 304 from it when the client's copy is current, and only otherwise
+build the full payload.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from flask import request, make_response
+
+
+def make_etag(*parts) -> str:
+    """Derive an ETag from the values that identify one version of a resource."""
+    return hashlib.sha1('\x00'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def is_fresh(etag: str, last_modified: Optional[datetime]) -> bool:
+    """True if the request's conditional headers match the current version."""
+    if request.if_none_match:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def not_modified(etag: str, last_modified: Optional[datetime], cache_control: str):
+    response = make_response('', 304)
+    return with_validators(response, etag, last_modified, cache_control)
+
+
+def with_validators(response, etag: str, last_modified: Optional[datetime], cache_control: str):
+    """Attach ETag, Last-Modified and Cache-Control to a response."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    # Responses depend on who is asking
+    response.vary.add('Authorization')
+    return response
@@ -25,9 +25,34 @@ CREATE TABLE IF NOT EXISTS questions (
     category VARCHAR(50) NOT NULL,
     explanation TEXT NOT NULL,
     difficulty_level INTEGER NOT NULL DEFAULT 1,
+    concept_ids TEXT,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS concept_ids TEXT;
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS sample_key DOUBLE PRECISION;
+UPDATE questions SET sample_key = random() WHERE sample_key IS NULL;
+-- Filled in at start-up for existing rows (services/question_dedupe.py)
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS content_hash VARCHAR(40);
+
+-- Full-text search over questions (kept in sync by ExamService, see services/question_search.py)
+CREATE TABLE IF NOT EXISTS question_search (
+    question_id INTEGER PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    document TSVECTOR NOT NULL
+);
+
+-- MinHash/LSH buckets for near-duplicate detection (see services/question_dedupe.py)
+CREATE TABLE IF NOT EXISTS question_buckets (
+    bucket BIGINT NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    PRIMARY KEY (bucket, question_id)
+);
+
+-- Concepts Table (keywords extracted from explanations)
+CREATE TABLE IF NOT EXISTS concepts (
+    id SERIAL PRIMARY KEY,
+    keyword TEXT UNIQUE NOT NULL
+);
 
 -- Options Table
 CREATE TABLE IF NOT EXISTS options (
@@ -76,8 +101,12 @@ CREATE TABLE IF NOT EXISTS exam_results (
     exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
     score FLOAT NOT NULL,
     max_score FLOAT NOT NULL,
-    completed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    completed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    idempotency_key VARCHAR(64),
+    regraded_at TIMESTAMP
 );
+ALTER TABLE exam_results ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+ALTER TABLE exam_results ADD COLUMN IF NOT EXISTS regraded_at TIMESTAMP;
 
 -- Result Answers Table
 CREATE TABLE IF NOT EXISTS result_answers (
@@ -95,21 +124,75 @@ CREATE TABLE IF NOT EXISTS category_scores (
     result_id INTEGER NOT NULL REFERENCES exam_results(id) ON DELETE CASCADE,
     category VARCHAR(50) NOT NULL,
     score FLOAT NOT NULL,
+    answered INTEGER,
     UNIQUE (result_id, category)
 );
+ALTER TABLE category_scores ADD COLUMN IF NOT EXISTS answered INTEGER;
+
+-- Recommendation Templates Table
+CREATE TABLE IF NOT EXISTS recommendation_templates (
+    id SERIAL PRIMARY KEY,
+    key VARCHAR(100) UNIQUE NOT NULL,
+    text TEXT NOT NULL
+);
 
 -- Recommendations Table
 CREATE TABLE IF NOT EXISTS recommendations (
     id SERIAL PRIMARY KEY,
     result_id INTEGER NOT NULL REFERENCES exam_results(id) ON DELETE CASCADE,
     category VARCHAR(50),
-    recommendation_text TEXT NOT NULL
+    recommendation_text TEXT NOT NULL DEFAULT '',
+    template_id INTEGER REFERENCES recommendation_templates(id),
+    params TEXT
+);
+ALTER TABLE recommendations ADD COLUMN IF NOT EXISTS template_id INTEGER REFERENCES recommendation_templates(id);
+ALTER TABLE recommendations ADD COLUMN IF NOT EXISTS params TEXT;
+
+-- Grading Jobs Table (background grading queue)
+CREATE TABLE IF NOT EXISTS grading_jobs (
+    id SERIAL PRIMARY KEY,
+    result_uuid VARCHAR(255) UNIQUE NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+    answers TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    idempotency_key VARCHAR(64),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE grading_jobs ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+ALTER TABLE grading_jobs ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255);
+ALTER TABLE grading_jobs ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+
+-- User Category Stats Table (running progress aggregates; category '*' is the whole exam)
+CREATE TABLE IF NOT EXISTS user_category_stats (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_sum FLOAT NOT NULL DEFAULT 0,
+    best_score FLOAT,
+    latest_score FLOAT,
+    latest_at TIMESTAMP,
+    rolling_average FLOAT,
+    UNIQUE (user_id, category)
 );
 
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
-CREATE INDEX IF NOT EXISTS idx_exams_is_active ON exams(is_active);
+CREATE INDEX IF NOT EXISTS idx_questions_sample ON questions(category, difficulty_level, sample_key);
+CREATE INDEX IF NOT EXISTS idx_questions_content_hash ON questions(content_hash);
+CREATE INDEX IF NOT EXISTS idx_question_search_document ON question_search USING GIN (document);
+CREATE INDEX IF NOT EXISTS idx_question_buckets_question_id ON question_buckets(question_id);
+CREATE INDEX IF NOT EXISTS idx_exams_active_created ON exams(is_active, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_exam_results_user_id ON exam_results(user_id);
+CREATE INDEX IF NOT EXISTS idx_exam_results_user_completed ON exam_results(user_id, completed_at, id);
 CREATE INDEX IF NOT EXISTS idx_result_answers_result_id ON result_answers(result_id);
+CREATE INDEX IF NOT EXISTS idx_result_answers_question_id ON result_answers(question_id, id);
 CREATE INDEX IF NOT EXISTS idx_category_scores_result_id ON category_scores(result_id);
 CREATE INDEX IF NOT EXISTS idx_recommendations_result_id ON recommendations(result_id);
+CREATE INDEX IF NOT EXISTS ix_grading_jobs_status ON grading_jobs(status);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_exam_results_idempotency_key ON exam_results(idempotency_key);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_grading_jobs_idempotency_key ON grading_jobs(idempotency_key);
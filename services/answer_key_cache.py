@@ -0,0 +1,204 @@
+"""
+Compiled answer keys for the CET Exam App grading path
+
+A cached key is only used while its exam's version (the exam's
+``updated_at``, its questions' latest ``updated_at`` and their count) is
+the one it was compiled from. The version is one indexed aggregate per
+lookup, so an edit made through another worker process is picked up by the
+next submission instead of grading against the old correct option.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import func
+
+from database import db
+from models.sql_models import Exam, ExamQuestion, Option, Question
+from services.concept_index import count_concepts, decode_concepts, load_keywords
+
+
+@dataclass(frozen=True)
+class AnswerKeyEntry:
+    """Everything grading needs to know about one question of an exam."""
+    question_id: int
+    question_uuid: str
+    correct_option: Optional[str]
+    category: str
+    explanation: str
+    concepts: Tuple[Tuple[str, int], ...]  # explanation keyword counts, first-seen order
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """Immutable answer key for an exam, in question order."""
+    exam_id: int
+    exam_uuid: str
+    entries: Tuple[AnswerKeyEntry, ...]
+    by_uuid: Mapping[str, AnswerKeyEntry]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def exam_version(exam_uuid: str) -> Optional[Tuple]:
+    """
+    Return what identifies the current version of an exam's answer key:
+    (exam ``updated_at``, latest question ``updated_at``, question count),
+    or None if the exam does not exist.
+
+    Every edit that can change a key bumps one of these: ``update_exam``
+    touches the exam, ``update_question`` the question (options included),
+    and adding or deleting questions changes the count.
+    """
+    row = (
+        db.session.query(Exam.updated_at, func.max(Question.updated_at), func.count(Question.id))
+        .outerjoin(ExamQuestion, ExamQuestion.exam_id == Exam.id)
+        .outerjoin(Question, Question.id == ExamQuestion.question_id)
+        .filter(Exam.uuid == exam_uuid)
+        .group_by(Exam.id, Exam.updated_at)
+        .first()
+    )
+    return tuple(row) if row else None
+
+
+def compile_answer_key(exam_uuid: str) -> Optional[AnswerKey]:
+    """
+    Build the answer key for an exam with a few set-based queries.
+
+    Returns None if the exam does not exist.
+    """
+    exam_row = db.session.query(Exam.id, Exam.uuid).filter(Exam.uuid == exam_uuid).first()
+    if not exam_row:
+        return None
+
+    rows = (
+        db.session.query(
+            Question.id, Question.uuid, Question.category, Question.explanation, Question.concept_ids
+        )
+        .join(ExamQuestion, ExamQuestion.question_id == Question.id)
+        .filter(ExamQuestion.exam_id == exam_row.id)
+        .order_by(ExamQuestion.question_order, ExamQuestion.id)
+        .all()
+    )
+
+    correct: Dict[int, str] = {}
+    if rows:
+        option_rows = (
+            db.session.query(Option.question_id, Option.option_id)
+            .filter(Option.question_id.in_([r.id for r in rows]), Option.is_correct.is_(True))
+            .order_by(Option.id)
+            .all()
+        )
+        for question_id, option_id in option_rows:
+            # first correct option wins, same as the per-question scan did
+            correct.setdefault(question_id, option_id)
+
+    encoded = {r.id: decode_concepts(r.concept_ids) for r in rows if r.concept_ids is not None}
+    keywords = load_keywords(concept_id for pairs in encoded.values() for concept_id, _ in pairs)
+
+    def concepts_for(row):
+        # Questions written before the concept index existed are tokenised here
+        if row.id not in encoded:
+            return tuple(count_concepts(row.explanation))
+        return tuple((keywords[concept_id], count) for concept_id, count in encoded[row.id] if concept_id in keywords)
+
+    entries = tuple(
+        AnswerKeyEntry(
+            question_id=r.id,
+            question_uuid=str(r.uuid),
+            correct_option=correct.get(r.id),
+            category=r.category,
+            explanation=r.explanation,
+            concepts=concepts_for(r)
+        )
+        for r in rows
+    )
+    return AnswerKey(
+        exam_id=exam_row.id,
+        exam_uuid=str(exam_row.uuid),
+        entries=entries,
+        by_uuid=MappingProxyType({e.question_uuid: e for e in entries})
+    )
+
+
+class AnswerKeyCache:
+    """
+    Thread-safe LRU of compiled answer keys, keyed by exam uuid.
+
+    Each key is stored with the exam version it was compiled from and is
+    recompiled when the exam's current version differs. Keys are compiled
+    outside the lock. A generation counter bumped on every
+    invalidation stops a compile that raced with an update from caching the
+    stale key.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._keys: 'OrderedDict[str, Tuple[Tuple, AnswerKey]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, exam_uuid: str) -> Optional[AnswerKey]:
+        """Return the answer key for an exam, compiling it on a miss or when the exam has changed."""
+        # Version first, so a concurrent edit can only make the key look older than it is
+        version = exam_version(exam_uuid)
+        if version is None:
+            return None
+
+        with self._lock:
+            entry = self._keys.get(exam_uuid)
+            if entry is not None:
+                if entry[0] == version:
+                    self._keys.move_to_end(exam_uuid)
+                    return entry[1]
+                # Edited elsewhere since it was compiled
+                del self._keys[exam_uuid]
+            generation = self._generation
+
+        key = compile_answer_key(exam_uuid)
+        if key is None:
+            return None
+
+        with self._lock:
+            if generation == self._generation:
+                self._keys[exam_uuid] = (version, key)
+                self._keys.move_to_end(exam_uuid)
+                while len(self._keys) > self.max_size:
+                    self._keys.popitem(last=False)
+        return key
+
+    def invalidate(self, exam_uuids: Iterable[str]) -> None:
+        """Drop the cached keys for the given exams."""
+        with self._lock:
+            self._generation += 1
+            for exam_uuid in exam_uuids:
+                self._keys.pop(exam_uuid, None)
+
+    def invalidate_for_question(self, question_id: int) -> None:
+        """Drop the cached keys of every exam that contains a question."""
+        self.invalidate(exam_uuids_for_question(question_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._keys.clear()
+
+
+def exam_uuids_for_question(question_id: int) -> list:
+    """Return the uuids of all exams that include a question (by internal id)."""
+    rows = (
+        db.session.query(Exam.uuid)
+        .join(ExamQuestion, ExamQuestion.exam_id == Exam.id)
+        .filter(ExamQuestion.question_id == question_id)
+        .all()
+    )
+    return [str(r.uuid) for r in rows]
+
+
+# Shared by every service in the process
+answer_key_cache = AnswerKeyCache(int(os.getenv('ANSWER_KEY_CACHE_SIZE', '256')))
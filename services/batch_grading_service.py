@@ -0,0 +1,221 @@
+"""
+Vectorized batch grading for the CET Exam App
+
+Grades a whole batch of answer sheets for one exam as a candidates x
+questions matrix instead of one grade_exam call per student.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from database import db
+from services.answer_key_cache import AnswerKey
+from services.grading_service import GradingService
+from services.id_resolver import id_resolver, USER
+from services.result_writer import GradedResult, write_results
+
+# Stands in for a question missing from a sheet; compares unequal to every answer
+UNANSWERED = object()
+
+class _ExamMatrix:
+    """Per-batch numeric form of an answer key."""
+
+    def __init__(self, answer_key: AnswerKey):
+        self.answer_key = answer_key
+        self.question_uuids = [e.question_uuid for e in answer_key.entries]
+        self.question_ids = [e.question_id for e in answer_key.entries]
+
+        # Compared elementwise against a chunk's selected options
+        self.correct_options = np.empty(len(self.question_uuids), dtype=object)
+        self.correct_options[:] = [e.correct_option for e in answer_key.entries]
+
+        # One-hot question -> category, in order of first appearance in the exam
+        self.categories: List[str] = []
+        for e in answer_key.entries:
+            if e.category not in self.categories:
+                self.categories.append(e.category)
+        self.category_matrix = np.zeros((len(self.question_uuids), len(self.categories)), dtype=np.int32)
+        for q, e in enumerate(answer_key.entries):
+            self.category_matrix[q, self.categories.index(e.category)] = 1
+
+        # Question -> missed-concept keyword counts from the concept index
+        self.keywords: List[str] = []
+        keyword_index: Dict[str, int] = {}
+        cells: List[Tuple[int, int, int]] = []
+        for q, e in enumerate(answer_key.entries):
+            for word, count in e.concepts:
+                if word not in keyword_index:
+                    keyword_index[word] = len(self.keywords)
+                    self.keywords.append(word)
+                cells.append((q, keyword_index[word], count))
+        self.keyword_matrix = np.zeros((len(self.question_uuids), len(self.keywords)), dtype=np.int32)
+        for q, k, count in cells:
+            self.keyword_matrix[q, k] = count
+        # Keywords of each question, and their position in (question, explanation) order
+        self.question_keywords = [np.flatnonzero(row) for row in self.keyword_matrix]
+        self.keyword_rank = np.full(self.keyword_matrix.shape, len(cells), dtype=np.int32)
+        for rank, (q, k, _) in enumerate(cells):
+            self.keyword_rank[q, k] = rank
+
+class BatchGradingService:
+    """Service for grading many offline answer sheets for one exam at once."""
+
+    def __init__(self, chunk_size: int = 2000):
+        self.chunk_size = chunk_size
+        self.grading_service = GradingService()
+
+    def grade_batch(self, exam_id: str, submissions: List[Dict]) -> Dict:
+        """
+        Grade and store a batch of submissions for one exam.
+
+        Each chunk of ``chunk_size`` sheets is scored with matrix operations
+        against the answer key and written with one bulk insert per table, then
+        committed. A chunk that fails is rolled back and its sheets are listed
+        in ``errors``; the chunks already committed stay in ``results``.
+
+        Args:
+            exam_id: Public ID of the exam
+            submissions: List of ``{'user_id': ..., 'answers': {question ID: option ID}}``
+
+        Returns:
+            Dict with ``graded`` count, per-sheet ``results`` and per-sheet ``errors``
+        """
+        try:
+            answer_key = self.grading_service.get_answer_key(exam_id)
+            matrix = _ExamMatrix(answer_key)
+            user_ids = self._resolve_users(submissions)
+
+            results = []
+            errors = []
+            for start in range(0, len(submissions), self.chunk_size):
+                valid = []
+                for index in range(start, min(start + self.chunk_size, len(submissions))):
+                    sheet = submissions[index]
+                    if not isinstance(sheet, dict) or not isinstance(sheet.get('answers'), dict):
+                        errors.append({'index': index, 'message': 'Missing or invalid field: answers'})
+                        continue
+                    user_pk = user_ids.get(sheet.get('user_id'))
+                    if user_pk is None:
+                        errors.append({'index': index, 'message': 'User not found'})
+                        continue
+                    valid.append((index, user_pk, sheet['user_id'], sheet['answers']))
+
+                if not valid:
+                    continue
+
+                # Earlier chunks are already committed, so a failed chunk is
+                # reported against its sheets instead of failing the whole batch
+                try:
+                    graded = self._grade_chunk(matrix, valid)
+                    write_results(graded)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error grading sheets {valid[0][0]}-{valid[-1][0]}: {e}")
+                    errors.extend({'index': index, 'message': 'Grading failed'} for index, _, _, _ in valid)
+                    continue
+
+                for (index, _, user_uid, _), result in zip(valid, graded):
+                    results.append({
+                        'index': index,
+                        'user_id': user_uid,
+                        'resultId': result.uuid,
+                        'score': result.score
+                    })
+
+            return {'graded': len(results), 'results': results, 'errors': errors}
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error grading batch: {e}")
+            raise
+
+    def _resolve_users(self, submissions: List[Dict]) -> Dict[str, int]:
+        """Map every user ID in the batch to its internal id, through the shared ID cache."""
+        return id_resolver.resolve_many(USER, (
+            s.get('user_id') for s in submissions
+            if isinstance(s, dict) and isinstance(s.get('user_id'), str)
+        ))
+
+    def _grade_chunk(self, matrix: _ExamMatrix, sheets: List[Tuple]) -> List[GradedResult]:
+        uuids = matrix.question_uuids
+        num_questions = len(uuids)
+
+        # Selected options as an object matrix, compared with == like grade_exam does
+        selected = np.empty((len(sheets), num_questions), dtype=object)
+        for row, (_, _, _, answers) in enumerate(sheets):
+            selected[row] = [answers.get(u, UNANSWERED) for u in uuids]
+
+        answered = selected != UNANSWERED
+        correct = answered & (selected == matrix.correct_options)
+
+        # Overall and per-category scores
+        scores = (correct.sum(axis=1) / num_questions) * 100
+        category_correct = correct.astype(np.int32) @ matrix.category_matrix
+        category_total = answered.astype(np.int32) @ matrix.category_matrix
+        with np.errstate(divide='ignore', invalid='ignore'):
+            category_pct = (category_correct / category_total) * 100
+
+        # Missed-concept keyword counts over every question not answered correctly
+        top_keywords = top_counts = None
+        if matrix.keywords:
+            missed = ~correct
+            keyword_counts = missed.astype(np.int32) @ matrix.keyword_matrix
+            # grade_exam breaks ties by the keyword's first appearance among the
+            # missed questions' explanations, so find that position per row
+            first_missed = np.full(keyword_counts.shape, np.iinfo(np.int32).max, dtype=np.int32)
+            for q in range(num_questions - 1, -1, -1):
+                columns = matrix.question_keywords[q]
+                if len(columns):
+                    first_missed[:, columns] = np.where(
+                        missed[:, q, None], matrix.keyword_rank[q, columns], first_missed[:, columns]
+                    )
+            top_keywords = np.lexsort((first_missed, -keyword_counts), axis=1)[:, :3]
+            top_counts = np.take_along_axis(keyword_counts, top_keywords, axis=1)
+
+        # Recommendation levels per category (weak < 50 <= basic < 70 <= strong), -1 if unanswered
+        levels = np.where(category_total > 0, np.digitize(np.nan_to_num(category_pct), [50, 70]), -1)
+
+        # Everything the per-sheet loop reads, converted to Python objects once per chunk
+        score_rows = scores.tolist()
+        selected_rows = np.where(answered, selected, None).tolist()
+        correct_rows = correct.tolist()
+        pct_rows = category_pct.tolist()
+        total_rows = category_total.tolist()
+        level_rows = [tuple(r) for r in levels.tolist()]
+        concept_rows = [[]] * len(sheets)
+        if top_keywords is not None:
+            titles = [k.title() for k in matrix.keywords]
+            concept_rows = [
+                [titles[k] for k, count in zip(ks, counts) if count > 1]
+                for ks, counts in zip(top_keywords.tolist(), top_counts.tolist())
+            ]
+
+        categories = matrix.categories
+        exam_pk = matrix.answer_key.exam_id
+        recommendation_memo: Dict = {}
+        graded = []
+        for row, (_, user_pk, _, _) in enumerate(sheets):
+            category_scores = {c: pct for c, pct, total in zip(categories, pct_rows[row], total_rows[row]) if total}
+            missed_concepts = concept_rows[row]
+
+            # Recommendations only depend on the score bands and the missed concepts
+            avg_score = sum(category_scores.values()) / len(category_scores) if category_scores else 0
+            band = 3 if avg_score >= 90 else 2 if avg_score >= 70 else 1 if avg_score >= 50 else 0
+            memo_key = (level_rows[row], band, tuple(missed_concepts))
+            recommendations = recommendation_memo.get(memo_key)
+            if recommendations is None:
+                recommendations = self.grading_service._build_recommendations(category_scores, missed_concepts)
+                recommendation_memo[memo_key] = recommendations
+
+            graded.append(GradedResult(
+                user_id=user_pk,
+                exam_id=exam_pk,
+                score=score_rows[row],
+                max_score=100.0,
+                answers=list(zip(matrix.question_ids, selected_rows[row], correct_rows[row])),
+                category_scores=category_scores,
+                recommendations=recommendations,
+                category_answered={c: total for c, total in zip(categories, total_rows[row]) if total}
+            ))
+        return graded
@@ -0,0 +1,181 @@
+"""
+Streaming bulk export for the CET Exam App
+
+Dumps the question bank (with options) or one exam's results (with
+answers) as CSV or JSON Lines. Each export is a single joined query read
+through a server-side cursor (``stream_results``) ``yield_per`` rows at a
+time, and the output is produced as text chunks, so memory stays flat
+however many rows ``result_answers`` holds and clients receive the first
+bytes straight away.
+
+CSV has one row per option or answer, with the question or result
+columns repeated; JSONL has one object per question or result with the
+options or answers nested.
+"""
+
+import csv
+import io
+import json
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from database import db
+from models.sql_models import ExamResult, Option, Question, ResultAnswer, User
+from services.id_resolver import id_resolver, EXAM
+
+FORMATS = ('csv', 'jsonl')
+
+# Rows fetched per round trip, and rows per yielded text chunk
+YIELD_PER = 2000
+
+QUESTION_COLUMNS = [
+    'question_id', 'category', 'difficulty_level', 'text', 'explanation',
+    'option_id', 'option_text', 'is_correct'
+]
+
+RESULT_COLUMNS = [
+    'result_id', 'user_id', 'user_email', 'score', 'max_score', 'completed_at',
+    'question_id', 'selected_option_id', 'is_correct'
+]
+
+
+def export_questions(fmt: str, categories: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Stream the question bank with its options.
+
+    Args:
+        fmt: ``csv`` or ``jsonl``
+        categories: Only these categories; None for every question
+
+    Raises:
+        ValueError: If the format is not supported (raised before streaming starts)
+    """
+    _check_format(fmt)
+    query = (
+        select(
+            Question.id, Question.uuid, Question.category, Question.difficulty_level,
+            Question.text, Question.explanation,
+            Option.option_id, Option.text.label('option_text'), Option.is_correct
+        )
+        .join(Option, Option.question_id == Question.id)
+        .order_by(Question.id, Option.id)
+    )
+    if categories:
+        query = query.where(Question.category.in_(categories))
+
+    def csv_row(row) -> Sequence:
+        return (row.uuid, row.category, row.difficulty_level, row.text, row.explanation,
+                row.option_id, row.option_text, row.is_correct)
+
+    def new_record(row) -> dict:
+        return {
+            'id': row.uuid,
+            'category': row.category,
+            'difficulty_level': row.difficulty_level,
+            'text': row.text,
+            'explanation': row.explanation,
+            'options': []
+        }
+
+    def add_child(record: dict, row) -> None:
+        record['options'].append({'id': row.option_id, 'text': row.option_text, 'is_correct': row.is_correct})
+
+    return _stream(query, fmt, QUESTION_COLUMNS, csv_row, new_record, add_child)
+
+
+def export_results(exam_id: str, fmt: str) -> Iterator[str]:
+    """
+    Stream every result of an exam with its answers.
+
+    Args:
+        exam_id: Public ID of the exam
+        fmt: ``csv`` or ``jsonl``
+
+    Raises:
+        ValueError: If the exam does not exist or the format is not supported
+            (raised before streaming starts)
+    """
+    _check_format(fmt)
+    exam_pk = id_resolver.resolve(EXAM, exam_id)
+    if exam_pk is None:
+        raise ValueError("Exam not found")
+
+    query = (
+        select(
+            ExamResult.id, ExamResult.uuid, User.uid, User.email,
+            ExamResult.score, ExamResult.max_score, ExamResult.completed_at,
+            Question.uuid.label('question_uuid'), ResultAnswer.selected_option_id,
+            ResultAnswer.is_correct
+        )
+        .join(User, User.id == ExamResult.user_id)
+        .join(ResultAnswer, ResultAnswer.result_id == ExamResult.id)
+        .join(Question, Question.id == ResultAnswer.question_id)
+        .where(ExamResult.exam_id == exam_pk)
+        .order_by(ExamResult.id, ResultAnswer.id)
+    )
+
+    def csv_row(row) -> Sequence:
+        return (row.uuid, row.uid, row.email, row.score, row.max_score, row.completed_at.isoformat(),
+                row.question_uuid, row.selected_option_id, row.is_correct)
+
+    def new_record(row) -> dict:
+        return {
+            'id': row.uuid,
+            'user_id': row.uid,
+            'user_email': row.email,
+            'score': row.score,
+            'max_score': row.max_score,
+            'completed_at': row.completed_at.isoformat(),
+            'answers': []
+        }
+
+    def add_child(record: dict, row) -> None:
+        record['answers'].append({
+            'question_id': row.question_uuid,
+            'selected_option': row.selected_option_id,
+            'is_correct': row.is_correct
+        })
+
+    return _stream(query, fmt, RESULT_COLUMNS, csv_row, new_record, add_child)
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt} (use csv or jsonl)")
+
+
+def _stream(query, fmt: str, columns: List[str], csv_row: Callable, new_record: Callable,
+            add_child: Callable) -> Iterator[str]:
+    """Run ``query`` through a server-side cursor and render it a chunk at a time."""
+    rows = db.session.execute(query.execution_options(stream_results=True, yield_per=YIELD_PER))
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for partition in rows.partitions():
+            writer.writerows(csv_row(row) for row in partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    # Rows arrive grouped by parent id; emit each record once its last child is read
+    record = None
+    record_pk = None
+    for partition in rows.partitions():
+        lines = []
+        for row in partition:
+            if row.id != record_pk:
+                if record is not None:
+                    lines.append(json.dumps(record))
+                record = new_record(row)
+                record_pk = row.id
+            add_child(record, row)
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    if record is not None:
+        yield json.dumps(record) + '\n'
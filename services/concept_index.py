@@ -0,0 +1,71 @@
+"""
+Concept keyword index for the CET Exam App
+
+Explanation keywords are extracted once when a question is written and kept
+on the question as a compact list of concept ids with occurrence counts, so
+grading only has to add up precomputed counters.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models.sql_models import Concept
+
+def count_concepts(explanation: str) -> List[Tuple[str, int]]:
+    """
+    Return (keyword, count) pairs for an explanation, in order of first appearance.
+
+    A keyword is any alphabetic word longer than 4 characters, lowercased.
+    """
+    counts: Dict[str, int] = {}
+    for word in (explanation or '').lower().split():
+        if len(word) > 4 and word.isalpha():
+            counts[word] = counts.get(word, 0) + 1
+    return list(counts.items())
+
+def encode_concepts(pairs: Iterable[Tuple[int, int]]) -> str:
+    """Encode (concept id, count) pairs as ``"id:count,id:count"``."""
+    return ','.join(f"{concept_id}:{count}" for concept_id, count in pairs)
+
+def decode_concepts(value: Optional[str]) -> List[Tuple[int, int]]:
+    """Decode the ``concept_ids`` column back into (concept id, count) pairs."""
+    if not value:
+        return []
+    pairs = []
+    for item in value.split(','):
+        concept_id, _, count = item.partition(':')
+        pairs.append((int(concept_id), int(count or 1)))
+    return pairs
+
+def resolve_concepts(keywords: List[str]) -> Dict[str, int]:
+    """Map keywords to concept ids, creating any that do not exist yet."""
+    if not keywords:
+        return {}
+
+    ids = dict(db.session.query(Concept.keyword, Concept.id).filter(Concept.keyword.in_(keywords)).all())
+    missing = [k for k in keywords if k not in ids]
+    if missing:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Concept.__table__), [{'keyword': k} for k in missing])
+        except IntegrityError:
+            # Another writer created some of them first
+            pass
+        ids.update(db.session.query(Concept.keyword, Concept.id).filter(Concept.keyword.in_(missing)).all())
+    return ids
+
+def index_explanation(explanation: str) -> str:
+    """Extract an explanation's keywords and return the encoded ``concept_ids`` value."""
+    pairs = count_concepts(explanation)
+    ids = resolve_concepts([keyword for keyword, _ in pairs])
+    return encode_concepts((ids[keyword], count) for keyword, count in pairs)
+
+def load_keywords(concept_ids: Iterable[int]) -> Dict[int, str]:
+    """Look up the keywords for a set of concept ids in one query."""
+    concept_ids = list(set(concept_ids))
+    if not concept_ids:
+        return {}
+    return dict(db.session.query(Concept.id, Concept.keyword).filter(Concept.id.in_(concept_ids)).all())
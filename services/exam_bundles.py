@@ -0,0 +1,143 @@
+"""
+Precompressed exam delivery bundles for the CET Exam App
+
+When an exam is activated, its ``{"exam": ...}`` snapshot body is compressed
+once with gzip (and brotli, if the ``brotli`` package is installed) and
+written to disk under ``EXAM_BUNDLE_DIR/<exam uuid>/<digest>.json.<ext>``,
+where the digest names the exact body version. The exam route serves the
+variant the client accepts straight from the file, so opening an exam costs
+no compression work per request and the server can hand the file to the
+WSGI server's file wrapper (or to the proxy with ``USE_X_SENDFILE``).
+
+A request that finds no bundle for the current version (an edited question,
+a restart with an empty directory) gets the uncompressed body and schedules
+a background publish; files of older versions are removed on publish.
+"""
+
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import List, Optional, Set, Tuple
+
+try:
+    import brotli
+except ImportError:  # gzip bundles only
+    brotli = None
+
+from services.exam_snapshot import ExamSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exam_bundles')
+
+# Preferred first when the client accepts several
+SUFFIXES = {'br': '.json.br', 'gzip': '.json.gz'}
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    # mtime=0 keeps the bytes identical across republishes of the same body
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class ExamBundleStore:
+    """Writes, finds and removes the precompressed bundles of exams."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.encodings = [e for e in SUFFIXES if e != 'br' or brotli is not None]
+        self._pending: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def path(self, snapshot: ExamSnapshot, encoding: str) -> str:
+        return os.path.join(self.directory, snapshot.exam_id, snapshot.digest + SUFFIXES[encoding])
+
+    def find(self, snapshot: ExamSnapshot, accept_encodings) -> Optional[Tuple[str, str]]:
+        """
+        Pick the published bundle to serve for a request.
+
+        Args:
+            snapshot: Current snapshot of the exam
+            accept_encodings: ``request.accept_encodings``
+
+        Returns:
+            (encoding, path), or None if the client accepts none of the
+            published encodings or the bundle is not published yet
+        """
+        for encoding in self.encodings:
+            if accept_encodings[encoding] <= 0:
+                continue
+            path = self.path(snapshot, encoding)
+            if os.path.isfile(path):
+                return encoding, path
+            # Published together; if this one is missing the rest are too
+            self.publish_async(snapshot)
+            return None
+        return None
+
+    def publish(self, snapshot: ExamSnapshot) -> List[str]:
+        """
+        Write every encoding of a snapshot and remove older versions.
+
+        Returns:
+            list: Paths written
+        """
+        exam_dir = os.path.join(self.directory, snapshot.exam_id)
+        os.makedirs(exam_dir, exist_ok=True)
+
+        paths = []
+        for encoding in self.encodings:
+            path = self.path(snapshot, encoding)
+            if not os.path.isfile(path):
+                # Write then rename, so a concurrent reader never sees a partial file
+                fd, tmp_path = tempfile.mkstemp(dir=exam_dir, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(_compress(encoding, snapshot.body))
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            paths.append(path)
+
+        keep = {os.path.basename(p) for p in paths}
+        for name in os.listdir(exam_dir):
+            if name not in keep and not name.endswith('.tmp'):
+                try:
+                    os.unlink(os.path.join(exam_dir, name))
+                except FileNotFoundError:
+                    pass
+        return paths
+
+    def publish_async(self, snapshot: ExamSnapshot) -> None:
+        """Publish in a background thread, at most once per exam version at a time."""
+        if not snapshot.is_active:
+            return
+        key = (snapshot.exam_id, snapshot.digest)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+
+        def run():
+            try:
+                self.publish(snapshot)
+            except Exception:
+                logger.exception("Failed to publish bundles for exam %s", snapshot.exam_id)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        threading.Thread(target=run, name='exam-bundle-publish', daemon=True).start()
+
+    def remove(self, exam_uuid: str) -> None:
+        """Delete every published bundle of an exam."""
+        shutil.rmtree(os.path.join(self.directory, exam_uuid), ignore_errors=True)
+
+
+# Shared by the exam routes, ExamService and the CLI
+exam_bundles = ExamBundleStore(os.getenv('EXAM_BUNDLE_DIR', DEFAULT_DIR))
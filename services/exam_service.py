@@ -2,14 +2,33 @@
 Exam service for the CET Exam App with PostgreSQL
 """
 
+import hashlib
 import uuid
 from datetime import datetime
-from typing import List, Dict, Optional, Union
+from typing import Dict, Iterator, List, Optional, Union
+
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import joinedload, selectinload
 
 from database import db
 from models.sql_models import (
     Question, Option, Exam, ExamCategory, ExamQuestion, 
-    User, SubjectCategory, SubjectCategoryModel
+    ExamResult, User, SubjectCategory, SubjectCategoryModel
+)
+from services.answer_key_cache import answer_key_cache, exam_uuids_for_question
+from services.regrade_service import regrade_service
+from services.result_review import review_cache
+from services.exam_snapshot import ExamSnapshot, exam_snapshot_cache
+from services.exam_bundles import exam_bundles
+from services.concept_index import index_explanation
+from services.id_resolver import id_resolver, EXAM, QUESTION
+from services import progress_stats, question_dedupe, question_sampler, question_search
+
+# Everything Exam.to_dict touches, in three queries however many exams are loaded
+EXAM_DICT_LOADS = (
+    selectinload(Exam.categories),
+    selectinload(Exam.exam_questions).joinedload(ExamQuestion.question).load_only(Question.uuid),
 )
 
 class ExamService:
@@ -20,7 +39,20 @@ class ExamService:
                        category: Union[str, SubjectCategory], 
                        options: List[Dict], 
                        explanation: str,
-                       difficulty_level: int = 1) -> str:
+                       difficulty_level: int = 1,
+                       reject_duplicates: bool = False) -> str:
+        """
+        Create a question with its options.
+
+        Raises:
+            DuplicateQuestionError: If ``reject_duplicates`` is set and a
+                near-duplicate is already in the bank
+        """
+        fp = question_dedupe.fingerprint(text, [opt.get('text', '') for opt in options])
+        if reject_duplicates:
+            matches = question_dedupe.match([fp])[0]
+            if matches:
+                raise question_dedupe.DuplicateQuestionError(matches)
         
         try:
             # Convert string category to enum if needed
@@ -36,6 +68,8 @@ class ExamService:
                 explanation=explanation,
                 difficulty_level=difficulty_level
             )
+            question.concept_ids = index_explanation(explanation)
+            question.content_hash = fp.content_hash
             
             db.session.add(question)
             db.session.flush()  # Flush to get the question ID
@@ -50,6 +84,8 @@ class ExamService:
                 )
                 db.session.add(option)
             
+            question_search.index_question(question.id)
+            question_dedupe.add_buckets([(question.id, fp)])
             db.session.commit()
             # ensure return value is a plain string (sqlalchemy may return ColumnElement)
             return str(question.uuid)
@@ -83,11 +119,25 @@ class ExamService:
                 question.category = category
             if 'explanation' in updates:
                 question.explanation = updates['explanation']
+                question.concept_ids = index_explanation(updates['explanation'])
             if 'difficulty_level' in updates:
                 question.difficulty_level = updates['difficulty_level']
                 
             # Update options if provided
+            key_changed = False
             if 'options' in updates:
+                old_correct = (
+                    db.session.query(Option.option_id)
+                    .filter_by(question_id=question.id, is_correct=True)
+                    .order_by(Option.id)
+                    .first()
+                )
+                new_correct = next(
+                    (str(i+1) for i, opt in enumerate(updates['options']) if opt.get('is_correct', False)),
+                    None
+                )
+                key_changed = (old_correct[0] if old_correct else None) != new_correct
+                
                 # Delete existing options
                 Option.query.filter_by(question_id=question.id).delete()
                 
@@ -102,7 +152,18 @@ class ExamService:
                     db.session.add(option)
             
             question.updated_at = datetime.now()
+            question_search.index_question(question.id)
+            if 'text' in updates or 'options' in updates:
+                question_dedupe.index_question(question.id)
             db.session.commit()
+            affected_exams = exam_uuids_for_question(question.id)
+            answer_key_cache.invalidate(affected_exams)
+            review_cache.invalidate(affected_exams)
+            exam_snapshot_cache.invalidate(affected_exams)
+            
+            # Fix up results that were graded against the old correct option
+            if key_changed:
+                regrade_service.schedule(question.id)
             return True
         except Exception as e:
             db.session.rollback()
@@ -116,8 +177,16 @@ class ExamService:
             if not question:
                 return False
                 
+            # Collect affected exams before the exam_questions rows cascade away
+            affected_exams = exam_uuids_for_question(question.id)
+            question_search.remove(question.id)
+            question_dedupe.remove(question.id)
             db.session.delete(question)
             db.session.commit()
+            id_resolver.evict(QUESTION, [question_id])
+            answer_key_cache.invalidate(affected_exams)
+            review_cache.invalidate(affected_exams)
+            exam_snapshot_cache.invalidate(affected_exams)
             return True
         except Exception as e:
             db.session.rollback()
@@ -134,7 +203,43 @@ class ExamService:
         except Exception as e:
             print(f"Error getting questions by category: {e}")
             return []
-    
+
+    def iter_questions(self,
+                       categories: Optional[List[str]] = None,
+                       after: Optional[str] = None,
+                       limit: Optional[int] = None,
+                       chunk_size: int = 500) -> Iterator[Question]:
+        """
+        Iterate over questions with their options, in ID order, a chunk at a time.
+
+        One query for the questions, streamed ``chunk_size`` rows at a time,
+        plus one options query per chunk; nothing holds the whole bank.
+
+        Args:
+            categories: Only these categories; None means every category in
+                the subject category table
+            after: ID of the last question of the previous page, or None to start at the beginning
+            limit: Stop after this many questions; None for all of them
+            chunk_size: Rows fetched per round trip
+
+        Raises:
+            ValueError: If ``after`` is not a question ID (raised here, before iteration starts)
+        """
+        query = Question.query.options(selectinload(Question.options))
+        if categories is None:
+            query = query.filter(Question.category.in_(select(SubjectCategoryModel.name)))
+        else:
+            query = query.filter(Question.category.in_(categories))
+        if after:
+            after_pk = id_resolver.resolve(QUESTION, after)
+            if after_pk is None:
+                raise ValueError("Invalid cursor")
+            query = query.filter(Question.id > after_pk)
+        query = query.order_by(Question.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return iter(query.yield_per(chunk_size))
+
     def create_exam(self, 
                    title: str, 
                    description: str, 
@@ -155,34 +260,15 @@ class ExamService:
             str: ID of the created exam
         """
         try:
-            # Create exam
-            exam = Exam(
-                title=title,
-                description=description,
-                duration_minutes=duration_minutes
-            )
-            
-            db.session.add(exam)
-            db.session.flush()  # Flush to get the exam ID
-            
-            # Add categories
-            for cat in categories:
-                if isinstance(cat, SubjectCategory):
-                    cat = cat.value
-                    
-                exam_category = ExamCategory(
-                    exam_id=exam.id,
-                    category=cat
-                )
-                db.session.add(exam_category)
+            exam = self._add_exam(title, description, duration_minutes, categories)
             
-            # Add questions
+            # Add questions, resolved in one query; unknown IDs are skipped
+            question_pks = id_resolver.resolve_many(QUESTION, question_ids)
             for i, q_id in enumerate(question_ids):
-                question = Question.query.filter_by(uuid=q_id).first()
-                if question:
+                if q_id in question_pks:
                     exam_question = ExamQuestion(
                         exam_id=exam.id,
-                        question_id=question.id,
+                        question_id=question_pks[q_id],
                         question_order=i
                     )
                     db.session.add(exam_question)
@@ -194,14 +280,130 @@ class ExamService:
             print(f"Error creating exam: {e}")
             raise
     
+    def assemble_exam(self,
+                      title: str,
+                      description: str,
+                      duration_minutes: int,
+                      blueprint: List[Dict],
+                      categories: Optional[List[Union[str, SubjectCategory]]] = None,
+                      seed: Optional[str] = None) -> str:
+        """
+        Create an exam from a blueprint, drawing its questions in the database.
+        
+        Args:
+            title: Exam title
+            description: Exam description
+            duration_minutes: Duration in minutes
+            blueprint: List of ``{"category", "difficulty_level", "count"}`` dicts,
+                e.g. 20 reasoning questions at difficulty 2
+            categories: Subject categories covered; defaults to the blueprint's categories
+            seed: Makes the draw repeatable; pass a student's ID for their own variant
+            
+        Returns:
+            str: ID of the created exam
+            
+        Raises:
+            ValueError: If the blueprint is malformed or a pool holds too few questions
+        """
+        try:
+            question_pks = question_sampler.sample(blueprint, seed)
+            if categories is None:
+                categories = list(dict.fromkeys(part['category'] for part in blueprint))
+            
+            exam = self._add_exam(title, description, duration_minutes, categories)
+            db.session.add_all([
+                ExamQuestion(exam_id=exam.id, question_id=question_pk, question_order=i)
+                for i, question_pk in enumerate(question_pks)
+            ])
+            db.session.commit()
+            return str(exam.uuid)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error assembling exam: {e}")
+            raise
+    
+    def sample_questions(self, blueprint: List[Dict], seed: Optional[str] = None) -> List[str]:
+        """Draw question IDs for a blueprint without creating an exam (a preview of assemble_exam)."""
+        question_pks = question_sampler.sample(blueprint, seed)
+        uuids = dict(db.session.query(Question.id, Question.uuid).filter(Question.id.in_(question_pks)))
+        return [uuids[question_pk] for question_pk in question_pks]
+    
+    def search_questions(self, query: str, categories: Optional[List[str]] = None,
+                         difficulty_level: Optional[int] = None, offset: int = 0, limit: int = 20) -> Dict:
+        """Full-text search over question text, explanations and options, best match first."""
+        return question_search.search(query, categories, difficulty_level, offset, limit)
+    
+    def find_duplicate_questions(self, text: str, options: List[Dict]) -> List[Dict]:
+        """Near-duplicates of a question already in the bank, most similar first."""
+        return question_dedupe.find_duplicates(text, [opt.get('text', '') for opt in options])
+    
+    def get_question_pool_sizes(self, categories: Optional[List[str]] = None) -> Dict[str, Dict[int, int]]:
+        """Count questions per category and difficulty level, for building blueprints."""
+        return question_sampler.pool_sizes(categories)
+    
+    def _add_exam(self, title: str, description: str, duration_minutes: int,
+                  categories: List[Union[str, SubjectCategory]]) -> Exam:
+        """Add an exam with its categories to the session, flushed so it has an ID."""
+        exam = Exam(
+            title=title,
+            description=description,
+            duration_minutes=duration_minutes
+        )
+        
+        db.session.add(exam)
+        db.session.flush()  # Flush to get the exam ID
+        
+        # Add categories
+        for cat in categories:
+            if isinstance(cat, SubjectCategory):
+                cat = cat.value
+                
+            exam_category = ExamCategory(
+                exam_id=exam.id,
+                category=cat
+            )
+            db.session.add(exam_category)
+        return exam
+    
     def get_exam(self, exam_id: str) -> Optional[Exam]:
         """Get an exam by ID."""
         try:
-            return Exam.query.filter_by(uuid=exam_id).first()
+            return Exam.query.options(*EXAM_DICT_LOADS).filter_by(uuid=exam_id).first()
         except Exception as e:
             print(f"Error getting exam: {e}")
             return None
     
+    def get_exam_version(self, exam_id: str, include_questions: bool = False) -> Optional[Dict]:
+        """
+        Get what identifies the current version of an exam without loading it.
+        
+        Exams change through update_exam, which bumps ``updated_at``; with
+        questions included, edits to those questions and their count count too.
+        
+        Returns:
+            Dict with ``modified`` and ``questions`` (count, or None), or None if the exam does not exist
+        """
+        try:
+            exam = db.session.query(Exam.id, Exam.updated_at).filter(Exam.uuid == exam_id).first()
+            if not exam:
+                return None
+            
+            version = {'modified': exam.updated_at, 'questions': None}
+            if include_questions:
+                latest, count = (
+                    db.session.query(func.max(Question.updated_at), func.count(Question.id))
+                    .join(ExamQuestion, ExamQuestion.question_id == Question.id)
+                    .filter(ExamQuestion.exam_id == exam.id)
+                    .one()
+                )
+                if latest and latest > exam.updated_at:
+                    version['modified'] = latest
+                version['questions'] = count
+            return version
+        except Exception as e:
+            print(f"Error getting exam version: {e}")
+            return None
+    
     def update_exam(self, exam_id: str, updates: Dict) -> bool:
         """Update an exam with the provided fields."""
         try:
@@ -216,6 +418,7 @@ class ExamService:
                 exam.description = updates['description']
             if 'duration_minutes' in updates:
                 exam.duration_minutes = updates['duration_minutes']
+            was_active = exam.is_active
             if 'is_active' in updates:
                 exam.is_active = updates['is_active']
                 
@@ -240,19 +443,31 @@ class ExamService:
                 # Delete existing questions
                 ExamQuestion.query.filter_by(exam_id=exam.id).delete()
                 
-                # Add new questions
+                # Add new questions, resolved in one query; unknown IDs are skipped
+                question_pks = id_resolver.resolve_many(QUESTION, updates['questions'])
                 for i, q_id in enumerate(updates['questions']):
-                    question = Question.query.filter_by(uuid=q_id).first()
-                    if question:
+                    if q_id in question_pks:
                         exam_question = ExamQuestion(
                             exam_id=exam.id,
-                            question_id=question.id,
+                            question_id=question_pks[q_id],
                             question_order=i
                         )
                         db.session.add(exam_question)
             
             exam.updated_at = datetime.now()
             db.session.commit()
+            answer_key_cache.invalidate([exam_id])
+            review_cache.invalidate([exam_id])
+            exam_snapshot_cache.invalidate([exam_id])
+            if not exam.is_active:
+                exam_bundles.remove(exam_id)
+            elif not was_active or 'questions' in updates:
+                # Just activated or re-composed: compress in the background so the first
+                # students find bundles. Other edits are left to the read path, which
+                # publishes on a miss.
+                snapshot = self.get_exam_snapshot(exam_id)
+                if snapshot:
+                    exam_bundles.publish_async(snapshot)
             return True
         except Exception as e:
             db.session.rollback()
@@ -265,9 +480,21 @@ class ExamService:
             exam = Exam.query.filter_by(uuid=exam_id).first()
             if not exam:
                 return False
+            
+            # The exam's results go with it, so their users' aggregates are replayed afterwards
+            user_ids = [
+                pk for (pk,) in db.session.query(ExamResult.user_id).filter_by(exam_id=exam.id).distinct()
+            ]
                 
             db.session.delete(exam)
             db.session.commit()
+            id_resolver.evict(EXAM, [exam_id])
+            answer_key_cache.invalidate([exam_id])
+            review_cache.invalidate([exam_id])
+            exam_snapshot_cache.invalidate([exam_id])
+            exam_bundles.remove(exam_id)
+            if user_ids:
+                progress_stats.rebuild(user_ids)
             return True
         except Exception as e:
             db.session.rollback()
@@ -277,10 +504,11 @@ class ExamService:
     def get_all_exams(self, active_only: bool = True) -> List[Exam]:
         """Get all exams, optionally filtering for active only."""
         try:
+            query = Exam.query.options(*EXAM_DICT_LOADS)
             if active_only:
-                return Exam.query.filter_by(is_active=True).all()
+                return query.filter_by(is_active=True).all()
             else:
-                return Exam.query.all()
+                return query.all()
         except Exception as e:
             print(f"Error getting exams: {e}")
             return []
@@ -295,7 +523,7 @@ class ExamService:
         than one category.
         """
         try:
-            query = Exam.query.join(ExamCategory)
+            query = Exam.query.options(*EXAM_DICT_LOADS).join(ExamCategory)
             from sqlalchemy import true
             if active_only:
                 # compare with SQL expression to satisfy type checker
@@ -311,6 +539,83 @@ class ExamService:
             print(f"Error filtering exams by categories: {e}")
             return []
 
+    def get_exam_summaries(self, active_only: bool = True, categories: Optional[List[str]] = None,
+                           after: Optional[str] = None, limit: int = 20) -> Dict:
+        """
+        Return one page of exams, newest first, without their question lists.
+
+        Each exam carries its categories and a question count instead of the
+        question uuids ``to_dict`` includes. Pages are keyed on
+        (created_at, id) and served by ``idx_exams_active_created``, so later
+        pages cost the same as the first.
+
+        Args:
+            active_only: Only list active exams
+            categories: Only list exams in any of these categories
+            after: ``next`` value from the previous page (an exam ID), or None for the first page
+            limit: Page size
+
+        Returns:
+            Dict with ``exams`` and ``next`` (None on the last page)
+
+        Raises:
+            ValueError: If ``after`` is not an exam ID
+        """
+        question_count = (
+            select(func.count(ExamQuestion.id))
+            .where(ExamQuestion.exam_id == Exam.id)
+            .correlate(Exam)
+            .scalar_subquery()
+        )
+        query = db.session.query(
+            Exam.id, Exam.uuid, Exam.title, Exam.description, Exam.duration_minutes,
+            Exam.is_active, Exam.created_at, Exam.updated_at, question_count.label('question_count')
+        )
+        if active_only:
+            query = query.filter(Exam.is_active.is_(True))
+        if categories:
+            query = query.filter(Exam.categories.any(ExamCategory.category.in_(categories)))
+        if after:
+            cursor = db.session.query(Exam.created_at, Exam.id).filter(Exam.uuid == after).first()
+            if not cursor:
+                raise ValueError("Invalid cursor")
+            query = query.filter(or_(
+                Exam.created_at < cursor.created_at,
+                and_(Exam.created_at == cursor.created_at, Exam.id < cursor.id)
+            ))
+
+        rows = query.order_by(Exam.created_at.desc(), Exam.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        exam_categories: Dict[int, List[str]] = {}
+        exam_ids = [row.id for row in rows]
+        if exam_ids:
+            for exam_id, category in (
+                db.session.query(ExamCategory.exam_id, ExamCategory.category)
+                .filter(ExamCategory.exam_id.in_(exam_ids))
+                .order_by(ExamCategory.id)
+            ):
+                exam_categories.setdefault(exam_id, []).append(category)
+
+        return {
+            'exams': [
+                {
+                    'id': row.uuid,
+                    'title': row.title,
+                    'description': row.description,
+                    'duration_minutes': row.duration_minutes,
+                    'categories': exam_categories.get(row.id, []),
+                    'question_count': row.question_count,
+                    'is_active': row.is_active,
+                    'created_at': row.created_at,
+                    'updated_at': row.updated_at
+                }
+                for row in rows
+            ],
+            'next': rows[-1].uuid if has_more else None
+        }
+
     # category management
     def list_categories(self) -> List[SubjectCategoryModel]:
         """Return all subject categories from the database."""
@@ -349,6 +654,51 @@ class ExamService:
             print(f"Error deleting category: {e}")
             return False
     
+    def get_exam_snapshot(self, exam_id: str) -> Optional[ExamSnapshot]:
+        """
+        Get the encoded ``{"exam": ...}`` response body of an exam with its questions.
+        
+        Served from the snapshot cache while the exam's version is unchanged;
+        built from get_exam_with_questions on a miss.
+        """
+        try:
+            version = self.get_exam_version(exam_id, include_questions=True)
+            if not version:
+                return None
+            return exam_snapshot_cache.get(exam_id, version, self._build_snapshot)
+        except Exception as e:
+            print(f"Error getting exam snapshot: {e}")
+            return None
+    
+    def publish_exam_bundles(self, exam_id: str) -> List[str]:
+        """
+        Write the precompressed delivery bundles of an active exam to disk.
+        
+        Returns the paths written, or an empty list if the exam does not
+        exist, is inactive or could not be published.
+        """
+        try:
+            snapshot = self.get_exam_snapshot(exam_id)
+            if not snapshot or not snapshot.is_active:
+                return []
+            return exam_bundles.publish(snapshot)
+        except Exception as e:
+            print(f"Error publishing exam bundles: {e}")
+            return []
+    
+    def _build_snapshot(self, exam_id: str) -> Optional[ExamSnapshot]:
+        # Version first, so a concurrent edit can only make the snapshot look older than it is
+        version = self.get_exam_version(exam_id, include_questions=True)
+        exam_data = self.get_exam_with_questions(exam_id) if version else None
+        if not exam_data:
+            return None
+        # Same bytes jsonify would produce
+        body = current_app.json.response({'exam': exam_data}).get_data()
+        return ExamSnapshot(
+            exam_id, version['modified'], version['questions'], body,
+            hashlib.sha1(body).hexdigest(), bool(exam_data['is_active'])
+        )
+    
     def get_exam_with_questions(self, exam_id: str) -> Optional[Dict]:
         """
         Get an exam with all its questions fully populated.
@@ -356,7 +706,15 @@ class ExamService:
         Returns a dictionary with exam data and a list of question objects.
         """
         try:
-            exam = Exam.query.filter_by(uuid=exam_id).first()
+            exam = (
+                Exam.query
+                .options(
+                    selectinload(Exam.categories),
+                    selectinload(Exam.exam_questions).joinedload(ExamQuestion.question).selectinload(Question.options)
+                )
+                .filter_by(uuid=exam_id)
+                .first()
+            )
             if not exam:
                 return None
                 
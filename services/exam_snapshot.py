@@ -0,0 +1,96 @@
+"""
+Pre-serialized exam snapshots for the CET Exam App
+
+When an exam opens, every student fetches the same exam with all its
+questions at once. The first request builds the JSON response body and keeps
+the encoded bytes together with the exam version they were built from; the
+rest are served straight from memory while that version is current. Every
+read checks the version (``ExamService.get_exam_version``, one indexed
+aggregate), so an edit made through another worker process is picked up on
+the next request; local edits also drop the snapshot straight away.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+
+@dataclass(frozen=True)
+class ExamSnapshot:
+    """Encoded ``{"exam": ...}`` response body for one version of an exam."""
+    exam_id: str
+    modified: datetime
+    questions: int
+    body: bytes
+    digest: str  # sha1 of body; names the exam's precompressed bundles
+    is_active: bool
+
+
+class ExamSnapshotCache:
+    """
+    Thread-safe LRU of exam snapshots, keyed by exam uuid.
+
+    A snapshot is only served for the version it was built from and is
+    rebuilt when the caller's version differs. Snapshots are built outside
+    the lock. A generation counter bumped on
+    every invalidation stops a build that raced with an update from caching
+    the stale bytes.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._snapshots: 'OrderedDict[str, ExamSnapshot]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, exam_uuid: str, version: Dict,
+            build: Callable[[str], Optional[ExamSnapshot]]) -> Optional[ExamSnapshot]:
+        """
+        Return the snapshot of an exam, calling ``build`` on a miss.
+
+        Args:
+            exam_uuid: Public ID of the exam
+            version: Current ``{"modified", "questions"}`` of the exam, as from
+                ``get_exam_version(..., include_questions=True)``
+            build: Builds a snapshot from the database
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(exam_uuid)
+            if snapshot is not None:
+                if (snapshot.modified, snapshot.questions) == (version['modified'], version['questions']):
+                    self._snapshots.move_to_end(exam_uuid)
+                    return snapshot
+                # Edited elsewhere since it was built
+                del self._snapshots[exam_uuid]
+            generation = self._generation
+
+        snapshot = build(exam_uuid)
+        if snapshot is None:
+            return None
+
+        with self._lock:
+            if generation == self._generation:
+                self._snapshots[exam_uuid] = snapshot
+                self._snapshots.move_to_end(exam_uuid)
+                while len(self._snapshots) > self.max_size:
+                    self._snapshots.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, exam_uuids: Iterable[str]) -> None:
+        """Drop the snapshots of the given exams."""
+        with self._lock:
+            self._generation += 1
+            for exam_uuid in exam_uuids:
+                self._snapshots.pop(exam_uuid, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshots.clear()
+
+
+# Shared by the exam routes and the services that edit exams
+exam_snapshot_cache = ExamSnapshotCache(int(os.getenv('EXAM_SNAPSHOT_CACHE_SIZE', '64')))
@@ -0,0 +1,284 @@
+"""
+Background grading queue for the CET Exam App
+
+Submissions are written to the ``grading_jobs`` table and graded by a small
+pool of worker threads, so the queue survives restarts and works the same on
+PostgreSQL and SQLite.
+
+A worker claims a job by stamping it with its owner ID and the claim time (a
+lease). Only the lease holder may finish the job, and a job still
+``processing`` after its lease has expired is presumed abandoned by a dead
+process and claimed again, so several processes can share one queue.
+"""
+
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models.sql_models import GradingJob, ExamResult, User
+from services.grading_service import GradingService
+from services.id_resolver import id_resolver, USER
+from services.result_writer import write_results
+
+class JobStatus:
+    """Grading job status constants."""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+class GradingQueue:
+    """Durable table-backed queue drained by background grading workers."""
+
+    def __init__(self, poll_interval: float = 2.0, max_attempts: int = 3, lease_seconds: float = 300.0):
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        # Identifies this process's workers on the jobs they hold
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.grading_service = GradingService()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def enqueue(self,
+                user_id: str,
+                exam_id: str,
+                answers: Dict[str, str],
+                idempotency_key: Optional[str] = None) -> str:
+        """
+        Validate a submission and store it for background grading.
+
+        Args:
+            user_id: Public ID of the submitting user
+            exam_id: Public ID of the exam
+            answers: Question ID to selected option ID
+            idempotency_key: Key from SubmissionDedupe.make_key; if another
+                process already queued under it, that job's result ID is returned
+
+        Returns:
+            str: ID the result will have once graded
+        """
+        try:
+            if not isinstance(answers, dict):
+                raise ValueError("Answers must be an object of question ID to option ID")
+
+            user_pk = id_resolver.resolve(USER, user_id)
+            if user_pk is None:
+                raise ValueError("User not found")
+
+            answer_key = self.grading_service.get_answer_key(exam_id)
+
+            job = GradingJob(
+                user_id=user_pk,
+                exam_id=answer_key.exam_id,
+                answers=json.dumps(answers)
+            )
+            job.idempotency_key = idempotency_key
+            try:
+                db.session.add(job)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                existing = self._find_idempotent_job(idempotency_key)
+                if existing is not None:
+                    return existing
+                # The cached user id may belong to a user another process has
+                # since deleted; look it up again and retry once
+                fresh_pk = id_resolver.refresh(USER, user_id)
+                if fresh_pk is None:
+                    raise ValueError("User not found")
+                if fresh_pk == user_pk:
+                    raise
+                job.user_id = fresh_pk
+                db.session.add(job)
+                db.session.commit()
+            self._wake.set()
+            return str(job.result_uuid)
+        except IntegrityError:
+            db.session.rollback()
+            existing = self._find_idempotent_job(idempotency_key)
+            if existing is None:
+                raise
+            return existing
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error enqueueing submission: {e}")
+            raise
+
+    def _find_idempotent_job(self, idempotency_key: Optional[str]) -> Optional[str]:
+        if not idempotency_key:
+            return None
+        return db.session.query(GradingJob.result_uuid).filter_by(idempotency_key=idempotency_key).scalar()
+
+    def get_status(self, result_id: str) -> Optional[Dict]:
+        """Return the grading status of a result, or None if it is unknown."""
+        try:
+            row = (
+                db.session.query(GradingJob, User.uid)
+                .join(User, User.id == GradingJob.user_id)
+                .filter(GradingJob.result_uuid == result_id)
+                .first()
+            )
+            if row:
+                job, user_uid = row
+                status = job.to_dict()
+                status['user_id'] = user_uid
+                return status
+
+            # Results graded synchronously never had a job
+            row = (
+                db.session.query(ExamResult.uuid, User.uid)
+                .join(User, User.id == ExamResult.user_id)
+                .filter(ExamResult.uuid == result_id)
+                .first()
+            )
+            if row:
+                return {'resultId': row.uuid, 'status': JobStatus.DONE, 'error': None, 'user_id': row.uid}
+            return None
+        except Exception as e:
+            print(f"Error getting grading status: {e}")
+            return None
+
+    def start(self, app, workers: int = 2) -> None:
+        """Start the worker threads (no-op if already running or workers is 0)."""
+        if self._threads or workers <= 0:
+            return
+
+        # Jobs left mid-flight by a dead process are re-claimed once their lease expires (see process_next)
+        self._stop.clear()
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, args=(app,), name=f"grading-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Signal the workers to exit and wait for them."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, app) -> None:
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    processed = self.process_next()
+            except Exception as e:
+                print(f"Grading worker error: {e}")
+                processed = False
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claimable(self):
+        """Pending jobs, and processing jobs whose lease has expired."""
+        cutoff = datetime.now() - timedelta(seconds=self.lease_seconds)
+        return or_(
+            GradingJob.status == JobStatus.PENDING,
+            and_(
+                GradingJob.status == JobStatus.PROCESSING,
+                or_(
+                    GradingJob.claimed_at < cutoff,
+                    # Claimed before leases were recorded
+                    and_(GradingJob.claimed_at.is_(None), GradingJob.updated_at < cutoff)
+                )
+            )
+        )
+
+    def _held(self, job_id: int):
+        """The job, as long as this process still holds its lease."""
+        return and_(
+            GradingJob.id == job_id,
+            GradingJob.status == JobStatus.PROCESSING,
+            GradingJob.claimed_by == self.owner
+        )
+
+    def process_next(self) -> bool:
+        """
+        Claim and grade the oldest claimable job.
+
+        Returns:
+            True if a job was found (whether or not it graded cleanly), False if the queue is empty
+        """
+        job_id = (
+            db.session.query(GradingJob.id)
+            .filter(self._claimable())
+            .order_by(GradingJob.id)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            db.session.rollback()
+            return False
+
+        # Claim with a conditional update so two workers never hold the same job
+        now = datetime.now()
+        claimed = db.session.execute(
+            update(GradingJob)
+            .where(GradingJob.id == job_id, self._claimable())
+            .values(
+                status=JobStatus.PROCESSING,
+                attempts=GradingJob.attempts + 1,
+                claimed_by=self.owner,
+                claimed_at=now,
+                updated_at=now
+            )
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return True
+
+        try:
+            job = db.session.get(GradingJob, job_id)
+            answer_key = self.grading_service.get_answer_key(job.exam.uuid)
+            result = self.grading_service.build_result(
+                job.user_id, answer_key, json.loads(job.answers), job.result_uuid
+            )
+            result.idempotency_key = job.idempotency_key
+
+            # The result rows and the job status commit together, and only while the lease is ours
+            finished = db.session.execute(
+                update(GradingJob)
+                .where(self._held(job_id))
+                .values(status=JobStatus.DONE, error=None, updated_at=datetime.now())
+            ).rowcount
+            if not finished:
+                db.session.rollback()
+                print(f"Lost the lease on grading job {job_id}; leaving it to its new owner")
+                return True
+            write_results([result])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error grading job {job_id}: {e}")
+            attempts = db.session.query(GradingJob.attempts).filter_by(id=job_id).scalar()
+            if attempts is not None:
+                retry = not isinstance(e, ValueError) and attempts < self.max_attempts
+                db.session.execute(
+                    update(GradingJob)
+                    .where(self._held(job_id))
+                    .values(
+                        status=JobStatus.PENDING if retry else JobStatus.FAILED,
+                        error=str(e),
+                        updated_at=datetime.now()
+                    )
+                )
+                db.session.commit()
+        return True
+
+# Shared by the routes and the app factory
+grading_queue = GradingQueue(
+    poll_interval=float(os.getenv('GRADING_POLL_INTERVAL', '2.0')),
+    max_attempts=int(os.getenv('GRADING_MAX_ATTEMPTS', '3')),
+    lease_seconds=float(os.getenv('GRADING_LEASE_SECONDS', '300'))
+)
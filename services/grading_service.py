@@ -3,168 +3,214 @@ import uuid
 from datetime import datetime
 from typing import TypedDict, List, Dict, Optional, Tuple
 
+from sqlalchemy.exc import IntegrityError
+
 from database import db
 from models.sql_models import (
     Question, Option, Exam, ExamResult, ResultAnswer, 
     CategoryScore, Recommendation, User, SubjectCategory, ExamQuestion
 )
+from services.answer_key_cache import AnswerKey, answer_key_cache
+from services.group_commit import group_commit
+from services.result_writer import GradedResult, write_results
+from services.result_reader import read_result, read_user_results, read_user_result_summaries
+from services.result_review import review_cache
+from services.concept_index import count_concepts
+from services.id_resolver import id_resolver, USER
+from services import progress_stats
+
+# Categories with their own advice templates
+KNOWN_CATEGORIES = frozenset(c.value for c in SubjectCategory)
+
+# (recommendation catalog template key, parameter)
+RecommendationRef = Tuple[str, Optional[str]]
+
 class RecommendationType(TypedDict):
-        overall: List[str]
-        by_category: Dict[str, List[str]]
+        overall: List[RecommendationRef]
+        by_category: Dict[str, List[RecommendationRef]]
 class GradingService:
     """Service for grading exams and providing recommendations."""
     
-    def grade_exam(self, user_id: str, exam_id: str, answers: Dict[str, str]) -> str:
+    def grade_exam(self,
+                   user_id: str,
+                   exam_id: str,
+                   answers: Dict[str, str],
+                   idempotency_key: Optional[str] = None) -> str:
+        """
+        Grade a submission and store the result.
         
+        Args:
+            user_id: Public ID of the submitting user
+            exam_id: Public ID of the exam
+            answers: Question ID to selected option ID
+            idempotency_key: Key from SubmissionDedupe.make_key; if another
+                process already stored a result under it, that result's ID is returned
+            
+        Returns:
+            str: ID of the result
+        """
         try:
             # Get user and exam
-            user = User.query.filter_by(uid=user_id).first()
-            if not user:
+            user_pk = id_resolver.resolve(USER, user_id)
+            if user_pk is None:
                 raise ValueError("User not found")
                 
-            exam = Exam.query.filter_by(uuid=exam_id).first()
-            if not exam:
-                raise ValueError("Exam not found")
-                
-            # Get all questions for this exam
-            exam_questions = ExamQuestion.query.filter_by(exam_id=exam.id).all()
-            if not exam_questions:
-                raise ValueError("Exam has no questions")
-                
-            # Calculate score and prepare explanations
-            total_questions = len(exam_questions)
-            correct_count = 0
-            category_scores = {}
-            question_results = {}
+            answer_key = self.get_answer_key(exam_id)
+            result = self.build_result(user_pk, answer_key, answers)
+            result.idempotency_key = idempotency_key
             
-            for eq in exam_questions:
-                question = eq.question
-                q_id = question.uuid
-                
-                # Get correct option
-                correct_option = None
-                for option in question.options:
-                    if option.is_correct:
-                        correct_option = option.option_id
-                        break
-                
-                if q_id not in answers:
-                    # Question not answered
-                    question_results[q_id] = {
-                        'correct': False,
-                        'selected_option': None,
-                        'correct_option': correct_option,
-                        'explanation': question.explanation
-                    }
-                    continue
-                    
-                selected_option = answers[q_id]
-                is_correct = selected_option == correct_option
-                
-                # Update question result
+            try:
+                return self._store_result(result)
+            except IntegrityError:
+                db.session.rollback()
+                existing = self._find_idempotent_result(idempotency_key)
+                if existing is not None:
+                    return existing
+                # The cached user id may belong to a user another process has
+                # since deleted; look it up again and retry once
+                fresh_pk = id_resolver.refresh(USER, user_id)
+                if fresh_pk is None:
+                    raise ValueError("User not found")
+                if fresh_pk == user_pk:
+                    raise
+                result.user_id = fresh_pk
+                return self._store_result(result)
+        except IntegrityError:
+            db.session.rollback()
+            existing = self._find_idempotent_result(idempotency_key)
+            if existing is None:
+                raise
+            return existing
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error grading exam: {e}")
+            raise
+    
+    def _store_result(self, result: GradedResult) -> str:
+        if group_commit.running:
+            # Committed together with other requests' results by the writer thread
+            return group_commit.write(result)
+        
+        # Write the result with one batched insert per table
+        write_results([result])
+        
+        db.session.commit()
+        return result.uuid
+    
+    def _find_idempotent_result(self, idempotency_key: Optional[str]) -> Optional[str]:
+        if not idempotency_key:
+            return None
+        return db.session.query(ExamResult.uuid).filter_by(idempotency_key=idempotency_key).scalar()
+    
+    def get_answer_key(self, exam_id: str) -> AnswerKey:
+        """Return the compiled answer key for an exam, raising ValueError if it cannot be graded."""
+        answer_key = answer_key_cache.get(exam_id)
+        if answer_key is None:
+            raise ValueError("Exam not found")
+        if not answer_key.entries:
+            raise ValueError("Exam has no questions")
+        return answer_key
+    
+    def build_result(self,
+                     user_pk: int,
+                     answer_key: AnswerKey,
+                     answers: Dict[str, str],
+                     result_id: Optional[str] = None) -> GradedResult:
+        """
+        Score a submission against an answer key without touching the database.
+        
+        Args:
+            user_pk: Internal id of the submitting user
+            answer_key: Compiled answer key of the exam
+            answers: Question ID to selected option ID
+            result_id: Pre-allocated result ID, generated if omitted
+            
+        Returns:
+            GradedResult ready to be passed to write_results
+        """
+        # Calculate score and prepare explanations
+        total_questions = len(answer_key)
+        correct_count = 0
+        category_scores = {}
+        question_results = {}
+        
+        for entry in answer_key.entries:
+            q_id = entry.question_uuid
+            correct_option = entry.correct_option
+            
+            if q_id not in answers:
+                # Question not answered
                 question_results[q_id] = {
-                    'correct': is_correct,
-                    'selected_option': selected_option,
+                    'correct': False,
+                    'selected_option': None,
                     'correct_option': correct_option,
-                    'explanation': question.explanation
+                    'explanation': entry.explanation,
+                    'concepts': entry.concepts
                 }
+                continue
                 
-                # Update scores
-                if is_correct:
-                    correct_count += 1
-                    
-                # Update category scores
-                category = question.category
-                if category not in category_scores:
-                    category_scores[category] = {
-                        'total': 0,
-                        'correct': 0
-                    }
-                category_scores[category]['total'] += 1
-                if is_correct:
-                    category_scores[category]['correct'] += 1
-            
-            # Calculate final scores
-            score = (correct_count / total_questions) * 100 if total_questions > 0 else 0
-            
-            # Calculate category percentages
-            category_percentages = {}
-            for category, counts in category_scores.items():
-                if counts['total'] > 0:
-                    category_percentages[category] = (counts['correct'] / counts['total']) * 100
-                else:
-                    category_percentages[category] = 0
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(category_percentages, question_results)
-            
-            # Create result object
-            result = ExamResult(
-                user_id=user.id,
-                exam_id=exam.id,
-                score=score,
-                max_score=100.0
-            )
+            selected_option = answers[q_id]
+            is_correct = selected_option == correct_option
             
-            db.session.add(result)
-            db.session.flush()  # Flush to get the result ID
+            # Update question result
+            question_results[q_id] = {
+                'correct': is_correct,
+                'selected_option': selected_option,
+                'correct_option': correct_option,
+                'explanation': entry.explanation,
+                'concepts': entry.concepts
+            }
             
-            # Save answers
-            for q_id, result_data in question_results.items():
-                question = Question.query.filter_by(uuid=q_id).first()
-                if question:
-                    answer = ResultAnswer(
-                        result_id=result.id,
-                        question_id=question.id,
-                        selected_option_id=result_data['selected_option'],
-                        is_correct=result_data['correct']
-                    )
-                    db.session.add(answer)
-            
-            # Save category scores
-            for category, score_value in category_percentages.items():
-                category_score = CategoryScore(
-                    result_id=result.id,
-                    category=category,
-                    score=score_value
-                )
-                db.session.add(category_score)
-            
-            # Save recommendations
-            # Overall recommendations
-            for rec_text in recommendations['overall']:
-                recommendation = Recommendation(
-                    result_id=result.id,
-                    recommendation_text=rec_text
-                )
-                db.session.add(recommendation)
-            
-            # Category-specific recommendations
-            for category, rec_list in recommendations['by_category'].items():
-                for rec_text in rec_list:
-                    recommendation = Recommendation(
-                        result_id=result.id,
-                        category=category,
-                        recommendation_text=rec_text
-                    )
-                    db.session.add(recommendation)
-            
-            db.session.commit()
-            # return result.uuid
-            return str(result.uuid)
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error grading exam: {e}")
-            raise
+            # Update scores
+            if is_correct:
+                correct_count += 1
+                
+            # Update category scores
+            category = entry.category
+            if category not in category_scores:
+                category_scores[category] = {
+                    'total': 0,
+                    'correct': 0
+                }
+            category_scores[category]['total'] += 1
+            if is_correct:
+                category_scores[category]['correct'] += 1
+        
+        # Calculate final scores
+        score = (correct_count / total_questions) * 100 if total_questions > 0 else 0
+        
+        # Calculate category percentages
+        category_percentages = {}
+        for category, counts in category_scores.items():
+            if counts['total'] > 0:
+                category_percentages[category] = (counts['correct'] / counts['total']) * 100
+            else:
+                category_percentages[category] = 0
+        
+        # Generate recommendations
+        recommendations = self._generate_recommendations(category_percentages, question_results)
+        
+        result = GradedResult(
+            user_id=user_pk,
+            exam_id=answer_key.exam_id,
+            score=score,
+            max_score=100.0,
+            answers=[
+                (answer_key.by_uuid[q_id].question_id, result_data['selected_option'], result_data['correct'])
+                for q_id, result_data in question_results.items()
+            ],
+            category_scores=category_percentages,
+            recommendations=recommendations,
+            category_answered={category: counts['total'] for category, counts in category_scores.items()}
+        )
+        if result_id:
+            result.uuid = result_id
+        return result
     
     def get_exam_result(self, result_id: str) -> Optional[Dict]:
         """Get an exam result by ID with detailed information."""
         try:
-            result = ExamResult.query.filter_by(uuid=result_id).first()
-            if not result:
-                return None
-                
-            return result.to_dict()
+            return read_result(result_id)
         except Exception as e:
             print(f"Error getting exam result: {e}")
             return None
@@ -172,16 +218,60 @@ class GradingService:
     def get_user_results(self, user_id: str) -> List[Dict]:
         """Get all exam results for a specific user."""
         try:
-            user = User.query.filter_by(uid=user_id).first()
-            if not user:
-                return []
-                
-            results = ExamResult.query.filter_by(user_id=user.id).all()
-            return [result.to_dict() for result in results]
+            return read_user_results(user_id)
         except Exception as e:
             print(f"Error getting user results: {e}")
             return []
     
+    def get_result_version(self, result_id: str) -> Optional[Dict]:
+        """
+        Get the owner, exam and last change of a result without loading it.
+        
+        Results only change when a regrade shifts their scores.
+        
+        Returns:
+            Dict with ``user_id``, ``exam_id`` and ``modified``, or None if the result does not exist
+        """
+        try:
+            row = (
+                db.session.query(User.uid, Exam.uuid, ExamResult.completed_at, ExamResult.regraded_at)
+                .join(User, User.id == ExamResult.user_id)
+                .join(Exam, Exam.id == ExamResult.exam_id)
+                .filter(ExamResult.uuid == result_id)
+                .first()
+            )
+            if not row:
+                return None
+            return {'user_id': row[0], 'exam_id': row[1], 'modified': row.regraded_at or row.completed_at}
+        except Exception as e:
+            print(f"Error getting result version: {e}")
+            return None
+    
+    def get_result_review(self, result_id: str, version) -> Optional[Dict]:
+        """
+        Get a result together with every exam question, its options, the selected and correct option and explanation.
+        
+        ``version`` identifies the result's and its exam's current state (the
+        review ETag's parts); a cached review built for another version is rebuilt.
+        """
+        try:
+            return review_cache.get(result_id, version)
+        except Exception as e:
+            print(f"Error getting result review: {e}")
+            return None
+    
+    def get_progress_stats(self, user_id: str) -> Optional[Dict]:
+        """Get a user's overall and per-category progress aggregates, or None if the user does not exist."""
+        try:
+            return progress_stats.get_stats(user_id)
+        except Exception as e:
+            print(f"Error getting progress stats: {e}")
+            return None
+    
+    def get_user_result_summaries(self, user_id: str, after: Optional[str] = None, limit: int = 20) -> Dict:
+        """Get one keyset page of a user's results with only the fields a history list needs."""
+        return read_user_result_summaries(user_id, after, limit)
+    
     # def _generate_recommendations(self, category_scores: Dict[str, float], 
     #                              question_results: Dict[str, Dict]) -> Dict[str, List[str]]:
     
@@ -191,6 +281,20 @@ class GradingService:
         category_scores: Dict[str, float], 
         question_results: Dict[str, Dict]
     ) -> RecommendationType:
+        missed_concepts = self._identify_missed_concepts(question_results)
+        return self._build_recommendations(category_scores, missed_concepts)
+    
+    def _build_recommendations(
+        self,
+        category_scores: Dict[str, float],
+        missed_concepts: List[str]
+    ) -> RecommendationType:
+        """
+        Build recommendations from category scores and already identified missed concepts.
+        
+        Each recommendation is a (template key, parameter) pair from the
+        recommendation catalog; the text is rendered when the result is read.
+        """
         recommendations: RecommendationType = {
             'overall': [],
             'by_category': {}
@@ -200,66 +304,33 @@ class GradingService:
         avg_score = sum(category_scores.values()) / len(category_scores) if category_scores else 0
         
         if avg_score >= 90:
-            recommendations['overall'].append("Excellent performance! Consider exploring advanced topics.")
+            recommendations['overall'].append(('overall.excellent', None))
         elif avg_score >= 70:
-            recommendations['overall'].append("Good performance. Focus on the categories where you scored lower.")
+            recommendations['overall'].append(('overall.good', None))
         elif avg_score >= 50:
-            recommendations['overall'].append("Average performance. Review the explanations for questions you got wrong.")
+            recommendations['overall'].append(('overall.average', None))
         else:
-            recommendations['overall'].append("You need more practice. Focus on understanding the basic concepts first.")
+            recommendations['overall'].append(('overall.practice', None))
         
         # Category-specific recommendations
         for category, score in category_scores.items():
-            cat_recommendations = []
-            
-            # Convert category string to readable format
-            readable_category = category.replace('_', ' ').title()
-            
             if score < 50:
-                cat_recommendations.append(f"Review the fundamentals of {readable_category}.")
-                
-                # Add specific recommendations based on category
-                if category == SubjectCategory.REASONING.value:
-                    cat_recommendations.append("Practice logical reasoning puzzles and pattern recognition exercises.")
-                elif category == SubjectCategory.ENGLISH.value:
-                    cat_recommendations.append("Focus on grammar rules and vocabulary building.")
-                elif category == SubjectCategory.COMPUTER_CONCEPTS.value:
-                    cat_recommendations.append("Study basic computer architecture and operating system concepts.")
-                elif category == SubjectCategory.MATHS.value:
-                    cat_recommendations.append("Practice basic maths syntax and simple programming exercises.")
-            
+                level = 'weak'
             elif score < 70:
-                cat_recommendations.append(f"You have a basic understanding of {readable_category}. Practice more complex problems.")
-                
-                # Add specific recommendations based on category
-                if category == SubjectCategory.REASONING.value:
-                    cat_recommendations.append("Work on analytical reasoning and critical thinking problems.")
-                elif category == SubjectCategory.ENGLISH.value:
-                    cat_recommendations.append("Practice reading comprehension and sentence correction exercises.")
-                elif category == SubjectCategory.COMPUTER_CONCEPTS.value:
-                    cat_recommendations.append("Learn about networking concepts and database fundamentals.")
-                elif category == SubjectCategory.MATHS.value:
-                    cat_recommendations.append("Study data structures and algorithms in maths.")
-            
+                level = 'basic'
             else:
-                cat_recommendations.append(f"You have a good grasp of {readable_category}. Focus on advanced topics.")
-                
-                # Add specific recommendations based on category
-                if category == SubjectCategory.REASONING.value:
-                    cat_recommendations.append("Challenge yourself with complex logical puzzles and advanced reasoning problems.")
-                elif category == SubjectCategory.ENGLISH.value:
-                    cat_recommendations.append("Work on advanced writing skills and complex comprehension passages.")
-                elif category == SubjectCategory.COMPUTER_CONCEPTS.value:
-                    cat_recommendations.append("Explore cloud computing, cybersecurity, and emerging technologies.")
-                elif category == SubjectCategory.MATHS.value:
-                    cat_recommendations.append("Learn advanced maths concepts like decorators, generators, and concurrent programming.")
+                level = 'strong'
+            
+            # Generic advice for the level, then specific advice for known categories
+            cat_recommendations = [(f'category.{level}', None)]
+            if category in KNOWN_CATEGORIES:
+                cat_recommendations.append((f'{category}.{level}', None))
             
             recommendations['by_category'][category] = cat_recommendations
         
         # Add recommendation for frequently missed concepts
-        missed_concepts = self._identify_missed_concepts(question_results)
         if missed_concepts:
-            recommendations['overall'].append(f"Focus on these frequently missed concepts: {', '.join(missed_concepts)}.")
+            recommendations['overall'].append(('overall.missed_concepts', ', '.join(missed_concepts)))
         
         return recommendations
     
@@ -274,14 +345,13 @@ class GradingService:
         
         for q_id, result in question_results.items():
             if not result['correct']:
-                # Extract keywords from explanation (simplified)
-                explanation = result['explanation'].lower()
-                words = explanation.split()
+                # Keyword counts are precomputed per question by the concept index
+                concepts = result.get('concepts')
+                if concepts is None:
+                    concepts = count_concepts(result['explanation'])
                 
-                # Count significant words (longer than 4 characters)
-                for word in words:
-                    if len(word) > 4 and word.isalpha():
-                        explanation_keywords[word] = explanation_keywords.get(word, 0) + 1
+                for word, count in concepts:
+                    explanation_keywords[word] = explanation_keywords.get(word, 0) + count
         
         # Find the most common keywords (concepts)
         if explanation_keywords:
@@ -0,0 +1,197 @@
+"""
+Group commit for graded results in the CET Exam App
+
+When enabled, synchronous submissions hand their graded result to a single
+writer thread instead of committing it themselves. The writer coalesces
+everything that arrives within ``max_delay_ms`` (or ``max_batch`` results,
+whichever comes first) into one transaction, and each request returns only
+once the transaction holding its result has committed. A deadline burst then
+costs one commit per batch rather than one per submission, which matters most
+on SQLite where every commit is an fsync under a database-wide write lock.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from database import db
+from services.result_writer import GradedResult, write_results
+
+class _Pending:
+    """One result waiting for its batch to commit."""
+
+    __slots__ = ('result', 'enqueued', 'done', 'error')
+
+    def __init__(self, result: GradedResult):
+        self.result = result
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class GroupCommitWriter:
+    """Write-behind buffer that commits graded results in groups."""
+
+    def __init__(self, max_batch: int = 100, max_delay_ms: float = 5.0, window: int = 1000):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics; latencies cover the last ``window`` results
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._results = 0
+        self._failed = 0
+        self._max_batch_seen = 0
+        self._batch_sizes: deque = deque(maxlen=window)
+        self._wait_ms: deque = deque(maxlen=window)
+        self._commit_ms: deque = deque(maxlen=window)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, app) -> None:
+        """Start the writer thread (no-op if already running)."""
+        if self._thread:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, args=(app,), name="group-commit", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Flush what is queued and stop the writer thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def write(self, result: GradedResult) -> str:
+        """
+        Queue a graded result and block until its batch has committed.
+
+        The caller's own read transaction is ended first so a waiting request
+        does not hold a pooled connection.
+
+        Returns:
+            str: ID of the stored result
+
+        Raises:
+            Whatever the insert raised if the result could not be stored
+        """
+        if not self.running:
+            raise RuntimeError("Group commit writer is not running")
+
+        db.session.rollback()
+        pending = _Pending(result)
+        with self._cond:
+            self._pending.append(pending)
+            self._cond.notify_all()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return result.uuid
+
+    def stats(self) -> Dict:
+        """Batch-size and latency metrics for the admin dashboard."""
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            waits = sorted(self._wait_ms)
+            commits = sorted(self._commit_ms)
+            stats = {
+                'enabled': self.running,
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay * 1000.0,
+                'batches': self._batches,
+                'results': self._results,
+                'failed': self._failed,
+                'batch_size': {
+                    'mean': sum(sizes) / len(sizes) if sizes else 0.0,
+                    'max': self._max_batch_seen
+                },
+                'wait_ms': _percentiles(waits),
+                'commit_ms': _percentiles(commits)
+            }
+        with self._cond:
+            stats['queued'] = len(self._pending)
+        return stats
+
+    def _run(self, app) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            with app.app_context():
+                self._flush(batch)
+
+    def _collect(self) -> List[_Pending]:
+        """Wait for the first result, then for the batch to fill or the delay to pass."""
+        with self._cond:
+            while not self._pending and not self._stop:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            deadline = self._pending[0].enqueued + self.max_delay
+            while len(self._pending) < self.max_batch and not self._stop:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _flush(self, batch: List[_Pending]) -> None:
+        start = time.perf_counter()
+        try:
+            write_results([p.result for p in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error committing result batch of {len(batch)}, retrying one by one: {e}")
+            # One bad result (e.g. a duplicate idempotency key) must not fail its neighbours
+            for p in batch:
+                try:
+                    write_results([p.result])
+                    db.session.commit()
+                except Exception as item_error:
+                    db.session.rollback()
+                    p.error = item_error
+        finally:
+            db.session.remove()
+
+        finished = time.perf_counter()
+        self._record(batch, start, finished)
+        for p in batch:
+            p.done.set()
+
+    def _record(self, batch: List[_Pending], start: float, finished: float) -> None:
+        with self._stats_lock:
+            self._batches += 1
+            self._results += len(batch)
+            self._failed += sum(1 for p in batch if p.error is not None)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._batch_sizes.append(len(batch))
+            self._commit_ms.append((finished - start) * 1000.0)
+            self._wait_ms.extend((finished - p.enqueued) * 1000.0 for p in batch)
+
+def _percentiles(sorted_values: List[float]) -> Dict[str, float]:
+    if not sorted_values:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    last = len(sorted_values) - 1
+    return {
+        'p50': sorted_values[int(last * 0.5)],
+        'p95': sorted_values[int(last * 0.95)],
+        'max': sorted_values[last]
+    }
+
+# Started by the app factory when GROUP_COMMIT is on
+group_commit = GroupCommitWriter(
+    max_batch=int(os.getenv('GROUP_COMMIT_MAX_BATCH', '100')),
+    max_delay_ms=float(os.getenv('GROUP_COMMIT_MAX_DELAY_MS', '5'))
+)
@@ -0,0 +1,124 @@
+"""
+Public ID to internal id resolution for the CET Exam App
+
+Routes and services address questions, exams and users by their public
+uuid (``uid`` for users), while rows reference each other by integer id.
+``IdResolver`` turns a list of public IDs into internal ids with one IN
+query for whatever is not already in a bounded LRU, so resolving the 200
+questions of an exam costs one query instead of 200. A public ID never
+changes its row, so entries only go stale when the row is deleted, and
+the deleting service evicts them.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from database import db
+from models.sql_models import Exam, Question, User
+
+# IDs per IN query
+RESOLVE_CHUNK = 500
+
+QUESTION = 'question'
+EXAM = 'exam'
+USER = 'user'
+
+_COLUMNS = {
+    QUESTION: (Question.uuid, Question.id),
+    EXAM: (Exam.uuid, Exam.id),
+    USER: (User.uid, User.id),
+}
+
+
+class IdResolver:
+    """
+    Thread-safe LRU of (kind, public ID) -> internal id, filled a batch at a time.
+
+    Lookups run outside the lock. A generation counter bumped on every
+    eviction stops a lookup that raced with a delete from caching the
+    deleted row's id.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._ids: 'OrderedDict[Tuple[str, str], int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def resolve(self, kind: str, public_id: Optional[str]) -> Optional[int]:
+        """Return the internal id for one public ID, or None if no such row exists."""
+        if not public_id:
+            return None
+        return self.resolve_many(kind, [public_id]).get(public_id)
+
+    def resolve_many(self, kind: str, public_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        Map public IDs to internal ids.
+
+        Args:
+            kind: ``question``, ``exam`` or ``user``
+            public_ids: IDs to resolve; duplicates and unknown IDs are fine
+
+        Returns:
+            dict: Public ID -> internal id for every ID that exists
+        """
+        public_column, id_column = _COLUMNS[kind]
+        found: Dict[str, int] = {}
+        missing = []
+        with self._lock:
+            for public_id in dict.fromkeys(public_ids):
+                pk = self._ids.get((kind, public_id))
+                if pk is None:
+                    missing.append(public_id)
+                else:
+                    self._ids.move_to_end((kind, public_id))
+                    found[public_id] = pk
+            generation = self._generation
+        if not missing:
+            return found
+
+        loaded = {}
+        for start in range(0, len(missing), RESOLVE_CHUNK):
+            loaded.update(
+                db.session.query(public_column, id_column)
+                .filter(public_column.in_(missing[start:start + RESOLVE_CHUNK]))
+                .all()
+            )
+        found.update(loaded)
+
+        with self._lock:
+            if generation == self._generation:
+                for public_id, pk in loaded.items():
+                    self._ids[(kind, public_id)] = pk
+                    self._ids.move_to_end((kind, public_id))
+                while len(self._ids) > self.max_size:
+                    self._ids.popitem(last=False)
+        return found
+
+    def evict(self, kind: str, public_ids: Iterable[str]) -> None:
+        """Forget the given IDs; call when their rows are deleted."""
+        with self._lock:
+            self._generation += 1
+            for public_id in public_ids:
+                self._ids.pop((kind, public_id), None)
+
+    def refresh(self, kind: str, public_id: Optional[str]) -> Optional[int]:
+        """
+        Drop a cached id and look it up again.
+
+        For when a write with a cached id broke a foreign key, which means
+        another process deleted the row after this one cached it.
+        """
+        self.evict(kind, [public_id])
+        return self.resolve(kind, public_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._ids.clear()
+
+
+# Shared by every service in the process
+id_resolver = IdResolver(int(os.getenv('ID_CACHE_SIZE', '10000')))
@@ -0,0 +1,250 @@
+"""
+Per-user progress aggregates for the CET Exam App
+
+``user_category_stats`` keeps one row per user and category (plus one row
+with category ``UserCategoryStat.OVERALL`` for whole-exam scores) holding the
+attempt count, score sum, best, latest and an exponentially weighted rolling
+average. Rows are folded forward in the same transaction that writes each
+result, so reading a profile costs one row per category however long the
+history is. ``rebuild`` recomputes them from the stored results.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import DateTime, Float
+
+from database import db
+from models.sql_models import CategoryScore, ExamResult, User, UserCategoryStat
+from services.id_resolver import id_resolver, USER
+
+# Weight of the newest attempt in the rolling average
+ROLLING_ALPHA = 0.3
+
+# Column values of a row with no attempts
+_EMPTY_STATE = {
+    'attempts': 0, 'score_sum': 0.0, 'best_score': None,
+    'latest_score': None, 'latest_at': None, 'rolling_average': None
+}
+
+_table = UserCategoryStat.__table__
+
+
+def record_results(results: Iterable) -> None:
+    """
+    Fold freshly graded results into their users' aggregates.
+
+    Runs inside the caller's transaction (``write_results`` calls it), so the
+    aggregates commit or roll back together with the result rows.
+
+    Args:
+        results: GradedResult objects with internal user ids
+    """
+    params = []
+    for result in sorted(results, key=lambda r: r.completed_at):
+        params.append({'b_user': result.user_id, 'b_category': UserCategoryStat.OVERALL,
+                       'b_score': result.score, 'b_at': result.completed_at})
+        for category, score in result.category_scores.items():
+            params.append({'b_user': result.user_id, 'b_category': category,
+                           'b_score': score, 'b_at': result.completed_at})
+    if not params:
+        return
+
+    _ensure_rows({(p['b_user'], p['b_category']) for p in params})
+
+    # Applied row by row in completion order, so repeated (user, category) pairs chain correctly
+    c = _table.c
+    score = bindparam('b_score', type_=Float)
+    at = bindparam('b_at', type_=DateTime)
+    is_latest = (c.latest_at.is_(None)) | (c.latest_at <= at)
+    db.session.execute(
+        update(_table)
+        .where(c.user_id == bindparam('b_user'), c.category == bindparam('b_category'))
+        .values(
+            attempts=c.attempts + 1,
+            score_sum=c.score_sum + score,
+            best_score=case(((c.best_score.is_(None)) | (score > c.best_score), score), else_=c.best_score),
+            latest_score=case((is_latest, score), else_=c.latest_score),
+            latest_at=case((is_latest, at), else_=c.latest_at),
+            rolling_average=case(
+                (c.rolling_average.is_(None), score),
+                else_=c.rolling_average + ROLLING_ALPHA * (score - c.rolling_average)
+            )
+        ),
+        params
+    )
+
+
+def get_stats(user_id: str) -> Optional[Dict]:
+    """
+    Return a user's aggregates.
+
+    Args:
+        user_id: Public ID of the user
+
+    Returns:
+        Dict with ``overall`` and per-category ``categories`` stats, or None if the user does not exist
+    """
+    user_pk = id_resolver.resolve(USER, user_id)
+    if user_pk is None:
+        return None
+
+    stats = {'overall': _empty(), 'categories': {}}
+    for row in UserCategoryStat.query.filter_by(user_id=user_pk).order_by(UserCategoryStat.category):
+        if not row.attempts:
+            continue
+        if row.category == UserCategoryStat.OVERALL:
+            stats['overall'] = row.to_dict()
+        else:
+            stats['categories'][row.category] = row.to_dict()
+    return stats
+
+
+def rebuild(user_ids: Optional[List[int]] = None, batch_size: int = 200) -> int:
+    """
+    Recompute aggregates from the stored results and commit.
+
+    Used to backfill existing data and after changes that rewrite stored
+    scores (regrades, deleted exams).
+
+    Args:
+        user_ids: Internal user ids to rebuild, or None for every user
+        batch_size: Users per transaction
+
+    Returns:
+        int: Number of users rebuilt
+    """
+    rebuilt = 0
+    if user_ids is not None:
+        ids = sorted(set(user_ids))
+        for start in range(0, len(ids), batch_size):
+            _rebuild_users(ids[start:start + batch_size])
+            rebuilt += len(ids[start:start + batch_size])
+        return rebuilt
+
+    last_id = 0
+    while True:
+        ids = [
+            pk for (pk,) in db.session.query(User.id)
+            .filter(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return rebuilt
+        _rebuild_users(ids)
+        rebuilt += len(ids)
+        last_id = ids[-1]
+
+
+def _rebuild_users(user_ids: List[int]) -> None:
+    try:
+        # Lock the users' aggregate rows first. A record_results that already
+        # committed is then in the results read below, and one still running
+        # waits for this commit and folds its result into the rebuilt rows.
+        c = _table.c
+        existing = set(db.session.execute(
+            select(c.user_id, c.category)
+            .where(c.user_id.in_(user_ids))
+            .with_for_update()
+        ))
+
+        states: Dict[Tuple[int, str], Dict] = {}
+
+        overall = db.session.execute(
+            select(ExamResult.user_id, ExamResult.score, ExamResult.completed_at)
+            .where(ExamResult.user_id.in_(user_ids))
+            .order_by(ExamResult.completed_at, ExamResult.id)
+        )
+        for user_pk, score, completed_at in overall:
+            _fold(states, (user_pk, UserCategoryStat.OVERALL), score, completed_at)
+
+        by_category = db.session.execute(
+            select(ExamResult.user_id, CategoryScore.category, CategoryScore.score, ExamResult.completed_at)
+            .join(ExamResult, ExamResult.id == CategoryScore.result_id)
+            .where(ExamResult.user_id.in_(user_ids))
+            .order_by(ExamResult.completed_at, ExamResult.id)
+        )
+        for user_pk, category, score, completed_at in by_category:
+            _fold(states, (user_pk, category), score, completed_at)
+
+        # Rewrite locked rows in place rather than deleting them, so an UPDATE
+        # queued behind the lock still finds its row; rows left without
+        # results go back to empty
+        rewrites = [
+            dict(states.get(key, _EMPTY_STATE), b_user=key[0], b_category=key[1])
+            for key in existing
+        ]
+        if rewrites:
+            db.session.execute(
+                update(_table)
+                .where(c.user_id == bindparam('b_user'), c.category == bindparam('b_category')),
+                rewrites
+            )
+        new_rows = [
+            dict(state, user_id=user_pk, category=category)
+            for (user_pk, category), state in states.items()
+            if (user_pk, category) not in existing
+        ]
+        if new_rows:
+            db.session.execute(insert(_table), new_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _fold(states: Dict, key: Tuple[int, str], score: float, completed_at) -> None:
+    """Python twin of the UPDATE in record_results, for replaying a history in order."""
+    state = states.get(key)
+    if state is None:
+        states[key] = {
+            'attempts': 1, 'score_sum': score, 'best_score': score,
+            'latest_score': score, 'latest_at': completed_at, 'rolling_average': score
+        }
+        return
+    state['attempts'] += 1
+    state['score_sum'] += score
+    state['best_score'] = max(state['best_score'], score)
+    if completed_at >= state['latest_at']:
+        state['latest_score'] = score
+        state['latest_at'] = completed_at
+    state['rolling_average'] += ROLLING_ALPHA * (score - state['rolling_average'])
+
+
+def _ensure_rows(pairs: Set[Tuple[int, str]]) -> None:
+    """Create empty aggregate rows for (user, category) pairs that have none yet."""
+    user_ids = list({user_pk for user_pk, _ in pairs})
+    existing = set()
+    for start in range(0, len(user_ids), 500):
+        existing.update(
+            (row.user_id, row.category) for row in db.session.execute(
+                select(_table.c.user_id, _table.c.category)
+                .where(_table.c.user_id.in_(user_ids[start:start + 500]))
+            )
+        )
+    missing = [
+        {'user_id': user_pk, 'category': category, 'attempts': 0, 'score_sum': 0.0}
+        for user_pk, category in pairs - existing
+    ]
+    if not missing:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(_table), missing)
+    except IntegrityError:
+        # A concurrent submission by the same user created some of them; add the rest one by one
+        for row in missing:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(_table), [row])
+            except IntegrityError:
+                pass
+
+
+def _empty() -> Dict:
+    return {
+        'attempts': 0, 'average_score': 0.0, 'best_score': None,
+        'latest_score': None, 'latest_at': None, 'rolling_average': None
+    }
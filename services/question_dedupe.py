@@ -0,0 +1,297 @@
+"""
+Near-duplicate question detection for the CET Exam App
+
+Every question is fingerprinted when it is written:
+
+- ``content_hash``: SHA-1 of the normalised question text and its option
+  texts (lowercased, punctuation split off, whitespace collapsed, options in
+  sorted order), stored on the question and indexed, so exact re-adds are
+  one index lookup.
+- MinHash/LSH buckets: a 64-value MinHash signature over the word pairs of
+  the question text is cut into 16 bands of 4, and each band is hashed to a
+  bucket stored in ``question_buckets``. Questions that share a bucket are
+  candidates; the candidates' real shingle overlap (Jaccard similarity of
+  the text's word pairs plus each whole option) decides whether they are
+  duplicates. Options are left out of the buckets because stock options
+  ("True"/"False", "None of these") would put unrelated questions together.
+
+Checking a question therefore costs a handful of indexed lookups and a
+comparison against a few candidates, never a scan of the bank.
+``POST /questions`` returns near-duplicates as a warning with the created
+question (or refuses them with ``reject_duplicates``) and the bulk importer
+skips or flags them; ``ensure_index`` (run at start-up) fingerprints
+questions written before this existed.
+"""
+
+import hashlib
+import os
+import random
+import re
+import unicodedata
+from collections import Counter, namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from database import db
+from models.sql_models import Option, Question, QuestionBucket
+
+# Shingle overlap at which two questions count as duplicates
+SIMILARITY_THRESHOLD = float(os.getenv('DUPLICATE_QUESTION_THRESHOLD', '0.8'))
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+# Candidates (most shared buckets first) compared per question
+MAX_CANDIDATES = 20
+# Entries kept per bucket in an upload's in-memory index
+LOCAL_BUCKET_SIZE = 50
+# Questions fingerprinted per statement when backfilling, and values per IN list
+BATCH = 500
+
+_TOKEN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+# Hash family (a * x + b) mod p; 31-bit values keep a * x + b inside uint64
+_PRIME = (1 << 31) - 1
+_rng = random.Random(0x5EED)
+_A = np.array([_rng.randrange(1, _PRIME) for _ in range(NUM_HASHES)], dtype=np.uint64)[:, None]
+_B = np.array([_rng.randrange(0, _PRIME) for _ in range(NUM_HASHES)], dtype=np.uint64)[:, None]
+
+Fingerprint = namedtuple('Fingerprint', ['content_hash', 'shingles', 'buckets'])
+
+
+class DuplicateQuestionError(ValueError):
+    """Raised when a new question is a near-duplicate of one already in the bank."""
+
+    def __init__(self, matches: List[Dict]):
+        super().__init__("A similar question already exists")
+        self.matches = matches
+
+
+def _tokens(value: Optional[str]) -> List[str]:
+    return _TOKEN.findall(unicodedata.normalize('NFKC', value or '').lower())
+
+
+def fingerprint(text: str, options: Iterable[str]) -> Fingerprint:
+    """
+    Fingerprint a question from its text and option texts.
+
+    Option order does not matter, so a question re-added with its options
+    shuffled has the same fingerprint.
+    """
+    words = _tokens(text)
+    option_keys = sorted(' '.join(_tokens(option)) for option in options)
+    content_hash = hashlib.sha1('\x1e'.join([' '.join(words)] + option_keys).encode('utf-8')).hexdigest()
+
+    text_shingles = {f'{a} {b}' for a, b in zip(words, words[1:])} or set(words)
+    shingles = text_shingles | {'\x1f' + key for key in option_keys if key}
+    return Fingerprint(content_hash, frozenset(shingles), _buckets(text_shingles))
+
+
+def _buckets(shingles: Set[str]) -> List[int]:
+    if not shingles:
+        return []
+    values = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') % _PRIME
+         for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    signature = ((_A * values + _B) % _PRIME).min(axis=1).astype('<u4').reshape(BANDS, ROWS_PER_BAND)
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.tobytes(), digest_size=8, person=i.to_bytes(2, 'little')).digest(),
+            'little', signed=True
+        )
+        for i, band in enumerate(signature)
+    ]
+
+
+def similarity(a: Fingerprint, b: Fingerprint) -> float:
+    """Jaccard similarity of two fingerprints' shingles (1.0 for identical content)."""
+    if a.content_hash == b.content_hash:
+        return 1.0
+    if not a.shingles or not b.shingles:
+        return 0.0
+    return len(a.shingles & b.shingles) / len(a.shingles | b.shingles)
+
+
+def find_duplicates(text: str, options: Iterable[str], exclude_id: Optional[int] = None) -> List[Dict]:
+    """
+    Find questions in the bank that are near-duplicates of the given content.
+
+    Returns:
+        list: ``{"id", "text", "category", "similarity"}`` dicts, most similar first
+    """
+    return match([fingerprint(text, options)], exclude_id)[0]
+
+
+def match(fingerprints: Sequence[Fingerprint], exclude_id: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Find the bank's near-duplicates of several fingerprints at once.
+
+    One query for exact hashes, one for shared buckets and two to load the
+    candidates, however many fingerprints are checked (per BATCH values).
+
+    Returns:
+        list: For each fingerprint, its matches as in ``find_duplicates``
+    """
+    exact: Dict[str, List[int]] = {}
+    for hashes in _chunks(list({fp.content_hash for fp in fingerprints})):
+        for question_id, content_hash in db.session.execute(
+            select(Question.id, Question.content_hash).where(Question.content_hash.in_(hashes))
+        ):
+            exact.setdefault(content_hash, []).append(question_id)
+
+    in_bucket: Dict[int, List[int]] = {}
+    for buckets in _chunks(list({b for fp in fingerprints for b in fp.buckets})):
+        for bucket, question_id in db.session.execute(
+            select(QuestionBucket.bucket, QuestionBucket.question_id).where(QuestionBucket.bucket.in_(buckets))
+        ):
+            in_bucket.setdefault(bucket, []).append(question_id)
+
+    candidates: List[List[int]] = []
+    for fp in fingerprints:
+        shared = Counter(question_id for b in fp.buckets for question_id in in_bucket.get(b, ()))
+        ids = exact.get(fp.content_hash, []) + [question_id for question_id, _ in shared.most_common(MAX_CANDIDATES)]
+        candidates.append([question_id for question_id in dict.fromkeys(ids) if question_id != exclude_id])
+
+    stored = _load([question_id for ids in candidates for question_id in ids])
+    results = []
+    for fp, ids in zip(fingerprints, candidates):
+        matches = []
+        for question_id in ids:
+            uuid, text, category, other = stored[question_id]
+            score = similarity(fp, other)
+            if score >= SIMILARITY_THRESHOLD:
+                matches.append({'id': uuid, 'text': text, 'category': category, 'similarity': round(score, 3)})
+        matches.sort(key=lambda m: -m['similarity'])
+        results.append(matches)
+    return results
+
+
+class LocalIndex:
+    """In-memory fingerprint index for spotting duplicates within one upload."""
+
+    def __init__(self):
+        self._hashes: Dict[str, object] = {}
+        self._fingerprints: Dict[object, Fingerprint] = {}
+        self._buckets: Dict[int, List[object]] = {}
+
+    def add(self, key, fp: Fingerprint) -> None:
+        self._hashes.setdefault(fp.content_hash, key)
+        self._fingerprints[key] = fp
+        for b in fp.buckets:
+            keys = self._buckets.setdefault(b, [])
+            if len(keys) < LOCAL_BUCKET_SIZE:
+                keys.append(key)
+
+    def match(self, fp: Fingerprint) -> Optional[Tuple[object, float]]:
+        """Return (key, similarity) of the best earlier entry at or above the threshold, or None."""
+        if fp.content_hash in self._hashes:
+            return self._hashes[fp.content_hash], 1.0
+        shared = Counter(key for b in fp.buckets for key in self._buckets.get(b, ()))
+        best = None
+        for key, _ in shared.most_common(MAX_CANDIDATES):
+            score = similarity(fp, self._fingerprints[key])
+            if score >= SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+                best = (key, round(score, 3))
+        return best
+
+
+def add_many(pairs: Sequence[Tuple[int, Fingerprint]]) -> None:
+    """Store content hashes and LSH buckets of flushed questions in two statements, inside the caller's transaction."""
+    if not pairs:
+        return
+    # Core update so fingerprinting does not bump updated_at
+    table = Question.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_id'))
+        .values(content_hash=bindparam('b_hash'), updated_at=table.c.updated_at),
+        [{'b_id': question_id, 'b_hash': fp.content_hash} for question_id, fp in pairs]
+    )
+    add_buckets(pairs)
+
+
+def add_buckets(pairs: Sequence[Tuple[int, Fingerprint]]) -> None:
+    """Store only the LSH buckets, for questions inserted with their ``content_hash`` already set."""
+    rows = [
+        {'question_id': question_id, 'bucket': b}
+        for question_id, fp in pairs
+        for b in set(fp.buckets)
+    ]
+    if rows:
+        db.session.execute(insert(QuestionBucket.__table__), rows)
+
+
+def index_question(question_id: int) -> None:
+    """(Re)fingerprint one question from its flushed rows, inside the caller's transaction."""
+    remove(question_id)
+    _, _, _, fp = _load([question_id])[question_id]
+    add_many([(question_id, fp)])
+
+
+def remove(question_id: int) -> None:
+    """Drop one question's LSH buckets, inside the caller's transaction."""
+    db.session.execute(delete(QuestionBucket).where(QuestionBucket.question_id == question_id))
+
+
+def ensure_index() -> int:
+    """
+    Fingerprint questions that have no content hash yet (written before this
+    existed, or by hand) and commit.
+
+    Returns:
+        int: Number of questions fingerprinted
+    """
+    indexed = 0
+    while True:
+        ids = list(db.session.execute(
+            select(Question.id).where(Question.content_hash.is_(None)).order_by(Question.id).limit(BATCH)
+        ).scalars())
+        if not ids:
+            break
+        db.session.execute(delete(QuestionBucket).where(QuestionBucket.question_id.in_(ids)))
+        add_many([(question_id, stored[3]) for question_id, stored in _load(ids).items()])
+        db.session.commit()
+        indexed += len(ids)
+    return indexed
+
+
+def rebuild() -> int:
+    """
+    Re-fingerprint every question and commit.
+
+    Returns:
+        int: Number of questions fingerprinted
+    """
+    db.session.execute(delete(QuestionBucket))
+    db.session.execute(
+        update(Question.__table__).values(content_hash=None, updated_at=Question.__table__.c.updated_at)
+    )
+    db.session.commit()
+    return ensure_index()
+
+
+def _load(question_ids: List[int]) -> Dict[int, Tuple[str, str, str, Fingerprint]]:
+    """Fingerprint stored questions: id -> (uuid, text, category, fingerprint)."""
+    ids = list(dict.fromkeys(question_ids))
+    options: Dict[int, List[str]] = {}
+    rows = []
+    for chunk in _chunks(ids):
+        for question_id, option_text in db.session.execute(
+            select(Option.question_id, Option.text).where(Option.question_id.in_(chunk))
+        ):
+            options.setdefault(question_id, []).append(option_text)
+        rows.extend(db.session.execute(
+            select(Question.id, Question.uuid, Question.text, Question.category).where(Question.id.in_(chunk))
+        ))
+    return {
+        pk: (uuid, text, category, fingerprint(text, options.get(pk, [])))
+        for pk, uuid, text, category in rows
+    }
+
+
+def _chunks(values: List) -> Iterable[List]:
+    for start in range(0, len(values), BATCH):
+        yield values[start:start + BATCH]
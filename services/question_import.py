@@ -0,0 +1,266 @@
+"""
+Bulk question import for the CET Exam App
+
+Reads an uploaded XLSX or CSV question sheet row by row (openpyxl in
+read-only mode, or the csv module over the upload stream), validates each
+row, and inserts the questions, their options, concept ids and search index
+entries a batch at a time with multi-row statements, one transaction per
+batch. Rows that fail validation are skipped and reported by row number.
+
+Each batch is also checked for near-duplicates (services/question_dedupe.py)
+of questions already in the bank or of earlier rows in the same file, in a
+few queries per batch; those rows are skipped, or imported and flagged.
+
+Sheet layout, as in the downloadable templates, with a header row first:
+
+    Question | Option A | Option B | Option C | Option D | Correct (A-D) | Explanation | Difficulty (1-3)
+"""
+
+import csv
+import io
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import openpyxl
+from sqlalchemy import insert
+
+from database import db
+from models.sql_models import Option, Question, SubjectCategoryModel
+from services import question_dedupe, question_search
+from services.concept_index import count_concepts, encode_concepts, resolve_concepts
+
+LETTERS = ('A', 'B', 'C', 'D')
+DIFFICULTY_LEVELS = (1, 2, 3)
+# Errors listed in the report; the count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(stream, filename: str) -> Iterator[Tuple[int, Sequence]]:
+    """
+    Open an uploaded sheet and iterate over (row number, cells) for each data row, skipping the header.
+
+    Raises:
+        ValueError: If the file is not a readable XLSX or CSV file
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        rows = csv.reader(text)
+    elif extension == 'xlsx':
+        try:
+            workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        except Exception:
+            raise ValueError("Could not read the XLSX file")
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+    elif extension == 'xls':
+        # openpyxl cannot read the legacy binary format
+        raise ValueError("Legacy .xls workbooks are not supported; save the sheet as .xlsx or .csv")
+    else:
+        raise ValueError("Upload an .xlsx or .csv file")
+    return _numbered(rows)
+
+
+def _numbered(rows) -> Iterator[Tuple[int, Sequence]]:
+    try:
+        for number, row in enumerate(rows, 1):
+            if number > 1:
+                yield number, row
+    except UnicodeDecodeError:
+        raise ValueError("CSV files must be UTF-8 encoded")
+
+
+def parse_row(cells: Sequence) -> Optional[Dict]:
+    """
+    Validate one sheet row.
+
+    Returns:
+        dict: ``text``, ``options`` (non-empty option texts in order),
+        ``correct`` (index into options), ``explanation`` and
+        ``difficulty_level``; None for a blank row
+
+    Raises:
+        ValueError: With a message for the report if the row is invalid
+    """
+    values = [_cell(c) for c in cells][:8]
+    if not any(values):
+        return None
+    values += [''] * (8 - len(values))
+    text, a, b, c, d, correct, explanation, difficulty = values
+
+    if not text:
+        raise ValueError("Question text is empty")
+
+    options = []
+    correct_index = None
+    letter = correct.upper()
+    if letter not in LETTERS:
+        raise ValueError(f"Correct option must be one of A-D, got '{correct}'")
+    for option_letter, option_text in zip(LETTERS, (a, b, c, d)):
+        if option_text:
+            if option_letter == letter:
+                correct_index = len(options)
+            options.append(option_text)
+    if len(options) < 2:
+        raise ValueError("At least two options are required")
+    if correct_index is None:
+        raise ValueError(f"Correct option {letter} is empty")
+
+    if difficulty:
+        try:
+            level = int(float(difficulty))
+        except ValueError:
+            raise ValueError(f"Difficulty must be 1, 2 or 3, got '{difficulty}'")
+        if level not in DIFFICULTY_LEVELS:
+            raise ValueError(f"Difficulty must be 1, 2 or 3, got '{difficulty}'")
+    else:
+        level = 1
+
+    return {
+        'text': text,
+        'options': options,
+        'correct': correct_index,
+        'explanation': explanation,
+        'difficulty_level': level
+    }
+
+
+def import_questions(rows, category: str, batch_size: int = 1000, skip_duplicates: bool = True) -> Dict:
+    """
+    Insert every valid row as a question in ``category``.
+
+    Args:
+        rows: (row number, cells) pairs, e.g. from ``read_rows``
+        category: Subject category for every imported question
+        batch_size: Questions per transaction
+        skip_duplicates: Leave out near-duplicates instead of importing them
+            (they are reported either way)
+
+    Returns:
+        Dict with ``imported`` count, ``failed`` count and per-row ``errors``
+        (``row``, ``message``), ``duplicates`` count and ``duplicate_rows``
+        (``row``, ``similarity`` and the ``question`` or earlier ``same_as_row``
+        it repeats), the first MAX_REPORTED_ERRORS of each, plus ``aborted``
+        with the reason if the file could not be read to the end
+
+    Raises:
+        ValueError: If the category does not exist
+    """
+    if not db.session.query(SubjectCategoryModel.id).filter_by(name=category).first():
+        raise ValueError(f"Unknown category: {category}")
+
+    report = {'imported': 0, 'failed': 0, 'errors': [], 'duplicates': 0, 'duplicate_rows': []}
+    seen = question_dedupe.LocalIndex()
+
+    def fail(number: int, message: str) -> None:
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'message': message})
+
+    batch: List[Tuple[int, Dict]] = []
+    try:
+        for number, cells in rows:
+            try:
+                parsed = parse_row(cells)
+            except ValueError as e:
+                fail(number, str(e))
+                continue
+            if parsed is None:
+                continue
+            batch.append((number, parsed))
+            if len(batch) >= batch_size:
+                _write_batch(batch, category, report, fail, seen, skip_duplicates)
+                batch = []
+    except ValueError as e:
+        # The file broke off part way (earlier batches are already saved); keep what was read
+        report['aborted'] = str(e)
+    if batch:
+        _write_batch(batch, category, report, fail, seen, skip_duplicates)
+    return report
+
+
+def _write_batch(batch: List[Tuple[int, Dict]], category: str, report: Dict, fail,
+                 seen: question_dedupe.LocalIndex, skip_duplicates: bool) -> None:
+    try:
+        batch = _check_duplicates(batch, report, seen, skip_duplicates)
+        if not batch:
+            return
+        concepts = {number: count_concepts(row['explanation']) for number, row in batch}
+        concept_ids = resolve_concepts(list({k for pairs in concepts.values() for k, _ in pairs}))
+
+        now = datetime.now()
+        questions = Question.__table__
+        question_ids = db.session.execute(
+            insert(questions).returning(questions.c.id, sort_by_parameter_order=True),
+            [
+                {
+                    'uuid': str(uuid.uuid4()),
+                    'text': row['text'],
+                    'category': category,
+                    'explanation': row['explanation'],
+                    'difficulty_level': row['difficulty_level'],
+                    'concept_ids': encode_concepts((concept_ids[k], n) for k, n in concepts[number]),
+                    'content_hash': row['fingerprint'].content_hash,
+                    'sample_key': random.random(),
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for number, row in batch
+            ]
+        ).scalars().all()
+
+        db.session.execute(insert(Option.__table__), [
+            {
+                'question_id': question_id,
+                'option_id': str(i + 1),
+                'text': option_text,
+                'is_correct': i == row['correct']
+            }
+            for question_id, (_, row) in zip(question_ids, batch)
+            for i, option_text in enumerate(row['options'])
+        ])
+        question_search.index_new_questions(question_ids)
+        question_dedupe.add_buckets([
+            (question_id, row['fingerprint']) for question_id, (_, row) in zip(question_ids, batch)
+        ])
+        db.session.commit()
+        report['imported'] += len(batch)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing questions: {e}")
+        for number, _ in batch:
+            fail(number, "Could not be saved")
+
+
+def _check_duplicates(batch: List[Tuple[int, Dict]], report: Dict, seen: question_dedupe.LocalIndex,
+                      skip_duplicates: bool) -> List[Tuple[int, Dict]]:
+    """Fingerprint the batch, report near-duplicates and return the rows to insert."""
+    for _, row in batch:
+        row['fingerprint'] = question_dedupe.fingerprint(row['text'], row['options'])
+    in_bank = question_dedupe.match([row['fingerprint'] for _, row in batch])
+
+    keep = []
+    for (number, row), matches in zip(batch, in_bank):
+        if matches:
+            duplicate = {'row': number, 'similarity': matches[0]['similarity'], 'question': matches[0]}
+        else:
+            earlier = seen.match(row['fingerprint'])
+            duplicate = earlier and {'row': number, 'similarity': earlier[1], 'same_as_row': earlier[0]}
+        if duplicate:
+            report['duplicates'] += 1
+            if len(report['duplicate_rows']) < MAX_REPORTED_ERRORS:
+                report['duplicate_rows'].append(duplicate)
+            if skip_duplicates:
+                continue
+        seen.add(number, row['fingerprint'])
+        keep.append((number, row))
+    return keep
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
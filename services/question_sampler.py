@@ -0,0 +1,220 @@
+"""
+Random question sampling for exam assembly in the CET Exam App
+
+Every question carries a ``sample_key`` drawn uniformly from [0, 1) when it
+is created, indexed together with its category and difficulty level
+(``idx_questions_sample``). Taking "the first key after a random point"
+would favour questions that follow a wide gap between keys, and with keys
+fixed those would be favoured on every draw. Instead a draw from a
+(category, difficulty) pool of N questions probes a window of width
+``WINDOW_KEYS / N`` at a random point, which holds about ``WINDOW_KEYS``
+keys, and picks one of ``WINDOW_SLOTS`` slots at random: the key in that
+slot of the window is drawn, and an empty slot draws nothing. Every
+question then lies in a probed window with the same probability and is
+picked from it with probability ``1 / WINDOW_SLOTS``, so each draw is
+uniform whatever the gaps. A draw of ``count`` questions sends its probes
+as one query, each an index range read of a few rows, and retries only the
+misses and collisions, so the cost follows the number of questions drawn,
+not the size of the bank.
+
+Questions written without a key (before sampling existed, or by hand) get
+one from ``ensure_keys`` at start-up, and schema.sql backfills them too, so
+a draw only ever reads.
+
+The random points come from ``random.Random(seed)``: the same seed over the
+same bank gives the same questions, and different seeds (a student's ID,
+say) give different variants of one blueprint.
+"""
+
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, literal, select, union_all, update
+
+from database import db
+from models.sql_models import Question
+
+# Probe rounds before a draw falls back to reading the whole pool's keys
+MAX_PROBE_ROUNDS = 8
+# Probes per query
+PROBE_CHUNK = 100
+# Questions given a key per statement by ensure_keys
+BACKFILL_BATCH = 500
+# Keys expected in one probe window, and slots a window is drawn from; a
+# window holding more keys than slots (p < 10^-10) falls back too
+WINDOW_KEYS = 8
+WINDOW_SLOTS = 32
+
+
+def parse_blueprint(blueprint) -> List[Tuple[str, int, int]]:
+    """
+    Validate a blueprint.
+
+    Args:
+        blueprint: List of ``{"category", "difficulty_level", "count"}`` dicts
+
+    Returns:
+        list: (category, difficulty_level, count) tuples, in blueprint order
+
+    Raises:
+        ValueError: If the blueprint is malformed
+    """
+    if not isinstance(blueprint, list) or not blueprint:
+        raise ValueError("blueprint must be a non-empty list")
+    parts = []
+    for part in blueprint:
+        try:
+            category = part['category']
+            level = int(part.get('difficulty_level', 1))
+            count = int(part['count'])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Each blueprint entry needs a category, a count and optionally a difficulty_level")
+        if not isinstance(category, str) or not category:
+            raise ValueError("Blueprint category must be a string")
+        if count < 1:
+            raise ValueError("Blueprint count must be positive")
+        parts.append((category, level, count))
+    return parts
+
+
+def pool_sizes(categories: Optional[List[str]] = None) -> Dict[str, Dict[int, int]]:
+    """Count questions per category and difficulty level, from the sampling index."""
+    query = (
+        db.session.query(Question.category, Question.difficulty_level, func.count(Question.id))
+        .group_by(Question.category, Question.difficulty_level)
+    )
+    if categories:
+        query = query.filter(Question.category.in_(categories))
+    sizes: Dict[str, Dict[int, int]] = {}
+    for category, level, count in query:
+        sizes.setdefault(category, {})[level] = count
+    return sizes
+
+
+def sample(blueprint, seed: Optional[str] = None) -> List[int]:
+    """
+    Draw questions for a blueprint.
+
+    Args:
+        blueprint: List of ``{"category", "difficulty_level", "count"}`` dicts
+        seed: Makes the draw repeatable; None draws fresh questions every time
+
+    Returns:
+        list: Internal question ids, grouped in blueprint order
+
+    Raises:
+        ValueError: If the blueprint is malformed or a pool holds too few questions
+    """
+    rng = random.Random(seed)
+    chosen: List[int] = []
+    taken: Dict[Tuple[str, int], Set[int]] = {}
+    for category, level, count in parse_blueprint(blueprint):
+        exclude = taken.setdefault((category, level), set())
+        ids = _sample_pool(category, level, count, rng, exclude)
+        exclude.update(ids)
+        chosen.extend(ids)
+    return chosen
+
+
+def _sample_pool(category: str, level: int, count: int, rng: random.Random, exclude: Set[int]) -> List[int]:
+    # Questions without a key (added by hand since start-up) are left out until ensure_keys runs
+    pool_size = (
+        db.session.query(func.count(Question.id))
+        .filter(Question.category == category, Question.difficulty_level == level, Question.sample_key.is_not(None))
+        .scalar()
+    )
+    available = pool_size - len(exclude)
+    if available < count:
+        raise ValueError(f"Only {max(available, 0)} questions in {category} at difficulty {level}, {count} requested")
+
+    # Probes mostly collide when drawing most of a pool; read its keys instead
+    if count * 2 > available:
+        return _sample_all(category, level, count, rng, exclude)
+
+    ids: List[int] = []
+    seen = set(exclude)
+    width = WINDOW_KEYS / pool_size
+    for _ in range(MAX_PROBE_ROUNDS):
+        # About one probe in WINDOW_SLOTS / WINDOW_KEYS lands on a key
+        probes = [
+            (rng.uniform(-width, 1.0), rng.randrange(WINDOW_SLOTS))
+            for _ in range((count - len(ids)) * WINDOW_SLOTS // WINDOW_KEYS)
+        ]
+        windows = _probe(category, level, [point for point, _ in probes], width)
+        for (_, slot), window in zip(probes, windows):
+            if len(window) > WINDOW_SLOTS:
+                return ids + _sample_all(category, level, count - len(ids), rng, seen)
+            if slot < len(window) and window[slot] not in seen:
+                seen.add(window[slot])
+                ids.append(window[slot])
+                if len(ids) == count:
+                    return ids
+    # Unlucky probes; finish from the whole pool, keeping what was already drawn
+    return ids + _sample_all(category, level, count - len(ids), rng, seen)
+
+
+def _probe(category: str, level: int, points: List[float], width: float) -> List[List[int]]:
+    """
+    Return the questions with keys in [point, point + width) for each point,
+    in key order, reading at most ``WINDOW_SLOTS + 1`` per window.
+
+    Points start at ``-width`` so the windows near 0 are as likely to be
+    probed as any other; keys never wrap round.
+    """
+    in_pool = (Question.category == category, Question.difficulty_level == level)
+    found: Dict[int, List[Tuple[float, int]]] = {}
+    for start in range(0, len(points), PROBE_CHUNK):
+        probes = []
+        for i, point in enumerate(points[start:start + PROBE_CHUNK], start):
+            probe = (
+                select(literal(i).label('probe'), Question.sample_key, Question.id)
+                .where(*in_pool, Question.sample_key >= point, Question.sample_key < point + width)
+                .order_by(Question.sample_key, Question.id)
+                .limit(WINDOW_SLOTS + 1)
+                .subquery()
+            )
+            probes.append(select(probe.c.probe, probe.c.sample_key, probe.c.id))
+        for probe, key, question_id in db.session.execute(union_all(*probes)):
+            found.setdefault(probe, []).append((key, question_id))
+    return [[question_id for _, question_id in sorted(found.get(i, []))] for i in range(len(points))]
+
+
+def _sample_all(category: str, level: int, count: int, rng: random.Random, exclude: Set[int]) -> List[int]:
+    ids = [
+        question_id for (question_id,) in db.session.execute(
+            select(Question.id)
+            .where(Question.category == category, Question.difficulty_level == level, Question.sample_key.is_not(None))
+            .order_by(Question.sample_key, Question.id)
+        )
+        if question_id not in exclude
+    ]
+    return rng.sample(ids, count)
+
+
+def ensure_keys() -> int:
+    """
+    Give sample keys to questions that have none (written before sampling
+    existed, or by hand) and commit. Run at start-up; schema.sql does the
+    same for PostgreSQL deployments.
+
+    Returns:
+        int: Number of questions given a key
+    """
+    table = Question.__table__
+    assigned = 0
+    while True:
+        ids = list(db.session.execute(
+            select(Question.id).where(Question.sample_key.is_(None)).order_by(Question.id).limit(BACKFILL_BATCH)
+        ).scalars())
+        if not ids:
+            break
+        # Core update so the backfill does not bump updated_at
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(sample_key=bindparam('b_key'), updated_at=table.c.updated_at),
+            [{'b_id': question_id, 'b_key': random.random()} for question_id in ids]
+        )
+        db.session.commit()
+        assigned += len(ids)
+    return assigned
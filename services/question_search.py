@@ -0,0 +1,205 @@
+"""
+Full-text search over the question bank for the CET Exam App
+
+Each question's text, explanation and option texts are indexed in a
+``question_search`` table keyed by question id:
+
+- SQLite: an FTS5 virtual table, ranked with ``bm25`` (text weighted above
+  the explanation, the explanation above the options).
+- PostgreSQL: a ``tsvector`` column with a GIN index, weighted A/B/C the
+  same way and ranked with ``ts_rank_cd``.
+
+``ExamService.create_question``, ``update_question`` and ``delete_question``
+(and the bulk importer) keep the index in the same transaction as the
+question itself, and
+``ensure_index`` (run at start-up) creates the table and backfills it when
+it is out of step with the questions table.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, text
+
+from database import db
+from models.sql_models import Question, Option
+
+# Questions indexed per statement when backfilling
+REBUILD_BATCH = 500
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+def ensure_index() -> None:
+    """Create the search table if needed and backfill it if it has fallen out of step."""
+    if _dialect() == 'postgresql':
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS question_search ("
+            " question_id INTEGER PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,"
+            " document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_question_search_document ON question_search USING GIN (document)"
+        ))
+    else:
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5("
+            "text, explanation, options, tokenize = 'porter unicode61')"
+        ))
+    db.session.commit()
+
+    indexed = db.session.execute(text("SELECT COUNT(*) FROM question_search")).scalar()
+    if indexed != db.session.query(Question).count():
+        rebuild()
+
+
+def rebuild() -> int:
+    """
+    Re-index every question and commit.
+
+    Returns:
+        int: Number of questions indexed
+    """
+    db.session.execute(text("DELETE FROM question_search"))
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = [
+            pk for (pk,) in db.session.query(Question.id)
+            .filter(Question.id > last_id)
+            .order_by(Question.id)
+            .limit(REBUILD_BATCH)
+        ]
+        if not ids:
+            break
+        _insert(_documents(ids))
+        indexed += len(ids)
+        last_id = ids[-1]
+    db.session.commit()
+    return indexed
+
+
+def index_question(question_id: int) -> None:
+    """(Re)index one question from its flushed rows, inside the caller's transaction."""
+    remove(question_id)
+    _insert(_documents([question_id]))
+
+
+def index_new_questions(question_ids: List[int]) -> None:
+    """Index freshly inserted questions in one statement, inside the caller's transaction."""
+    _insert(_documents(question_ids))
+
+
+def remove(question_id: int) -> None:
+    """Drop one question from the index, inside the caller's transaction."""
+    column = 'question_id' if _dialect() == 'postgresql' else 'rowid'
+    db.session.execute(text(f"DELETE FROM question_search WHERE {column} = :id"), {'id': question_id})
+
+
+def search(query: str,
+           categories: Optional[List[str]] = None,
+           difficulty_level: Optional[int] = None,
+           offset: int = 0,
+           limit: int = 20) -> Dict:
+    """
+    Find questions matching every word of ``query``, best match first.
+
+    The last word also matches as a prefix, so partially typed words find
+    results. Punctuation and search operators in the query are ignored.
+
+    Args:
+        query: Words to search for
+        categories: Only these categories
+        difficulty_level: Only this difficulty level
+        offset: Matches to skip (``next`` from the previous page)
+        limit: Page size
+
+    Returns:
+        Dict with ``questions`` (each with its ``rank``, lower is better on
+        SQLite, higher on PostgreSQL) and ``next`` (None on the last page)
+    """
+    words = _WORD.findall(query.lower())
+    if not words:
+        return {'questions': [], 'next': None}
+
+    params = {'offset': offset, 'limit': limit + 1}
+    filters = ''
+    if categories:
+        filters += ' AND q.category IN :categories'
+        params['categories'] = list(categories)
+    if difficulty_level is not None:
+        filters += ' AND q.difficulty_level = :difficulty_level'
+        params['difficulty_level'] = difficulty_level
+
+    if _dialect() == 'postgresql':
+        params['match'] = ' & '.join(words[:-1] + [words[-1] + ':*'])
+        statement = text(
+            "SELECT q.id, ts_rank_cd(s.document, to_tsquery('english', :match)) AS rank"
+            " FROM question_search s JOIN questions q ON q.id = s.question_id"
+            " WHERE s.document @@ to_tsquery('english', :match)" + filters +
+            " ORDER BY rank DESC, q.id LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params['match'] = ' '.join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+        statement = text(
+            "SELECT q.id, bm25(question_search, 10.0, 4.0, 1.0) AS rank"
+            " FROM question_search JOIN questions q ON q.id = question_search.rowid"
+            " WHERE question_search MATCH :match" + filters +
+            " ORDER BY rank, q.id LIMIT :limit OFFSET :offset"
+        )
+    if categories:
+        statement = statement.bindparams(bindparam('categories', expanding=True))
+
+    rows = db.session.execute(statement, params).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    questions = {
+        q.id: q for q in Question.query.filter(Question.id.in_([row.id for row in rows]))
+    }
+    results = []
+    for row in rows:
+        question = questions[row.id].to_dict()
+        question['rank'] = row.rank
+        results.append(question)
+    return {'questions': results, 'next': offset + limit if has_more else None}
+
+
+def _documents(question_ids: List[int]) -> List[Dict]:
+    options: Dict[int, List[str]] = {}
+    for question_id, option_text in (
+        db.session.query(Option.question_id, Option.text)
+        .filter(Option.question_id.in_(question_ids))
+        .order_by(Option.id)
+    ):
+        options.setdefault(question_id, []).append(option_text)
+    return [
+        {'id': pk, 'text': text_, 'explanation': explanation, 'options': ' '.join(options.get(pk, []))}
+        for pk, text_, explanation in (
+            db.session.query(Question.id, Question.text, Question.explanation)
+            .filter(Question.id.in_(question_ids))
+        )
+    ]
+
+
+def _insert(documents: Iterable[Dict]) -> None:
+    documents = list(documents)
+    if not documents:
+        return
+    if _dialect() == 'postgresql':
+        statement = text(
+            "INSERT INTO question_search (question_id, document) VALUES (:id,"
+            " setweight(to_tsvector('english', :text), 'A') ||"
+            " setweight(to_tsvector('english', :explanation), 'B') ||"
+            " setweight(to_tsvector('english', :options), 'C'))"
+        )
+    else:
+        statement = text(
+            "INSERT INTO question_search (rowid, text, explanation, options)"
+            " VALUES (:id, :text, :explanation, :options)"
+        )
+    db.session.execute(statement, documents)
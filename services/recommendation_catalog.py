@@ -0,0 +1,104 @@
+"""
+Recommendation template catalog for the CET Exam App
+
+Graded results store recommendations as a template id plus, where needed, a
+parameter; the text is rendered from the template when the result is read.
+``{category}`` is filled from the recommendation's category and
+``{params}`` from its stored parameter.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models.sql_models import RecommendationTemplate
+
+TEMPLATES = {
+    # Overall performance
+    'overall.excellent': "Excellent performance! Consider exploring advanced topics.",
+    'overall.good': "Good performance. Focus on the categories where you scored lower.",
+    'overall.average': "Average performance. Review the explanations for questions you got wrong.",
+    'overall.practice': "You need more practice. Focus on understanding the basic concepts first.",
+    'overall.missed_concepts': "Focus on these frequently missed concepts: {params}.",
+
+    # Any category
+    'category.weak': "Review the fundamentals of {category}.",
+    'category.basic': "You have a basic understanding of {category}. Practice more complex problems.",
+    'category.strong': "You have a good grasp of {category}. Focus on advanced topics.",
+
+    # Specific categories
+    'reasoning.weak': "Practice logical reasoning puzzles and pattern recognition exercises.",
+    'reasoning.basic': "Work on analytical reasoning and critical thinking problems.",
+    'reasoning.strong': "Challenge yourself with complex logical puzzles and advanced reasoning problems.",
+    'english.weak': "Focus on grammar rules and vocabulary building.",
+    'english.basic': "Practice reading comprehension and sentence correction exercises.",
+    'english.strong': "Work on advanced writing skills and complex comprehension passages.",
+    'computer_concepts.weak': "Study basic computer architecture and operating system concepts.",
+    'computer_concepts.basic': "Learn about networking concepts and database fundamentals.",
+    'computer_concepts.strong': "Explore cloud computing, cybersecurity, and emerging technologies.",
+    'maths.weak': "Practice basic maths syntax and simple programming exercises.",
+    'maths.basic': "Study data structures and algorithms in maths.",
+    'maths.strong': "Learn advanced maths concepts like decorators, generators, and concurrent programming.",
+}
+
+class RecommendationCatalog:
+    """Process-wide cache of template key <-> id, synced with the database once."""
+
+    def __init__(self, templates: Dict[str, str]):
+        self.templates = templates
+        self._ids: Optional[Dict[str, int]] = None
+        self._texts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Make sure the catalog is synced; call before starting a write transaction."""
+        self._load()
+
+    def template_id(self, key: str) -> int:
+        """Return the database id of a template key."""
+        return self._load()[key]
+
+    def text(self, template_id: int) -> Optional[str]:
+        """Return the raw template text for an id."""
+        self._load()
+        return self._texts.get(template_id)
+
+    def render(self, template_id: int, category: Optional[str], params: Optional[str]) -> str:
+        """Render a stored recommendation."""
+        return RecommendationTemplate.fill(self.text(template_id) or '', category, params)
+
+    def _load(self) -> Dict[str, int]:
+        if self._ids is not None:
+            return self._ids
+        with self._lock:
+            if self._ids is None:
+                self._ids = self._sync()
+        return self._ids
+
+    def _sync(self) -> Dict[str, int]:
+        """Insert missing templates, bring changed texts up to date and load the mapping."""
+        # Own connection and transaction, so a caller's unfinished work is never committed here
+        table = RecommendationTemplate.__table__
+        with db.engine.begin() as conn:
+            stored = {r.key: r.text for r in conn.execute(select(table.c.key, table.c.text))}
+            missing = [{'key': k, 'text': t} for k, t in self.templates.items() if k not in stored]
+            if missing:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(table), missing)
+                except IntegrityError:
+                    # Another process seeded them first
+                    pass
+            for key, text in self.templates.items():
+                if key in stored and stored[key] != text:
+                    conn.execute(update(table).where(table.c.key == key).values(text=text))
+            rows = conn.execute(select(table.c.id, table.c.key, table.c.text)).all()
+
+        self._texts = {r.id: r.text for r in rows}
+        return {r.key: r.id for r in rows}
+
+# Shared by the grading and result read paths
+recommendation_catalog = RecommendationCatalog(TEMPLATES)
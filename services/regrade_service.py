@@ -0,0 +1,199 @@
+"""
+Incremental regrading for the CET Exam App
+
+When a question's correct option changes, only the stored answers to that
+question are flipped, and the affected exam and category scores are shifted
+by the matching delta instead of regrading whole results.
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import Integer, and_, bindparam, case, func, literal, select, update
+
+from database import db
+from models.sql_models import Question, Option, ExamResult, ResultAnswer, CategoryScore
+from services import progress_stats
+from services.answer_key_cache import exam_uuids_for_question
+from services.result_review import review_cache
+
+class RegradeService:
+    """Service for applying answer-key fixes to results that were already graded."""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._locks: Dict[int, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def schedule(self, question_id: int) -> None:
+        """Regrade a question (by internal id) on a background thread."""
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    stats = self.regrade_question(question_id)
+                    print(f"Regraded question {question_id}: {stats['answers']} answers in {stats['results']} results")
+                except Exception as e:
+                    print(f"Error regrading question {question_id}: {e}")
+
+        threading.Thread(target=run, name=f"regrade-{question_id}", daemon=True).start()
+
+    def regrade_question(self, question_id: int) -> Dict[str, int]:
+        """
+        Bring every stored answer to a question in line with its current answer key.
+
+        Works in keyset batches of ``batch_size`` answers, each committed on
+        its own. Only answers whose ``is_correct`` disagrees with the key are
+        touched, so the job is idempotent and safe to rerun after an
+        interruption. The flip re-checks that disagreement in its own WHERE
+        clause and the score shifts follow only the rows it actually changed,
+        so a regrade running in another process (a ``flask regrade-question``
+        resume next to the server's thread) cannot apply the same delta twice.
+
+        Returns:
+            Dict with the number of flipped ``answers`` and affected ``results``
+        """
+        with self._lock_for(question_id):
+            question = db.session.get(Question, question_id)
+            if not question:
+                return {'answers': 0, 'results': 0}
+            category = question.category
+
+            flipped = 0
+            results = 0
+            users = set()
+            last_id = 0
+            while True:
+                try:
+                    # Re-read the key every batch in case it changed again mid-run
+                    correct_option = self._correct_option(question_id)
+                    now_correct = self._is_correct_expr(correct_option)
+
+                    ids = db.session.execute(
+                        select(ResultAnswer.id)
+                        .where(
+                            ResultAnswer.question_id == question_id,
+                            ResultAnswer.id > last_id,
+                            ResultAnswer.is_correct != now_correct
+                        )
+                        .order_by(ResultAnswer.id)
+                        .limit(self.batch_size)
+                    ).scalars().all()
+                    if not ids:
+                        db.session.commit()
+                        break
+
+                    # Rows another regrade flipped in the meantime no longer match and are not returned
+                    answers = ResultAnswer.__table__
+                    changed = db.session.execute(
+                        update(answers)
+                        .where(answers.c.id.in_(ids), answers.c.is_correct != now_correct)
+                        .values(is_correct=now_correct)
+                        .returning(answers.c.result_id, answers.c.is_correct)
+                    ).all()
+                    # Net questions gained per result; a question that appears twice in an
+                    # exam has two answer rows, and both can flip
+                    shifts = Counter()
+                    for r in changed:
+                        shifts[r.result_id] += 1 if r.is_correct else -1
+                    affected = list({r.result_id for r in changed})
+
+                    self._shift_scores(shifts, affected, category)
+                    users.update(db.session.execute(
+                        select(ExamResult.user_id).where(ExamResult.id.in_(affected)).distinct()
+                    ).scalars())
+                    db.session.commit()
+
+                    flipped += len(changed)
+                    results += len(affected)
+                    last_id = ids[-1]
+                except Exception:
+                    db.session.rollback()
+                    raise
+
+            # Stored scores moved, so the running aggregates of those users are replayed
+            if users:
+                progress_stats.rebuild(list(users))
+            if flipped:
+                review_cache.invalidate(exam_uuids_for_question(question_id))
+
+            return {'answers': flipped, 'results': results}
+
+    def _lock_for(self, question_id: int) -> threading.Lock:
+        # Two regrades of the same question must not apply the same deltas twice
+        with self._locks_guard:
+            return self._locks.setdefault(question_id, threading.Lock())
+
+    def _correct_option(self, question_id: int) -> Optional[str]:
+        return db.session.execute(
+            select(Option.option_id)
+            .where(Option.question_id == question_id, Option.is_correct.is_(True))
+            .order_by(Option.id)
+            .limit(1)
+        ).scalar()
+
+    def _is_correct_expr(self, correct_option: Optional[str]):
+        if correct_option is None:
+            return literal(False)
+        return case((ResultAnswer.selected_option_id == correct_option, True), else_=False)
+
+    def _shift_scores(self, shifts: Dict[int, int], result_ids: List[int], category: str) -> None:
+        """
+        Move overall and category scores by each result's net number of questions gained.
+
+        Args:
+            shifts: Result id -> questions gained (negative if lost)
+            result_ids: Every result with a flipped answer, marked as regraded
+                even when its flips cancel out
+        """
+        if not result_ids:
+            return
+
+        results = ExamResult.__table__
+        db.session.execute(
+            update(results).where(results.c.id.in_(result_ids)).values(regraded_at=datetime.now())
+        )
+        params = [{'b_id': result_id, 'b_n': n} for result_id, n in shifts.items() if n]
+        if not params:
+            return
+
+        # Each result stores one answer row per exam question
+        question_count = (
+            select(func.count(ResultAnswer.id))
+            .where(ResultAnswer.result_id == results.c.id)
+            .scalar_subquery()
+        )
+        shift = bindparam('b_n', type_=Integer)
+        db.session.execute(
+            update(results)
+            .where(results.c.id == bindparam('b_id'))
+            .values(score=results.c.score + shift * 100.0 / question_count),
+            params
+        )
+
+        # Category scores are out of the answered questions counted when the result was graded;
+        # rows written before that count was stored fall back to recounting the answers
+        answered_in_category = (
+            select(func.count(ResultAnswer.id))
+            .join(Question, Question.id == ResultAnswer.question_id)
+            .where(and_(
+                ResultAnswer.result_id == CategoryScore.result_id,
+                ResultAnswer.selected_option_id.isnot(None),
+                Question.category == CategoryScore.category
+            ))
+            .scalar_subquery()
+        )
+        denominator = func.coalesce(CategoryScore.answered, answered_in_category)
+        db.session.execute(
+            update(CategoryScore.__table__)
+            .where(CategoryScore.result_id == bindparam('b_id'), CategoryScore.category == category)
+            .values(score=CategoryScore.score + shift * 100.0 / denominator),
+            params
+        )
+
+# Shared so that per-question locks are process-wide
+regrade_service = RegradeService()
@@ -0,0 +1,178 @@
+"""
+Batched read path for exam results in the CET Exam App
+
+Builds the same dictionaries as ``ExamResult.to_dict`` without lazy loads:
+one query for the results (joined to their user and exam IDs) and one per
+child table for all of them, however many results or answers there are.
+History lists use the narrower keyset-paginated summaries instead.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_
+
+from database import db
+from models.sql_models import (
+    ExamResult, ResultAnswer, CategoryScore, Recommendation, Question, User, Exam, ExamCategory
+)
+from services.recommendation_catalog import recommendation_catalog
+
+# Result ids per IN (...) on the child tables
+CHUNK_SIZE = 500
+
+
+def read_result(result_id: str) -> Optional[Dict]:
+    """Return one result as a dict, or None if it does not exist."""
+    results = _read(ExamResult.uuid == result_id)
+    return results[0] if results else None
+
+
+def read_user_results(user_id: str) -> List[Dict]:
+    """Return every result of a user (by public ID) as dicts, oldest first."""
+    return _read(User.uid == user_id)
+
+
+def read_user_result_summaries(user_id: str, after: Optional[str] = None, limit: int = 20) -> Dict:
+    """
+    Return one page of a user's results, newest first, without answers or recommendations.
+
+    Pages are keyed on (completed_at, id) and served by
+    ``idx_exam_results_user_completed``, so later pages cost the same as the first.
+
+    Args:
+        user_id: Public ID of the user
+        after: ``next`` value from the previous page (a result ID), or None for the first page
+        limit: Page size
+
+    Returns:
+        Dict with ``results`` and ``next`` (None on the last page)
+
+    Raises:
+        ValueError: If ``after`` is not one of the user's results
+    """
+    user_pk = db.session.query(User.id).filter(User.uid == user_id).scalar_subquery()
+    query = (
+        db.session.query(
+            ExamResult.id, ExamResult.uuid, ExamResult.exam_id, Exam.uuid.label('exam_uuid'),
+            Exam.title, ExamResult.score, ExamResult.max_score, ExamResult.completed_at
+        )
+        .join(Exam, Exam.id == ExamResult.exam_id)
+        .filter(ExamResult.user_id == user_pk)
+    )
+    if after:
+        cursor = (
+            db.session.query(ExamResult.completed_at, ExamResult.id)
+            .filter(ExamResult.uuid == after, ExamResult.user_id == user_pk)
+            .first()
+        )
+        if not cursor:
+            raise ValueError("Invalid cursor")
+        query = query.filter(or_(
+            ExamResult.completed_at < cursor.completed_at,
+            and_(ExamResult.completed_at == cursor.completed_at, ExamResult.id < cursor.id)
+        ))
+
+    rows = query.order_by(ExamResult.completed_at.desc(), ExamResult.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Categories for the exams on this page, so clients need no per-row exam fetch
+    categories: Dict[int, List[str]] = {}
+    exam_ids = list({row.exam_id for row in rows})
+    if exam_ids:
+        for exam_id, category in (
+            db.session.query(ExamCategory.exam_id, ExamCategory.category)
+            .filter(ExamCategory.exam_id.in_(exam_ids))
+            .order_by(ExamCategory.id)
+        ):
+            categories.setdefault(exam_id, []).append(category)
+
+    return {
+        'results': [
+            {
+                'id': row.uuid,
+                'exam_id': row.exam_uuid,
+                'exam_title': row.title,
+                'exam_categories': categories.get(row.exam_id, []),
+                'score': row.score,
+                'max_score': row.max_score,
+                'completed_at': row.completed_at
+            }
+            for row in rows
+        ],
+        'next': rows[-1].uuid if has_more else None
+    }
+
+
+def _read(condition) -> List[Dict]:
+    rows = (
+        db.session.query(
+            ExamResult.id, ExamResult.uuid, User.uid, Exam.uuid.label('exam_uuid'),
+            ExamResult.score, ExamResult.max_score, ExamResult.completed_at
+        )
+        .join(User, User.id == ExamResult.user_id)
+        .join(Exam, Exam.id == ExamResult.exam_id)
+        .filter(condition)
+        .order_by(ExamResult.id)
+        .all()
+    )
+    if not rows:
+        return []
+
+    by_id: Dict[int, Dict] = {}
+    for row in rows:
+        by_id[row.id] = {
+            'id': row.uuid,
+            'user_id': row.uid,
+            'exam_id': row.exam_uuid,
+            'score': row.score,
+            'max_score': row.max_score,
+            'completed_at': row.completed_at,
+            'answers': {},
+            'category_scores': {},
+            'recommendations': {'overall': [], 'by_category': {}}
+        }
+
+    ids = list(by_id)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        _attach_children(by_id, ids[start:start + CHUNK_SIZE])
+    return list(by_id.values())
+
+
+def _attach_children(by_id: Dict[int, Dict], ids: List[int]) -> None:
+    answers = (
+        db.session.query(ResultAnswer.result_id, Question.uuid, ResultAnswer.selected_option_id)
+        .join(Question, Question.id == ResultAnswer.question_id)
+        .filter(ResultAnswer.result_id.in_(ids))
+        .order_by(ResultAnswer.id)
+    )
+    for result_id, question_uuid, selected in answers:
+        by_id[result_id]['answers'][question_uuid] = selected
+
+    scores = (
+        db.session.query(CategoryScore.result_id, CategoryScore.category, CategoryScore.score)
+        .filter(CategoryScore.result_id.in_(ids))
+        .order_by(CategoryScore.id)
+    )
+    for result_id, category, score in scores:
+        by_id[result_id]['category_scores'][category] = score
+
+    recommendations = (
+        db.session.query(
+            Recommendation.result_id, Recommendation.category, Recommendation.recommendation_text,
+            Recommendation.template_id, Recommendation.params
+        )
+        .filter(Recommendation.result_id.in_(ids))
+        .order_by(Recommendation.id)
+    )
+    for result_id, category, legacy_text, template_id, params in recommendations:
+        if template_id is None:
+            text = legacy_text
+        else:
+            # Templates come from the in-process catalog, not a join per row
+            text = recommendation_catalog.render(template_id, category, params)
+        target = by_id[result_id]['recommendations']
+        if category is None:
+            target['overall'].append(text)
+        else:
+            target['by_category'].setdefault(category, []).append(text)
@@ -0,0 +1,161 @@
+"""
+Result review payloads for the CET Exam App
+
+Everything the review page shows for one result (score, category scores,
+recommendations, and every exam question with its options, the student's
+selected option, the correct option and the explanation) assembled in one
+payload. Questions, options and the stored answers come from a single joined
+query.
+
+Payloads are cached by result uuid together with the version they were
+built for: the result's ``regraded_at``/``completed_at`` and the exam's
+version, the same values the review route's ETag is made of. A read with a
+different version rebuilds, so a regrade or an edit is seen at once, in
+every worker process. Local edits also invalidate per exam straight away.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import and_
+
+from database import db
+from models.sql_models import Exam, ExamQuestion, Question, Option, ResultAnswer, ExamResult
+from services.result_reader import read_result
+
+
+def build_review(result_id: str) -> Optional[Dict]:
+    """Assemble the review payload for a result, or None if it does not exist."""
+    result = read_result(result_id)
+    if result is None:
+        return None
+
+    exam = db.session.query(Exam.id, Exam.uuid, Exam.title).filter(Exam.uuid == result['exam_id']).first()
+    result_pk = db.session.query(ExamResult.id).filter(ExamResult.uuid == result_id).scalar_subquery()
+
+    rows = (
+        db.session.query(
+            Question.id, Question.uuid, Question.text, Question.category, Question.explanation,
+            Option.option_id, Option.text.label('option_text'), Option.is_correct,
+            ResultAnswer.selected_option_id, ResultAnswer.is_correct.label('answer_correct')
+        )
+        .select_from(ExamQuestion)
+        .join(Question, Question.id == ExamQuestion.question_id)
+        .join(Option, Option.question_id == Question.id)
+        .outerjoin(ResultAnswer, and_(
+            ResultAnswer.question_id == Question.id,
+            ResultAnswer.result_id == result_pk
+        ))
+        .filter(ExamQuestion.exam_id == exam.id)
+        .order_by(ExamQuestion.question_order, ExamQuestion.id, Option.id)
+        .all()
+    )
+
+    questions = []
+    current = None
+    for row in rows:
+        if current is None or current['_pk'] != row.id:
+            current = {
+                '_pk': row.id,
+                'id': row.uuid,
+                'text': row.text,
+                'category': row.category,
+                'explanation': row.explanation,
+                'options': [],
+                'selected_option': row.selected_option_id,
+                'correct_option': None,
+                # Graded outcome as stored (regrades included), not recomputed from the options
+                'correct': bool(row.answer_correct)
+            }
+            questions.append(current)
+        current['options'].append({'id': row.option_id, 'text': row.option_text, 'is_correct': row.is_correct})
+        if row.is_correct and current['correct_option'] is None:
+            current['correct_option'] = row.option_id
+    for question in questions:
+        del question['_pk']
+
+    return {
+        'result': result,
+        'exam': {'id': exam.uuid, 'title': exam.title},
+        'questions': questions
+    }
+
+
+class ReviewCache:
+    """
+    Thread-safe LRU of review payloads, keyed by result uuid.
+
+    Each entry is only served for the version it was built for. Cached
+    results are also indexed by exam, so ``invalidate`` drops an exam's
+    entries directly and nothing is kept for exams without entries. A
+    generation counter bumped by ``invalidate`` and ``clear`` stops a build
+    that was in flight from caching a payload read before the change.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[str, Hashable, Dict]]' = OrderedDict()
+        self._by_exam: Dict[str, Set[str]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, result_id: str, version: Hashable) -> Optional[Dict]:
+        """
+        Return the review payload for a result, building it on a miss.
+
+        Args:
+            result_id: Public ID of the result
+            version: What identifies the result's and its exam's current
+                state; an entry built for another version is rebuilt
+        """
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                exam_uuid, built_for, payload = entry
+                if built_for == version:
+                    self._entries.move_to_end(result_id)
+                    return payload
+                del self._entries[result_id]
+                self._forget(result_id, exam_uuid)
+            generation = self._generation
+
+        payload = build_review(result_id)
+        if payload is None:
+            return None
+
+        exam_uuid = payload['exam']['id']
+        with self._lock:
+            if generation == self._generation and result_id not in self._entries:
+                self._entries[result_id] = (exam_uuid, version, payload)
+                self._by_exam.setdefault(exam_uuid, set()).add(result_id)
+                while len(self._entries) > self.max_size:
+                    evicted, (evicted_exam, _, _) = self._entries.popitem(last=False)
+                    self._forget(evicted, evicted_exam)
+        return payload
+
+    def invalidate(self, exam_uuids: Iterable[str]) -> None:
+        """Drop every cached review of the given exams."""
+        with self._lock:
+            self._generation += 1
+            for exam_uuid in exam_uuids:
+                for result_id in self._by_exam.pop(exam_uuid, ()):
+                    self._entries.pop(result_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_exam.clear()
+
+    def _forget(self, result_id: str, exam_uuid: str) -> None:
+        results = self._by_exam.get(exam_uuid)
+        if results is not None:
+            results.discard(result_id)
+            if not results:
+                del self._by_exam[exam_uuid]
+
+
+# Shared by the review route and the services that change results or questions
+review_cache = ReviewCache(int(os.getenv('REVIEW_CACHE_SIZE', '1024')))
@@ -0,0 +1,119 @@
+"""
+Batched persistence of graded exam results for the CET Exam App
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from database import db
+from models.sql_models import ExamResult, ResultAnswer, CategoryScore, Recommendation
+from services import progress_stats
+from services.recommendation_catalog import recommendation_catalog
+
+
+@dataclass
+class GradedResult:
+    """A fully scored submission that has not been written yet."""
+    user_id: int
+    exam_id: int
+    score: float
+    max_score: float
+    answers: List[Tuple[int, Optional[str], bool]]  # (question id, selected option, is correct)
+    category_scores: Dict[str, float]
+    recommendations: Dict  # RecommendationType: template keys and parameters
+    category_answered: Dict[str, int] = field(default_factory=dict)  # denominator of each category score
+    uuid: str = field(default_factory=lambda: str(uuid.uuid4()))
+    completed_at: datetime = field(default_factory=datetime.now)
+    idempotency_key: Optional[str] = None
+
+
+def write_results(results: List[GradedResult]) -> List[int]:
+    """
+    Insert graded results and all their child rows.
+
+    Issues one multi-row INSERT (or executemany) per table no matter how many
+    results or answers are written, plus the two statements of
+    ``progress_stats.record_results``: six in all once the template catalog is
+    synced and the users' progress rows exist, which the first write of a
+    process or of a new user/category pays for with a few more. The caller
+    owns the transaction and is expected to commit.
+
+    Returns:
+        Internal ids of the new exam_results rows, in input order
+    """
+    if not results:
+        return []
+
+    # Sync the template catalog before this transaction takes any write locks
+    recommendation_catalog.load()
+
+    # RETURNING order is not guaranteed for multi-row inserts, so map ids back by uuid
+    rows = db.session.execute(
+        insert(ExamResult.__table__).returning(ExamResult.__table__.c.id, ExamResult.__table__.c.uuid),
+        [
+            {
+                'uuid': r.uuid,
+                'user_id': r.user_id,
+                'exam_id': r.exam_id,
+                'score': r.score,
+                'max_score': r.max_score,
+                'completed_at': r.completed_at,
+                'idempotency_key': r.idempotency_key
+            }
+            for r in results
+        ]
+    ).all()
+    ids_by_uuid = {row.uuid: row.id for row in rows}
+    result_ids = [ids_by_uuid[r.uuid] for r in results]
+
+    answer_rows = []
+    category_rows = []
+    recommendation_rows = []
+    for result_id, r in zip(result_ids, results):
+        for question_id, selected_option, is_correct in r.answers:
+            answer_rows.append({
+                'result_id': result_id,
+                'question_id': question_id,
+                'selected_option_id': selected_option,
+                'is_correct': is_correct
+            })
+        for category, score in r.category_scores.items():
+            category_rows.append({
+                'result_id': result_id,
+                'category': category,
+                'score': score,
+                'answered': r.category_answered.get(category)
+            })
+        for key, params in r.recommendations['overall']:
+            recommendation_rows.append({
+                'result_id': result_id,
+                'category': None,
+                'recommendation_text': '',
+                'template_id': recommendation_catalog.template_id(key),
+                'params': params
+            })
+        for category, refs in r.recommendations['by_category'].items():
+            for key, params in refs:
+                recommendation_rows.append({
+                    'result_id': result_id,
+                    'category': category,
+                    'recommendation_text': '',
+                    'template_id': recommendation_catalog.template_id(key),
+                    'params': params
+                })
+
+    if answer_rows:
+        db.session.execute(insert(ResultAnswer.__table__), answer_rows)
+    if category_rows:
+        db.session.execute(insert(CategoryScore.__table__), category_rows)
+    if recommendation_rows:
+        db.session.execute(insert(Recommendation.__table__), recommendation_rows)
+
+    # Progress aggregates commit or roll back with the results
+    progress_stats.record_results(results)
+
+    return result_ids
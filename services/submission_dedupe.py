@@ -0,0 +1,99 @@
+"""
+Idempotent exam submissions for the CET Exam App
+
+Retries of the same submission (same user, exam and client idempotency key
+or attempt ID) are answered with the original result ID instead of being
+graded again. A bounded in-memory map answers repeat retries without a
+query, a per-key lock serialises duplicates that arrive on different
+threads at the same time, and unique indexes on ``idempotency_key`` catch
+duplicates that reach different processes.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from database import db
+from models.sql_models import ExamResult, GradingJob
+
+class SubmissionDedupe:
+    """Maps idempotency keys to the result ID of the submission that first used them."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._results: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, List] = {}  # key -> [lock, waiters]
+
+    @staticmethod
+    def make_key(user_id: str, exam_id: str, client_key: Optional[str]) -> Optional[str]:
+        """
+        Derive the stored key for a submission.
+
+        Args:
+            user_id: Public ID of the submitting user
+            exam_id: Public ID of the exam
+            client_key: Idempotency key or attempt ID sent by the client
+
+        Returns:
+            Hex digest scoped to the user and exam, or None if the client sent no key
+        """
+        if not client_key:
+            return None
+        return hashlib.sha256(f"{user_id}\x00{exam_id}\x00{client_key}".encode('utf-8')).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the result ID already recorded for a key, if any."""
+        with self._lock:
+            result_id = self._results.get(key)
+            if result_id is not None:
+                self._results.move_to_end(key)
+                return result_id
+
+        result_id = db.session.query(ExamResult.uuid).filter_by(idempotency_key=key).scalar()
+        if result_id is None:
+            result_id = db.session.query(GradingJob.result_uuid).filter_by(idempotency_key=key).scalar()
+        if result_id is not None:
+            self.remember(key, result_id)
+        return result_id
+
+    def remember(self, key: str, result_id: str) -> None:
+        with self._lock:
+            self._results[key] = result_id
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    @contextmanager
+    def claim(self, key: str) -> Iterator[Optional[str]]:
+        """
+        Hold the per-key lock for the duration of a submission.
+
+        Yields the existing result ID if the key was already used, otherwise
+        None, in which case the caller grades and then calls ``remember``.
+        Must be entered before the request has written anything: a duplicate
+        that has to wait ends its read transaction first so it does not hold
+        a pooled connection while blocked.
+        """
+        with self._lock:
+            entry = self._inflight.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(blocking=False):
+                db.session.rollback()
+                entry[0].acquire()
+            try:
+                yield self.lookup(key)
+            finally:
+                entry[0].release()
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._inflight[key]
+
+# Shared by the sync and queued submission paths
+submission_dedupe = SubmissionDedupe(int(os.getenv('SUBMISSION_DEDUPE_SIZE', '10000')))
@@ -9,6 +9,8 @@ from typing import List, Dict, Optional, Union
 
 from database import db
 from models.sql_models import User
+from services.result_review import review_cache
+from services.id_resolver import id_resolver, USER
 
 class UserRole:
     """User role constants."""
@@ -116,6 +118,9 @@ class UserService:
                 
             db.session.delete(user)
             db.session.commit()
+            id_resolver.evict(USER, [user_id])
+            # Their results went with them; cached reviews are not indexed by user
+            review_cache.clear()
             return True
         except Exception as e:
             db.session.rollback()
@@ -150,13 +155,14 @@ class UserService:
     def update_last_login(self, user_id: str) -> bool:
         """Update user's last login timestamp."""
         try:
-            user = User.query.filter_by(uid=user_id).first()
-            if not user:
+            # One UPDATE by primary key, without loading the user first
+            user_pk = id_resolver.resolve(USER, user_id)
+            if user_pk is None:
                 return False
                 
-            user.last_login = datetime.now()
+            updated = User.query.filter_by(id=user_pk).update({User.last_login: datetime.now()})
             db.session.commit()
-            return True
+            return updated > 0
         except Exception as e:
             db.session.rollback()
             print(f"Error updating last login: {e}")
@@ -221,6 +221,31 @@ class ExamService {
         }
     }
 
+    async getExamSummaries(activeOnly = true, category = null, after = null, limit = 20) {
+        try {
+            // One page, newest first, with question counts instead of question lists
+            let url = `${this.apiUrl}/exams/summary?active_only=${activeOnly}&limit=${limit}`;
+            if (category) {
+                if (Array.isArray(category)) {
+                    url += `&categories=${category.map(encodeURIComponent).join(',')}`;
+                } else {
+                    url += `&category=${encodeURIComponent(category)}`;
+                }
+            }
+            if (after) {
+                url += `&after=${encodeURIComponent(after)}`;
+            }
+            const response = await this.authService.getAuthenticatedRequest(url);
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error fetching exam summaries:', error);
+            throw error;
+        }
+    }
+
     // categories
     async listCategories() {
         try {
@@ -338,6 +363,51 @@ class ExamService {
         }
     }
     
+    async findDuplicateQuestions(text, options) {
+        try {
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/questions/duplicates`,
+                {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ text, options })
+                }
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data.duplicates;
+        } catch (error) {
+            console.error('Error checking for duplicate questions:', error);
+            throw error;
+        }
+    }
+    
+    async importQuestions(file, category) {
+        try {
+            // The server reads and validates the sheet; the browser does not set Content-Type for FormData
+            const form = new FormData();
+            form.append('file', file);
+            form.append('category', category);
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/questions/import`,
+                {
+                    method: 'POST',
+                    body: form
+                }
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error importing questions:', error);
+            throw error;
+        }
+    }
+    
     async getQuestionsByCategories(categories) {
         try {
             let url = `${this.apiUrl}/questions`;
@@ -357,15 +427,93 @@ class ExamService {
         }
     }
     
-    async submitExam(examId, answers) {
+    async searchQuestions(query, { categories = null, difficultyLevel = null, offset = 0, limit = 20 } = {}) {
+        try {
+            // Best match first; pass the returned `next` as `offset` for the following page
+            let url = `${this.apiUrl}/questions/search?q=${encodeURIComponent(query)}&offset=${offset}&limit=${limit}`;
+            if (categories && categories.length) {
+                url += `&categories=${encodeURIComponent(categories.join(','))}`;
+            }
+            if (difficultyLevel) {
+                url += `&difficulty_level=${difficultyLevel}`;
+            }
+            const response = await this.authService.getAuthenticatedRequest(url);
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error searching questions:', error);
+            throw error;
+        }
+    }
+    
+    async getQuestionPool(categories) {
+        try {
+            // Question counts per category and difficulty level, without the questions
+            let url = `${this.apiUrl}/questions/pool`;
+            if (categories && categories.length) {
+                url += `?categories=${encodeURIComponent(categories.join(','))}`;
+            }
+            const response = await this.authService.getAuthenticatedRequest(url);
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data.pool;
+        } catch (error) {
+            console.error('Error fetching question pool:', error);
+            throw error;
+        }
+    }
+    
+    async assembleExam(title, description, durationMinutes, blueprint, categories, seed = null) {
         try {
+            // The server draws the questions; blueprint entries are {category, difficulty_level, count}
+            const body = {
+                title,
+                description,
+                duration_minutes: durationMinutes,
+                blueprint,
+                categories
+            };
+            if (seed) {
+                body.seed = seed;
+            }
             const response = await this.authService.getAuthenticatedRequest(
-                `${this.apiUrl}/exams/${examId}/submit`,
+                `${this.apiUrl}/exams/assemble`,
                 {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
                     },
+                    body: JSON.stringify(body)
+                }
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data.examId;
+        } catch (error) {
+            console.error('Error assembling exam:', error);
+            throw error;
+        }
+    }
+    
+    async submitExam(examId, answers, queued = false, attemptId = null) {
+        try {
+            // queued=true returns 202 straight away; poll getResultStatus until done
+            const headers = {
+                'Content-Type': 'application/json'
+            };
+            // Retries with the same attempt ID get the original result back instead of a regrade
+            if (attemptId) {
+                headers['Idempotency-Key'] = attemptId;
+            }
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/exams/${examId}/submit${queued ? '?async=true' : ''}`,
+                {
+                    method: 'POST',
+                    headers,
                     body: JSON.stringify({ answers })
                 }
             );
@@ -379,6 +527,21 @@ class ExamService {
         }
     }
     
+    async getResultStatus(resultId) {
+        try {
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/results/${resultId}/status`
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error fetching result status:', error);
+            throw error;
+        }
+    }
+    
     async getResult(resultId) {
         try {
             const response = await this.authService.getAuthenticatedRequest(
@@ -394,6 +557,22 @@ class ExamService {
         }
     }
     
+    async getResultReview(resultId) {
+        try {
+            // Result plus every question with selected/correct option and explanation
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/results/${resultId}/review`
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data.review;
+        } catch (error) {
+            console.error('Error fetching result review:', error);
+            throw error;
+        }
+    }
+    
     async getUserResults(userId) {
         try {
             const response = await this.authService.getAuthenticatedRequest(
@@ -408,6 +587,39 @@ class ExamService {
             throw error;
         }
     }
+    
+    async getUserStats(userId) {
+        try {
+            const response = await this.authService.getAuthenticatedRequest(
+                `${this.apiUrl}/users/${userId}/stats`
+            );
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error fetching user stats:', error);
+            throw error;
+        }
+    }
+    
+    async getUserResultSummaries(userId, after = null, limit = 100) {
+        try {
+            // One page, newest first; pass the returned `next` as `after` for the following page
+            let url = `${this.apiUrl}/users/${userId}/results/summary?limit=${limit}`;
+            if (after) {
+                url += `&after=${encodeURIComponent(after)}`;
+            }
+            const response = await this.authService.getAuthenticatedRequest(url);
+            
+            // Safe to parse JSON for successful responses
+            const data = await response.json();
+            return data;
+        } catch (error) {
+            console.error('Error fetching result summaries:', error);
+            throw error;
+        }
+    }
 }
 
 // Certificate generator removed